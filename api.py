@@ -1,11 +1,299 @@
 import requests
-from typing import Dict, List, Optional, Union, Any
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, List, Optional, Tuple, Union, Any
 import os
+import threading
+import time
+import functools
+from collections import OrderedDict
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 load_dotenv()
 # Base URL for the API
 BASE_URL = os.environ.get('API_BASE_URL', 'http://localhost:8000')
 
+# Connection pool / timeout settings
+API_POOL_CONNECTIONS = int(os.environ.get('API_POOL_CONNECTIONS', 4))   # 可保留連線池的主機數
+API_POOL_MAXSIZE = int(os.environ.get('API_POOL_MAXSIZE', 16))          # 每個主機的最大連線數
+API_TIMEOUT = float(os.environ.get('API_TIMEOUT', 10))
+API_UPLOAD_TIMEOUT = float(os.environ.get('API_UPLOAD_TIMEOUT', 60))
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Get the shared HTTP session
+
+    The session lives at module level, so its keep-alive connections are
+    reused across Streamlit reruns and sessions of the same server process.
+
+    Returns:
+        requests.Session with a pooled adapter mounted for http and https
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=API_POOL_CONNECTIONS, pool_maxsize=API_POOL_MAXSIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+def close_session() -> None:
+    """
+    Close the shared HTTP session and drop its pooled connections
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+# Reference data cache settings (seconds)
+CACHE_TTL = {
+    "projects": float(os.environ.get('API_CACHE_TTL_PROJECTS', 60)),
+    "categories": float(os.environ.get('API_CACHE_TTL_CATEGORIES', 300)),
+    "vendors": float(os.environ.get('API_CACHE_TTL_VENDORS', 300)),
+    "basemaps": float(os.environ.get('API_CACHE_TTL_BASEMAPS', 120)),
+    "users": float(os.environ.get('API_CACHE_TTL_USERS', 300)),
+}
+CACHE_MAXSIZE = int(os.environ.get('API_CACHE_MAXSIZE', 256))
+
+class _TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a per-entry TTL
+
+    Keys are tuples whose first element is the resource name, so every
+    entry of a resource can be invalidated at once.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        """Return (hit, value)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key: tuple, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, resource: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k[0] == resource]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+_cache = _TTLCache(CACHE_MAXSIZE)
+
+def _cached(resource: str):
+    """
+    Cache successful results of a GET helper under the given resource
+
+    Empty results ({} / []) are what the helpers return on errors, so they
+    are never cached.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (resource, func.__name__, args, tuple(sorted(kwargs.items())))
+            hit, value = _cache.get(key)
+            if hit:
+                return value
+            value = func(*args, **kwargs)
+            if value:
+                _cache.set(key, value, CACHE_TTL[resource])
+            return value
+        return wrapper
+    return decorator
+
+def invalidate_cache(resource: Optional[str] = None) -> None:
+    """
+    Drop cached reference data
+
+    Args:
+        resource: "projects", "categories", "vendors", "basemaps" or "users";
+            None clears everything
+    """
+    if resource is None:
+        _cache.clear()
+    else:
+        _cache.invalidate(resource)
+
+# Request instrumentation hooks
+_request_hooks: List[Callable[[Dict[str, Any]], None]] = []
+
+def add_request_hook(hook: Callable[[Dict[str, Any]], None]) -> None:
+    """
+    Register a callable invoked after every API request
+
+    The hook receives one event dict with method, url, path, status
+    (None when no response was received), bytes_out, bytes_in, seconds
+    and error (exception message or None). Hooks run in the requesting
+    thread and their exceptions are printed, never raised.
+    """
+    if hook not in _request_hooks:
+        _request_hooks.append(hook)
+
+def remove_request_hook(hook: Callable[[Dict[str, Any]], None]) -> None:
+    if hook in _request_hooks:
+        _request_hooks.remove(hook)
+
+def _body_size(prepared: Optional[requests.PreparedRequest]) -> int:
+    body = getattr(prepared, "body", None)
+    if isinstance(body, bytes):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    return 0
+
+def _emit_request_event(method: str, url: str, response: Optional[requests.Response], error: Optional[Exception], seconds: float) -> None:
+    prepared = response.request if response is not None else getattr(error, "request", None)
+    event = {
+        "method": method,
+        "url": url,
+        "path": urlsplit(url).path,
+        "status": response.status_code if response is not None else None,
+        "bytes_out": _body_size(prepared),
+        "bytes_in": len(response.content) if response is not None else 0,
+        "seconds": seconds,
+        "error": str(error) if error is not None else None,
+    }
+    for hook in list(_request_hooks):
+        try:
+            hook(event)
+        except Exception as e:
+            print(f"Error in request hook {hook}: {e}")
+
+def _request(method: str, url: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+    """
+    Send a request through the shared session
+
+    Args:
+        method: HTTP method
+        url: Full request URL
+        timeout: Timeout in seconds (default: API_TIMEOUT)
+        **kwargs: Passed through to requests.Session.request
+
+    Returns:
+        requests.Response
+    """
+    if not _request_hooks:
+        return get_session().request(method, url, timeout=timeout or API_TIMEOUT, **kwargs)
+
+    response = None
+    error = None
+    start = time.perf_counter()
+    try:
+        response = get_session().request(method, url, timeout=timeout or API_TIMEOUT, **kwargs)
+        return response
+    except requests.exceptions.RequestException as e:
+        error = e
+        raise
+    finally:
+        _emit_request_event(method, url, response, error, time.perf_counter() - start)
+
+# Conditional GET (ETag / Last-Modified) settings
+CONDITIONAL_MAXSIZE = int(os.environ.get('API_CONDITIONAL_MAXSIZE', 128))
+
+_validators = _TTLCache(CONDITIONAL_MAXSIZE)
+_conditional_stats = {"hits": 0, "misses": 0, "bytes_saved": 0, "bytes_received": 0}
+_conditional_stats_lock = threading.Lock()
+
+def _get_json_revalidated(url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Tuple[Any, bool]:
+    """
+    GET a JSON resource, revalidating with ETag / Last-Modified when possible
+
+    The validators and parsed body of the last 200 response are kept per
+    URL; on 304 Not Modified that parsed body is returned without
+    re-downloading or re-parsing it.
+
+    Args:
+        url: Full request URL
+        params: Query parameters
+        timeout: Timeout in seconds (default: API_TIMEOUT)
+
+    Returns:
+        (parsed JSON body, modified); modified is False when the server
+        answered 304 and the body is the one kept from the last 200
+
+    Raises:
+        requests.exceptions.RequestException on HTTP or connection errors
+    """
+    key = ("conditional", url, tuple(sorted((params or {}).items())))
+    hit, entry = _validators.get(key)
+    headers = {}
+    if hit:
+        etag, last_modified, _, _ = entry
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    response = _request("GET", url, timeout=timeout, params=params, headers=headers)
+
+    if response.status_code == 304 and hit:
+        _, _, body, size = entry
+        with _conditional_stats_lock:
+            _conditional_stats["hits"] += 1
+            _conditional_stats["bytes_saved"] += size
+        return body, False
+
+    response.raise_for_status()
+    body = response.json()
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        _validators.set(key, (etag, last_modified, body, len(response.content)))
+    with _conditional_stats_lock:
+        _conditional_stats["misses"] += 1
+        _conditional_stats["bytes_received"] += len(response.content)
+    return body, True
+
+def _get_json(url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Any:
+    """
+    _get_json_revalidated() without the modified flag
+    """
+    return _get_json_revalidated(url, params, timeout)[0]
+
+def get_conditional_stats() -> Dict[str, int]:
+    """
+    Get conditional GET counters
+
+    Returns:
+        hits (304 responses), misses (full responses), bytes_saved and
+        bytes_received
+    """
+    with _conditional_stats_lock:
+        return dict(_conditional_stats)
+
+def reset_conditional_stats() -> None:
+    with _conditional_stats_lock:
+        for k in _conditional_stats:
+            _conditional_stats[k] = 0
+
 # Project API functions
 
 def create_project(project_name: str) -> Dict[str, Any]:
@@ -22,8 +310,9 @@ def create_project(project_name: str) -> Dict[str, Any]:
     payload = {"project_name": project_name}
     
     try:
-        response = requests.post(url, json=payload)
+        response = _request("POST", url, json=payload)
         response.raise_for_status()
+        invalidate_cache("projects")
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error creating project: {e}")
@@ -44,8 +333,9 @@ def create_project_image(project_id: int, image) -> Dict[str, Any]:
     url = f"{BASE_URL}/projects/{project_id}/image"
 
     try:
-        response=requests.post(url,files=image)
+        response=_request("POST", url, timeout=API_UPLOAD_TIMEOUT, files=image)
         response.raise_for_status()
+        invalidate_cache("projects")
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error creating project image: {e}")
@@ -69,13 +359,12 @@ def get_projects(skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
     params = {"skip": skip, "limit": limit}
     
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url, params=params)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching projects: {e}")
         return []
 
+@_cached("projects")
 def get_project(project_id: int) -> Dict[str, Any]:
     """
     Get a specific project by ID
@@ -89,9 +378,7 @@ def get_project(project_id: int) -> Dict[str, Any]:
     url = f"{BASE_URL}/projects/{project_id}"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching project {project_id}: {e}")
         return {}
@@ -111,8 +398,9 @@ def update_project(project_id: int, project_name: str) -> Dict[str, Any]:
     payload = {"project_name": project_name}
     
     try:
-        response = requests.put(url, json=payload)
+        response = _request("PUT", url, json=payload)
         response.raise_for_status()
+        invalidate_cache("projects")
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error updating project {project_id}: {e}")
@@ -131,8 +419,9 @@ def delete_project(project_id: int) -> bool:
     url = f"{BASE_URL}/projects/{project_id}"
     
     try:
-        response = requests.delete(url)
+        response = _request("DELETE", url)
         response.raise_for_status()
+        invalidate_cache("projects")
         return True
     except requests.exceptions.RequestException as e:
         print(f"Error deleting project {project_id}: {e}")
@@ -151,9 +440,7 @@ def get_project_with_counts(project_id: int) -> Dict[str, Any]:
     url = f"{BASE_URL}/projects/{project_id}/with-counts"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching project with counts {project_id}: {e}")
         return {}
@@ -171,9 +458,7 @@ def get_user_projects(user_id: int) -> Dict[str, Any]:
     url = f"{BASE_URL}/users/{user_id}/projects"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching projects for user {user_id}: {e}")
         return {}
@@ -191,9 +476,7 @@ def get_project_with_roles(project_id: int) -> Dict[str, Any]:
     url = f"{BASE_URL}/projects/{project_id}/with-roles"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching project roles {project_id}: {e}")
         return {}
@@ -216,8 +499,9 @@ def create_permission(project_id: int, user_email: str, user_role: str) -> Dict[
     payload = {"project_id": project_id, "user_email": user_email, "user_role": user_role}
     
     try:
-        response = requests.post(url, json=payload)
+        response = _request("POST", url, json=payload)
         response.raise_for_status()
+        invalidate_cache("projects")
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error creating permission: {e}")
@@ -227,9 +511,7 @@ def get_permissions(project_id: int):
     url = f"{BASE_URL}/permissions/?project_id={project_id}"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching permissions: {e}")
         return []
@@ -238,19 +520,53 @@ def get_project_by_email(user_email: str):
     url = f"{BASE_URL}/permissions/?user_email={user_email}"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching project by email: {e}")
         return []
 
+# 工程卡片需要、但 /users/{user_id}/projects 可能未回傳的欄位
+PROJECT_SUMMARY_FIELDS = ('image_path',)
+
+@_cached("projects")
+def get_project_summaries(user_email: str) -> List[Dict[str, Any]]:
+    """
+    Get every project a user can see together with their role
+
+    The user is looked up by email (cached, see get_user_by_email) and
+    GET /users/{user_id}/projects returns their projects and roles in one
+    call. Projects lacking a PROJECT_SUMMARY_FIELDS field there are
+    fetched individually, in parallel.
+
+    Args:
+        user_email: Email of the user
+
+    Returns:
+        List of project data, each with user_role added
+    """
+    user = get_user_by_email(user_email)
+    if not user:
+        return []
+    projects = get_user_projects(user['user_id']).get('projects') or []
+
+    # 規格 (ProjectInfo) 的角色欄位為 role，實際後端可能回傳 user_role
+    summaries = [{**project, "user_role": project.get('user_role', project.get('role'))} for project in projects]
+    missing = [summary for summary in summaries if any(field not in summary for field in PROJECT_SUMMARY_FIELDS)]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(BULK_WORKERS, len(missing))) as pool:
+            details = pool.map(get_project, [summary['project_id'] for summary in missing])
+            for summary, project in zip(missing, details):
+                if project:
+                    summary.update({**project, **summary})
+    return [summary for summary in summaries if all(field in summary for field in PROJECT_SUMMARY_FIELDS)]
+
 def delete_permission(permission_id: int):
     url = f"{BASE_URL}/permissions/{permission_id}"
     
     try:
-        response = requests.delete(url)
+        response = _request("DELETE", url)
         response.raise_for_status()
+        invalidate_cache("projects")
         return True
     except requests.exceptions.RequestException as e:
         print(f"Error deleting permission {permission_id}: {e}")
@@ -261,8 +577,9 @@ def update_permission(permission_id: int, user_role: str):
     payload = {"user_role": user_role}
     
     try:
-        response = requests.put(url, json=payload)
+        response = _request("PUT", url, json=payload)
         response.raise_for_status()
+        invalidate_cache("projects")
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error updating permission {permission_id}: {e}")
@@ -274,13 +591,43 @@ def get_users():
     url = f"{BASE_URL}/users/"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching users: {e}")
         return []
 
+# GET /users/ 的 limit 上限（openapi.json）
+USERS_PAGE_MAX = 100
+
+@_cached("users")
+def get_user_by_email(user_email: str) -> Dict[str, Any]:
+    """
+    Find a user by email
+
+    GET /users/ has no email filter, so it is paged (USERS_PAGE_MAX each)
+    until the user turns up; the result is cached under "users".
+
+    Args:
+        user_email: Email of the user
+
+    Returns:
+        User data, or {} if no user has this email
+    """
+    url = f"{BASE_URL}/users/"
+    skip = 0
+    try:
+        while True:
+            page = _get_json(url, params={"skip": skip, "limit": USERS_PAGE_MAX})
+            for user in page:
+                if user.get('email') == user_email:
+                    return user
+            if len(page) < USERS_PAGE_MAX:
+                return {}
+            skip += USERS_PAGE_MAX
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching user {user_email}: {e}")
+        return {}
+
 def create_user(user_name: str, user_email: str, user_role: str, phone: str = "", line_id: str = "") -> dict:
     """
     Create a new user
@@ -294,7 +641,7 @@ def create_user(user_name: str, user_email: str, user_role: str, phone: str = ""
         "line_id": line_id
     }
     try:
-        response = requests.post(url, json=payload)
+        response = _request("POST", url, json=payload)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -314,8 +661,9 @@ def update_user(user_id: int, user_name: str, user_email: str, user_role: str, p
         "line_id": line_id
     }
     try:
-        response = requests.put(url, json=payload)
+        response = _request("PUT", url, json=payload)
         response.raise_for_status()
+        invalidate_cache("users")
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error updating user {user_id}: {e}")
@@ -327,21 +675,21 @@ def delete_user(user_id: int) -> bool:
     """
     url = f"{BASE_URL}/users/{user_id}"
     try:
-        response = requests.delete(url)
+        response = _request("DELETE", url)
         response.raise_for_status()
+        invalidate_cache("users")
         return True
     except requests.exceptions.RequestException as e:
         print(f"Error deleting user {user_id}: {e}")
         return False
 
 #-------廠商--------
+@_cached("vendors")
 def get_vendors():
     url = f"{BASE_URL}/vendors/"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching vendors: {e}")
         return []
@@ -364,8 +712,9 @@ def create_vendor(project_id: int,vendor_name: str, contact_person: str, phone:
     payload = {"project_id": project_id,"vendor_name": vendor_name, "contact_person": contact_person, "phone": phone,"email":email,"line_id":line_id,"responsibilities":responsibilities}
     
     try:
-        response = requests.post(url, json=payload)
+        response = _request("POST", url, json=payload)
         response.raise_for_status()
+        invalidate_cache("vendors")
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error creating vendor: {e}")
@@ -389,8 +738,9 @@ def update_vendor(vendor_id: int, vendor_name: str, contact_person: str, phone:
     payload = {"vendor_name": vendor_name, "contact_person": contact_person, "phone": phone,"email":email,"line_id":line_id,"responsibilities":responsibilities}
     
     try:
-        response = requests.put(url, json=payload)
+        response = _request("PUT", url, json=payload)
         response.raise_for_status()
+        invalidate_cache("vendors")
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error updating vendor {vendor_id}: {e}")
@@ -400,8 +750,9 @@ def delete_vendor(vendor_id: int):
     url = f"{BASE_URL}/vendors/{vendor_id}"
     
     try:
-        response = requests.delete(url)
+        response = _request("DELETE", url)
         response.raise_for_status()
+        invalidate_cache("vendors")
         return True
     except requests.exceptions.RequestException as e:
         print(f"Error deleting vendor {vendor_id}: {e}")
@@ -410,13 +761,12 @@ def delete_vendor(vendor_id: int):
 
 #--------取得缺失分類---------
 
+@_cached("categories")
 def get_defect_categories():
     url = f"{BASE_URL}/defect-categories/"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching defect categories: {e}")
         return []
@@ -437,8 +787,9 @@ def create_defect_category(project_id: int, category_name: str, description: str
     payload = {"project_id": project_id,"category_name": category_name,"description":description}
     
     try:
-        response = requests.post(url, json=payload)
+        response = _request("POST", url, json=payload)
         response.raise_for_status()
+        invalidate_cache("categories")
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error creating category: {e}")
@@ -451,8 +802,9 @@ def update_defect_category(defect_category_id: int, category_name: str, descript
     url = f"{BASE_URL}/defect-categories/{defect_category_id}"
     payload = {"category_name": category_name,"description":description}
     try:
-        response = requests.put(url, json=payload)
+        response = _request("PUT", url, json=payload)
         response.raise_for_status()
+        invalidate_cache("categories")
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error updating defect category {defect_category_id}: {e}")
@@ -464,8 +816,9 @@ def delete_defect_category(defect_category_id: int) -> bool:
     """
     url = f"{BASE_URL}/defect-categories/{defect_category_id}"
     try:
-        response = requests.delete(url)
+        response = _request("DELETE", url)
         response.raise_for_status()
+        invalidate_cache("categories")
         return True
     except requests.exceptions.RequestException as e:
         print(f"Error deleting defect category {defect_category_id}: {e}")
@@ -479,31 +832,30 @@ def create_basemap(project_id: int, map_name: str, file_path: str="file_path") -
     payload = {"project_id": project_id, "map_name": map_name, "file_path": file_path}
     
     try:
-        response = requests.post(url, json=payload)
+        response = _request("POST", url, json=payload)
         response.raise_for_status()
+        invalidate_cache("basemaps")
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error creating basemap: {e}")
         return {}
 
+@_cached("basemaps")
 def get_basemap(basemap_id: int):
     url = f"{BASE_URL}/base-maps/{basemap_id}"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching basemap: {e}")
         return []
 
+@_cached("basemaps")
 def get_basemaps(project_id: int):
     url = f"{BASE_URL}/base-maps/?project_id={project_id}"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching basemaps: {e}")
         return []
@@ -523,8 +875,9 @@ def create_basemap_image(basemap_id: int, files) -> Dict[str, Any]:
     url = f"{BASE_URL}/base-maps/{basemap_id}/image"
 
     try:
-        response = requests.post(url, files=files)
+        response = _request("POST", url, timeout=API_UPLOAD_TIMEOUT, files=files)
         response.raise_for_status()
+        invalidate_cache("basemaps")
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error creating basemap image: {e}")
@@ -539,8 +892,9 @@ def update_basemap(basemap_id: int, map_name: str) -> Dict[str, Any]:
     payload = {"map_name": map_name}
     
     try:
-        response = requests.put(url, json=payload)
+        response = _request("PUT", url, json=payload)
         response.raise_for_status()
+        invalidate_cache("basemaps")
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error updating basemap {basemap_id}: {e}")
@@ -550,8 +904,9 @@ def delete_basemap(basemap_id: int) -> bool:
     url = f"{BASE_URL}/base-maps/{basemap_id}"
     
     try:
-        response = requests.delete(url)
+        response = _request("DELETE", url)
         response.raise_for_status()
+        invalidate_cache("basemaps")
         return True
     except requests.exceptions.RequestException as e:
         print(f"Error deleting basemap {basemap_id}: {e}")
@@ -585,7 +940,7 @@ def create_defect(project_id: int,user_id:int, data: Dict[str, Any]) -> Dict[str
     }
 
     try:
-        response = requests.post(url, json=payload)
+        response = _request("POST", url, json=payload)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -604,7 +959,7 @@ def delete_defect(defect_id: int) -> bool:
     url = f"{BASE_URL}/defects/{defect_id}"
     
     try:
-        response = requests.delete(url)
+        response = _request("DELETE", url)
         response.raise_for_status()
         return True
     except requests.exceptions.RequestException as e:
@@ -629,7 +984,7 @@ def update_defect(defect_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
     url = f"{BASE_URL}/defects/{defect_id}"
     
     try:
-        response = requests.put(url, json=data)
+        response = _request("PUT", url, json=data)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -638,6 +993,108 @@ def update_defect(defect_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
             print(f"Response content: {e.response.content}")
         return {}
 
+# 批次操作：伺服器有批次路由時一次送出，否則以有限的並行數逐筆送出
+BULK_WORKERS = int(os.environ.get('API_BULK_WORKERS', 8))
+BULK_CHUNK_SIZE = int(os.environ.get('API_BULK_CHUNK_SIZE', 500))
+
+_bulk_routes: Dict[str, bool] = {}  # 路由 -> 伺服器是否支援
+
+def _bulk_request(route: str, payload: Dict[str, Any], defect_ids: List[int]) -> Optional[Dict[str, List[int]]]:
+    """
+    POST one chunk to a bulk route
+
+    Returns:
+        {"succeeded": [...], "failed": [...]}, or None when the server has
+        no such route (remembered for the rest of the process)
+    """
+    url = f"{BASE_URL}{route}"
+    try:
+        response = _request("POST", url, json={**payload, "defect_ids": defect_ids})
+        if response.status_code in (404, 405):
+            _bulk_routes[route] = False
+            return None
+        response.raise_for_status()
+        _bulk_routes[route] = True
+    except requests.exceptions.RequestException as e:
+        print(f"Error calling {route}: {e}")
+        return {"succeeded": [], "failed": list(defect_ids)}
+
+    try:
+        body = response.json()
+    except ValueError:
+        body = {}
+    failed = set(body.get("failed", [])) if isinstance(body, dict) else set()
+    return {
+        "succeeded": [d for d in defect_ids if d not in failed],
+        "failed": [d for d in defect_ids if d in failed],
+    }
+
+def _bulk(route: str, payload: Dict[str, Any], defect_ids: List[int], single) -> Dict[str, List[int]]:
+    defect_ids = list(dict.fromkeys(int(d) for d in defect_ids))
+    result = {"succeeded": [], "failed": []}
+
+    if _bulk_routes.get(route, True):
+        for i in range(0, len(defect_ids), BULK_CHUNK_SIZE):
+            chunk_result = _bulk_request(route, payload, defect_ids[i:i + BULK_CHUNK_SIZE])
+            if chunk_result is None:
+                # 伺服器不支援，剩下的改為逐筆送出
+                defect_ids = defect_ids[i:]
+                break
+            result["succeeded"] += chunk_result["succeeded"]
+            result["failed"] += chunk_result["failed"]
+        else:
+            return result
+
+    if defect_ids:
+        with ThreadPoolExecutor(max_workers=max(1, min(BULK_WORKERS, len(defect_ids)))) as pool:
+            for defect_id, ok in zip(defect_ids, pool.map(single, defect_ids)):
+                result["succeeded" if ok else "failed"].append(defect_id)
+    return result
+
+def bulk_delete_defects(defect_ids: List[int]) -> Dict[str, List[int]]:
+    """
+    Delete several defects
+
+    Uses POST /defects/bulk/delete when the server provides it, otherwise
+    calls delete_defect concurrently (at most BULK_WORKERS at a time).
+
+    Args:
+        defect_ids: IDs of the defects to delete
+
+    Returns:
+        Dict with succeeded and failed defect ID lists
+    """
+    return _bulk("/defects/bulk/delete", {}, defect_ids, delete_defect)
+
+def bulk_update_defects(defect_ids: List[int], data: Dict[str, Any]) -> Dict[str, List[int]]:
+    """
+    Apply the same update to several defects
+
+    Uses POST /defects/bulk/update when the server provides it, otherwise
+    calls update_defect concurrently (at most BULK_WORKERS at a time).
+
+    Args:
+        defect_ids: IDs of the defects to update
+        data: Fields to update, e.g. {"status": "已完成"}
+
+    Returns:
+        Dict with succeeded and failed defect ID lists
+    """
+    return _bulk("/defects/bulk/update", {"data": data}, defect_ids,
+                 lambda defect_id: bool(update_defect(defect_id, data)))
+
+def bulk_update_defect_status(defect_ids: List[int], status: str) -> Dict[str, List[int]]:
+    """
+    Set the status of several defects
+    """
+    return bulk_update_defects(defect_ids, {"status": status})
+
+def bulk_assign_vendor(defect_ids: List[int], vendor_id: int) -> Dict[str, List[int]]:
+    """
+    Reassign several defects to a vendor
+    """
+    return bulk_update_defects(defect_ids, {"assigned_vendor_id": vendor_id})
+
 def create_defect_mark(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Create a new defect mark
@@ -665,7 +1122,7 @@ def create_defect_mark(data: Dict[str, Any]) -> Dict[str, Any]:
     # }
     
     try:
-        response = requests.post(url, json=data)
+        response = _request("POST", url, json=data)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -675,13 +1132,15 @@ def create_defect_mark(data: Dict[str, Any]) -> Dict[str, Any]:
         return {}
 
 
-def upload_defect_image(defect_id: int, image_file, description: str = "", related_type: str = "defect") -> Dict[str, Any]:
+def upload_defect_image(defect_id: int, image_file, description: str = "", related_type: str = "defect", raise_errors: bool = False) -> Dict[str, Any]:
     """
     Upload an image for a defect (using /photos/ endpoint)
     Args:
         defect_id: ID of the defect
         image_file: Image file to upload (should be file-like object or tuple)
         description: Description for the image
+        raise_errors: Raise the requests exception instead of returning {}
+            (lets callers decide whether to retry)
     Returns:
         Image data including image_id
     """
@@ -695,15 +1154,48 @@ def upload_defect_image(defect_id: int, image_file, description: str = "", relat
             "related_id": str(defect_id),
             "description": description or ""
         }
-        response = requests.post(url, files=files, data=data)
+        response = _request("POST", url, timeout=API_UPLOAD_TIMEOUT, files=files, data=data)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error uploading defect image: {e}")
         if hasattr(e, "response") and e.response is not None:
             print(f"Response content: {e.response.content}")
+        if raise_errors:
+            raise
         return {}
 
+# GET /photos/ 的 limit 上限（openapi.json）
+PHOTOS_PAGE_MAX = 100
+
+def get_photos(related_type: Optional[str] = None, related_id: Optional[int] = None, raise_errors: bool = False) -> List[Dict[str, Any]]:
+    """
+    Get the photos of a defect / improvement, every page
+    Args:
+        related_type: "defect" or "improvement"
+        related_id: ID of the defect / improvement
+        raise_errors: Raise the requests exception instead of returning []
+            (lets callers tell "no photos" from a failed request)
+    Returns:
+        List of photos
+    """
+    url = f"{BASE_URL}/photos/"
+    params = {k: v for k, v in {"related_type": related_type, "related_id": related_id}.items() if v is not None}
+    photos = []
+    try:
+        while True:
+            response = _request("GET", url, params={**params, "skip": len(photos), "limit": PHOTOS_PAGE_MAX})
+            response.raise_for_status()
+            page = response.json()
+            photos.extend(page)
+            if len(page) < PHOTOS_PAGE_MAX:
+                return photos
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching photos: {e}")
+        if raise_errors:
+            raise
+        return []
+
 
 def get_defect_by_unique_code(unique_code: str) -> Dict[str, Any]:
     """
@@ -718,35 +1210,187 @@ def get_defect_by_unique_code(unique_code: str) -> Dict[str, Any]:
     url = f"{BASE_URL}/defects/unique_code/{unique_code}"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching defect by unique code {unique_code}: {e}")
         if hasattr(e, "response") and e.response is not None:
             print(f"Response content: {e.response.content}")
         return {}
 
-def get_defects(project_id: int):
-    url = f"{BASE_URL}/defects/?project_id={project_id}"
+def get_defects(project_id: int, skip: Optional[int] = None, limit: Optional[int] = None, status: Optional[str] = None, defect_category_id: Optional[int] = None, assigned_vendor_id: Optional[int] = None):
+    """
+    Get defects of a project, filtered and paginated on the server
+
+    Args:
+        project_id: ID of the project
+        skip: Number of records to skip (optional)
+        limit: Maximum number of records to return (optional)
+        status: Only defects with this status (optional)
+        defect_category_id: Only defects of this category (optional)
+        assigned_vendor_id: Only defects assigned to this vendor (optional)
+
+    Returns:
+        List of defects
+    """
+    url = f"{BASE_URL}/defects/"
+    params = {
+        "project_id": project_id,
+        "skip": skip,
+        "limit": limit,
+        "status": status,
+        "defect_category_id": defect_category_id,
+        "assigned_vendor_id": assigned_vendor_id,
+    }
+    params = {k: v for k, v in params.items() if v is not None}
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url, params=params)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching defects: {e}")
         if hasattr(e, "response") and e.response is not None:
             print(f"Response content: {e.response.content}")
         return []
         
+# /defects/stats 回傳格式不固定，以下列鍵名依序尋找
+_STATS_KEYS = {
+    "total": ("total", "total_defects", "total_count", "count"),
+    "completed": ("completed", "completed_defects", "completed_count"),
+    "in_progress": ("in_progress", "in_progress_defects", "in_progress_count"),
+    "overdue": ("overdue", "overdue_defects", "overdue_count"),
+    "status_counts": ("status_counts", "by_status", "status", "statuses"),
+    "urgency_counts": ("urgency_counts", "by_urgency", "urgency"),
+}
+_STATS_LABEL_KEYS = ("status", "urgency", "label", "name", "key")
+_STATS_COUNT_KEYS = ("count", "total", "value", "n")
+_DEFECT_STATUSES = ("等待中", "改善中", "待確認", "已完成", "已取消")
+
+def _stats_value(data: Dict[str, Any], field: str) -> Any:
+    return next((data[k] for k in _STATS_KEYS[field] if data.get(k) is not None), None)
+
+def _count_map(value: Any) -> Dict[str, int]:
+    """
+    {label: count} from a dict or a list of {label, count} records
+    """
+    if isinstance(value, dict):
+        return {str(k): int(v) for k, v in value.items() if isinstance(v, (int, float))}
+    counts = {}
+    if isinstance(value, list):
+        for item in value:
+            if not isinstance(item, dict):
+                continue
+            label = next((item[k] for k in _STATS_LABEL_KEYS if k in item), None)
+            count = next((item[k] for k in _STATS_COUNT_KEYS if isinstance(item.get(k), (int, float))), None)
+            if label is not None and count is not None:
+                counts[str(label)] = int(count)
+    return counts
+
+def normalize_defect_stats(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Map a /defects/stats response onto fixed keys
+
+    Returns:
+        Dict with total, completed, in_progress, overdue (int or None when
+        the server does not report it), status_counts and urgency_counts
+        ({label: count}, empty when not reported)
+    """
+    status_counts = _count_map(_stats_value(data, "status_counts"))
+    if not status_counts:
+        # 狀態名稱直接放在最上層，例如 {"total": 10, "已完成": 4}
+        status_counts = {k: int(v) for k, v in data.items() if k in _DEFECT_STATUSES and isinstance(v, (int, float))}
+
+    def count(field: str, status: Optional[str] = None) -> Optional[int]:
+        value = _stats_value(data, field)
+        if isinstance(value, (int, float)):
+            return int(value)
+        if status is not None and status_counts:
+            return status_counts.get(status, 0)
+        return None
+
+    total = count("total")
+    if total is None and status_counts:
+        total = sum(status_counts.values())
+
+    return {
+        "total": total,
+        "completed": count("completed", "已完成"),
+        "in_progress": count("in_progress", "改善中"),
+        "overdue": count("overdue"),
+        "status_counts": status_counts,
+        "urgency_counts": _count_map(_stats_value(data, "urgency_counts")),
+    }
+
+# GET /defects/ 的 limit 上限（openapi.json）
+DEFECTS_PAGE_MAX = 100
+
+def get_defects_page(project_id: int, skip: int = 0, limit: int = DEFECTS_PAGE_MAX, etag: Optional[str] = None) -> Optional[Tuple[Optional[List[Dict[str, Any]]], Optional[str]]]:
+    """
+    Get one page of a project's defects, revalidated with the caller's ETag
+
+    The caller keeps the ETag (and whatever it needs from the page); no
+    body is kept in the shared validator cache, so a sync over every page
+    of a project does not hold the project in memory a second time.
+    Unlike get_defects, errors are not turned into an empty list, so a
+    sync can tell an empty page from a failed request.
+
+    Args:
+        project_id: ID of the project
+        skip: Number of records to skip
+        limit: Page size (at most DEFECTS_PAGE_MAX)
+        etag: ETag of the caller's copy of the page
+
+    Returns:
+        (defects, etag), with defects None when the server answered
+        304 Not Modified; None on error
+    """
+    url = f"{BASE_URL}/defects/"
+    params = {"project_id": project_id, "skip": skip, "limit": min(limit, DEFECTS_PAGE_MAX)}
+    headers = {"If-None-Match": etag} if etag else {}
+
+    try:
+        response = _request("GET", url, params=params, headers=headers)
+        if response.status_code == 304 and etag:
+            with _conditional_stats_lock:
+                _conditional_stats["hits"] += 1
+            return None, etag
+        response.raise_for_status()
+        with _conditional_stats_lock:
+            _conditional_stats["misses"] += 1
+            _conditional_stats["bytes_received"] += len(response.content)
+        return response.json(), response.headers.get("ETag")
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching defects page (skip={skip}): {e}")
+        if hasattr(e, "response") and e.response is not None:
+            print(f"Response content: {e.response.content}")
+        return None
+
+def get_defect_stats(project_id: int) -> Dict[str, Any]:
+    """
+    Get server-side defect aggregates of a project (GET /defects/stats)
+
+    Args:
+        project_id: ID of the project
+
+    Returns:
+        normalize_defect_stats() of the response, or {} on error or when
+        the response has no recognizable total
+    """
+    url = f"{BASE_URL}/defects/stats"
+    
+    try:
+        data = _get_json(url, params={"project_id": project_id})
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching defect stats: {e}")
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    stats = normalize_defect_stats(data)
+    return stats if stats["total"] is not None else {}
+
 def get_defect(defect_id: int,with_marks: bool=False,with_photos: bool=False,with_improvements: bool=False,with_full_related: bool=False):
     url = f"{BASE_URL}/defects/{defect_id}?with_marks={with_marks}&with_photos={with_photos}&with_improvements={with_improvements}&with_full_related={with_full_related}"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return _get_json(url)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching defect {defect_id}: {e}")
         if hasattr(e, "response") and e.response is not None:
@@ -774,7 +1418,7 @@ def create_improvement_by_unique_code(unique_code: str, content: str, improvemen
     }
     
     try:
-        response = requests.post(url, json=payload)
+        response = _request("POST", url, json=payload)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
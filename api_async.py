@@ -0,0 +1,110 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict
+import api
+
+# Async API client
+#
+# 每個函式都對應 api.py 中的同名函式，在執行緒中透過共用的連線池送出請求，
+# 因此錯誤處理與回傳值與 api.py 完全相同。Streamlit 頁面可用 fetch_all()
+# 一次並行取得所有互不相依的資料。
+
+def _wrap(func: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return wrapper
+
+# Project API functions
+create_project = _wrap(api.create_project)
+create_project_image = _wrap(api.create_project_image)
+get_projects = _wrap(api.get_projects)
+get_project = _wrap(api.get_project)
+update_project = _wrap(api.update_project)
+delete_project = _wrap(api.delete_project)
+get_project_with_counts = _wrap(api.get_project_with_counts)
+get_user_projects = _wrap(api.get_user_projects)
+get_project_with_roles = _wrap(api.get_project_with_roles)
+
+#-----權限------
+create_permission = _wrap(api.create_permission)
+get_permissions = _wrap(api.get_permissions)
+get_project_by_email = _wrap(api.get_project_by_email)
+get_project_summaries = _wrap(api.get_project_summaries)
+delete_permission = _wrap(api.delete_permission)
+update_permission = _wrap(api.update_permission)
+
+#-------用戶--------
+get_users = _wrap(api.get_users)
+create_user = _wrap(api.create_user)
+update_user = _wrap(api.update_user)
+delete_user = _wrap(api.delete_user)
+
+#-------廠商--------
+get_vendors = _wrap(api.get_vendors)
+create_vendor = _wrap(api.create_vendor)
+update_vendor = _wrap(api.update_vendor)
+delete_vendor = _wrap(api.delete_vendor)
+
+#--------缺失分類---------
+get_defect_categories = _wrap(api.get_defect_categories)
+create_defect_category = _wrap(api.create_defect_category)
+update_defect_category = _wrap(api.update_defect_category)
+delete_defect_category = _wrap(api.delete_defect_category)
+
+#--------底圖---------
+create_basemap = _wrap(api.create_basemap)
+get_basemap = _wrap(api.get_basemap)
+get_basemaps = _wrap(api.get_basemaps)
+create_basemap_image = _wrap(api.create_basemap_image)
+update_basemap = _wrap(api.update_basemap)
+delete_basemap = _wrap(api.delete_basemap)
+
+#--------缺失---------
+create_defect = _wrap(api.create_defect)
+delete_defect = _wrap(api.delete_defect)
+update_defect = _wrap(api.update_defect)
+create_defect_mark = _wrap(api.create_defect_mark)
+upload_defect_image = _wrap(api.upload_defect_image)
+get_defect_by_unique_code = _wrap(api.get_defect_by_unique_code)
+get_defects = _wrap(api.get_defects)
+get_defects_page = _wrap(api.get_defects_page)
+get_defect = _wrap(api.get_defect)
+get_defect_stats = _wrap(api.get_defect_stats)
+bulk_delete_defects = _wrap(api.bulk_delete_defects)
+bulk_update_defects = _wrap(api.bulk_update_defects)
+bulk_update_defect_status = _wrap(api.bulk_update_defect_status)
+bulk_assign_vendor = _wrap(api.bulk_assign_vendor)
+create_improvement_by_unique_code = _wrap(api.create_improvement_by_unique_code)
+
+
+async def gather(**calls: Awaitable[Any]) -> Dict[str, Any]:
+    """
+    Await several API calls concurrently
+
+    Args:
+        **calls: name -> awaitable, e.g. project=get_project(1)
+
+    Returns:
+        Dict mapping each name to its result
+    """
+    results = await asyncio.gather(*calls.values())
+    return dict(zip(calls.keys(), results))
+
+def fetch_all(**calls: Awaitable[Any]) -> Dict[str, Any]:
+    """
+    Run gather() from synchronous code (e.g. a Streamlit page)
+
+    Example:
+        data = fetch_all(
+            project=get_project(project_id),
+            vendors=get_vendors(),
+        )
+
+    Args:
+        **calls: name -> awaitable
+
+    Returns:
+        Dict mapping each name to its result
+    """
+    return asyncio.run(gather(**calls))
@@ -0,0 +1,268 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+import api
+
+# API 請求量測：依路由樣板彙總延遲與流量，可輸出 Prometheus 文字格式或 JSON lines
+
+API_METRICS_PORT = os.environ.get('API_METRICS_PORT')      # 設定後啟動 /metrics 端點
+API_METRICS_JSONL = os.environ.get('API_METRICS_JSONL')    # 設定後逐筆寫入 JSON lines
+API_METRICS_SAMPLES = int(os.environ.get('API_METRICS_SAMPLES', 2048))  # 每個路由保留的延遲樣本數
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OPENAPI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'openapi.json')
+# api.py 有使用但 openapi.json 未列出的路由
+EXTRA_ROUTE_TEMPLATES = [
+    '/defects/unique_code/{unique_code}',
+    '/improvements/by-unique-code/{unique_code}',
+    '/defects/bulk/delete',
+    '/defects/bulk/update',
+]
+
+def _load_route_templates(path: str = OPENAPI_PATH) -> List[Tuple[re.Pattern, str]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            templates = list(json.load(f).get('paths', {}))
+    except (OSError, ValueError):
+        templates = []
+    templates += [t for t in EXTRA_ROUTE_TEMPLATES if t not in templates]
+    # 固定路徑優先，例如 /defects/stats 先於 /defects/{defect_id}
+    templates.sort(key=lambda t: (t.count('{'), -len(t)))
+    return [
+        (re.compile('^' + re.sub(r'\\\{[^/]+?\\\}', '[^/]+', re.escape(t)) + '/?$'), t)
+        for t in templates
+    ]
+
+_route_templates = _load_route_templates()
+
+def route_template(path: str) -> str:
+    """
+    Route template of a request path, e.g. /defects/12 -> /defects/{defect_id}
+
+    Paths missing from openapi.json get their numeric segments replaced by {id}.
+    """
+    for pattern, template in _route_templates:
+        if pattern.match(path):
+            return template
+    return re.sub(r'/\d+(?=/|$)', '/{id}', path)
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    # nearest-rank
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+class RouteStats:
+    """
+    Counters, a cumulative latency histogram and recent latency samples of one route
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.statuses: Counter = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds_sum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.samples: deque = deque(maxlen=API_METRICS_SAMPLES)
+
+    def add(self, event: Dict[str, Any]) -> None:
+        seconds = event['seconds']
+        self.count += 1
+        status = event.get('status')
+        if status is None or status >= 400:
+            self.errors += 1
+        self.statuses[str(status) if status is not None else 'error'] += 1
+        self.bytes_in += event.get('bytes_in', 0)
+        self.bytes_out += event.get('bytes_out', 0)
+        self.seconds_sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+        self.samples.append(seconds)
+
+class MetricsRegistry:
+    """
+    In-process aggregation of api request events per (method, route)
+
+    record() is registered with api.add_request_hook; summary() gives
+    p50/p95/p99 from the most recent samples of each route.
+    """
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, event: Dict[str, Any]) -> None:
+        key = (event['method'], route_template(event['path']))
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = RouteStats()
+            stats.add(event)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        One row per route, slowest p95 first
+
+        Returns:
+            method, route, count, errors, statuses, bytes_in, bytes_out,
+            mean_ms, p50_ms, p95_ms, p99_ms and total_seconds
+        """
+        rows = []
+        with self._lock:
+            for (method, route), stats in self._routes.items():
+                samples = sorted(stats.samples)
+                row = {
+                    'method': method,
+                    'route': route,
+                    'count': stats.count,
+                    'errors': stats.errors,
+                    'statuses': dict(stats.statuses),
+                    'bytes_in': stats.bytes_in,
+                    'bytes_out': stats.bytes_out,
+                    'mean_ms': round(stats.seconds_sum / stats.count * 1000, 2),
+                    'total_seconds': round(stats.seconds_sum, 3),
+                }
+                for q in (50, 95, 99):
+                    row[f'p{q}_ms'] = round(_percentile(samples, q) * 1000, 2)
+                rows.append(row)
+        return sorted(rows, key=lambda r: r['p95_ms'], reverse=True)
+
+    def prometheus_text(self) -> str:
+        """
+        Metrics in the Prometheus text exposition format
+        """
+        lines = [
+            '# HELP api_request_duration_seconds Backend API request latency seen by the frontend',
+            '# TYPE api_request_duration_seconds histogram',
+        ]
+        totals = []
+        with self._lock:
+            for (method, route), stats in sorted(self._routes.items()):
+                labels = f'method="{method}",route="{route}"'
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    lines.append(f'api_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'api_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f'api_request_duration_seconds_sum{{{labels}}} {stats.seconds_sum}')
+                lines.append(f'api_request_duration_seconds_count{{{labels}}} {stats.count}')
+                totals.append((labels, stats))
+
+        for name, help_text, attr in [
+            ('api_request_errors_total', 'Requests without a response or with status >= 400', 'errors'),
+            ('api_request_bytes_in_total', 'Response body bytes received', 'bytes_in'),
+            ('api_request_bytes_out_total', 'Request body bytes sent', 'bytes_out'),
+        ]:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for labels, stats in totals:
+                lines.append(f'{name}{{{labels}}} {getattr(stats, attr)}')
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+class JsonLinesWriter:
+    """
+    Request hook appending every event as one JSON line
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Dict[str, Any]) -> None:
+        line = json.dumps({
+            'time': time.time(),
+            **{k: v for k, v in event.items() if k != 'url'},
+            'route': route_template(event['path']),
+        }, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body = registry.prometheus_text().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/metrics.json':
+            body = json.dumps(registry.summary(), ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server: Optional[ThreadingHTTPServer] = None
+_jsonl_writers: Dict[str, JsonLinesWriter] = {}
+_enable_lock = threading.Lock()
+
+def start_http_server(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """
+    Serve /metrics (Prometheus) and /metrics.json (summary) from a daemon thread
+
+    Only one server is started per process; later calls return it.
+    """
+    global _server
+    with _enable_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='api-metrics', daemon=True).start()
+        return _server
+
+def enable(port: Optional[int] = None, jsonl_path: Optional[str] = None) -> MetricsRegistry:
+    """
+    Start recording api requests (idempotent, safe on every Streamlit rerun)
+
+    Args:
+        port: Also serve the Prometheus endpoint on this port
+        jsonl_path: Also append every request to this JSON lines file
+
+    Returns:
+        The shared registry
+    """
+    api.add_request_hook(registry.record)
+    if jsonl_path:
+        with _enable_lock:
+            if jsonl_path not in _jsonl_writers:
+                _jsonl_writers[jsonl_path] = JsonLinesWriter(jsonl_path)
+                api.add_request_hook(_jsonl_writers[jsonl_path])
+    if port:
+        start_http_server(int(port))
+    return registry
+
+def disable() -> None:
+    """
+    Stop recording (the HTTP endpoint keeps serving the last values)
+    """
+    api.remove_request_hook(registry.record)
+    with _enable_lock:
+        for writer in _jsonl_writers.values():
+            api.remove_request_hook(writer)
+        _jsonl_writers.clear()
+
+def enable_from_env() -> Optional[MetricsRegistry]:
+    """
+    enable() when API_METRICS_PORT or API_METRICS_JSONL is set
+    """
+    if not (API_METRICS_PORT or API_METRICS_JSONL):
+        return None
+    return enable(port=int(API_METRICS_PORT) if API_METRICS_PORT else None, jsonl_path=API_METRICS_JSONL)
@@ -0,0 +1,211 @@
+import io
+import json
+import math
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple, Union
+from PIL import Image, ImageDraw
+from image_cache import IMAGE_CACHE_DIR, TILES_DIR, cache_key, drop_decoded, fetch_image_bytes, get_decoded, touch, write_atomic
+
+# 底圖切片金字塔：level 0 為原始解析度，每往上一層長寬減半，直到整張圖只剩一塊切片
+TILE_SIZE = 256
+TILE_FORMAT = "PNG"
+BASEMAP_VIEW_WIDTH = int(os.environ.get('BASEMAP_VIEW_WIDTH', 1200))
+# 切片在背景執行緒建立，不佔用頁面的執行時間
+BASEMAP_TILE_WORKERS = int(os.environ.get('BASEMAP_TILE_WORKERS', 1))
+
+_builder = ThreadPoolExecutor(max_workers=BASEMAP_TILE_WORKERS, thread_name_prefix="basemap-tiles")
+_building: Dict[str, Future] = {}
+_building_lock = threading.Lock()
+
+def _pyramid_dir(url: str) -> str:
+    return os.path.join(IMAGE_CACHE_DIR, TILES_DIR, cache_key(url))
+
+def _tile_path(pyramid_dir: str, level: int, col: int, row: int) -> str:
+    return os.path.join(pyramid_dir, str(level), f"{col}_{row}.png")
+
+def level_size(meta: Dict[str, Any], level: int) -> Tuple[int, int]:
+    """
+    Pixel size of a pyramid level
+    """
+    factor = 2 ** level
+    return math.ceil(meta["width"] / factor), math.ceil(meta["height"] / factor)
+
+def build_pyramid(url: str, image: Union[Image.Image, bytes]) -> Dict[str, Any]:
+    """
+    Cut a basemap into TILE_SIZE tiles at every zoom level
+
+    Args:
+        url: Basemap URL (BASE_URL + file_path), used as the cache key
+        image: Decoded image or the encoded file bytes
+
+    Returns:
+        Pyramid metadata: width, height, levels, tile_size
+    """
+    if isinstance(image, bytes):
+        image = Image.open(io.BytesIO(image))
+    level_img = image.convert("RGBA")
+
+    pyramid_dir = _pyramid_dir(url)
+    meta = {
+        "width": level_img.width,
+        "height": level_img.height,
+        "levels": max(1, math.ceil(math.log2(max(level_img.width, level_img.height) / TILE_SIZE)) + 1),
+        "tile_size": TILE_SIZE,
+    }
+
+    for level in range(meta["levels"]):
+        if level > 0:
+            level_img = level_img.resize(level_size(meta, level), Image.LANCZOS)
+        for row in range(math.ceil(level_img.height / TILE_SIZE)):
+            for col in range(math.ceil(level_img.width / TILE_SIZE)):
+                box = (col * TILE_SIZE, row * TILE_SIZE,
+                       min((col + 1) * TILE_SIZE, level_img.width),
+                       min((row + 1) * TILE_SIZE, level_img.height))
+                buf = io.BytesIO()
+                level_img.crop(box).save(buf, format=TILE_FORMAT)
+                write_atomic(_tile_path(pyramid_dir, level, col, row), buf.getvalue())
+
+    # meta.json 最後寫入，存在即代表金字塔完整
+    write_atomic(os.path.join(pyramid_dir, "meta.json"), json.dumps(meta).encode("utf-8"))
+    drop_decoded(url)
+    return meta
+
+def _build(url: str, image: Union[Image.Image, bytes, None]) -> Dict[str, Any]:
+    return build_pyramid(url, image if image is not None else fetch_image_bytes(url))
+
+def _done(url: str, future: Future) -> None:
+    with _building_lock:
+        if _building.get(url) is future:
+            del _building[url]
+
+def schedule_pyramid(url: str, image: Union[Image.Image, bytes, None] = None) -> Future:
+    """
+    Build a basemap's pyramid on the background worker
+
+    A build already running for the URL is reused.
+
+    Args:
+        url: Basemap URL
+        image: Decoded image or file bytes; downloaded (or read from the
+            disk cache) when omitted
+
+    Returns:
+        Future resolving to the pyramid metadata
+    """
+    with _building_lock:
+        future = _building.get(url)
+        if future is None:
+            future = _builder.submit(_build, url, image)
+            _building[url] = future
+            future.add_done_callback(lambda f: _done(url, f))
+        return future
+
+def get_pyramid(url: str, wait: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Get pyramid metadata, scheduling the build on first use
+
+    Args:
+        url: Basemap URL
+        wait: Wait for a missing pyramid to be built; otherwise return None
+            while it is being built in the background
+    """
+    meta_path = os.path.join(_pyramid_dir(url), "meta.json")
+    if os.path.exists(meta_path):
+        touch(meta_path)  # 磁碟快取依此判斷金字塔最近是否使用
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    future = schedule_pyramid(url)
+    return future.result() if wait else None
+
+def _load_tile(url: str, level: int, col: int, row: int) -> Image.Image:
+    # 與其他已解碼影像共用 IMAGE_CACHE_MAX_MB 的記憶體上限
+    def load() -> Image.Image:
+        with Image.open(_tile_path(_pyramid_dir(url), level, col, row)) as tile:
+            return tile.convert("RGBA")
+    return get_decoded((url, f"tile/{level}/{col}_{row}"), load)
+
+def _draft_overview(url: str, max_width: int) -> Tuple[Image.Image, float]:
+    # 切片尚未建立時的暫代畫面：JPEG 以縮小的解析度解碼，不必展開整張大圖
+    def load() -> Image.Image:
+        with Image.open(io.BytesIO(fetch_image_bytes(url))) as src:
+            full_width = src.width
+            src.draft("RGB", (max_width, max(1, max_width * src.height // src.width)))
+            img = src.convert("RGBA")
+        img.thumbnail((max_width, img.height), Image.LANCZOS)
+        img.info["scale"] = img.width / full_width
+        return img
+    img = get_decoded((url, f"overview/{max_width}"), load)
+    return img.copy(), img.info["scale"]
+
+def render_region(url: str, level: int, box: Tuple[int, int, int, int]) -> Image.Image:
+    """
+    Compose only the tiles that intersect a region of one level
+
+    Args:
+        url: Basemap URL
+        level: Pyramid level (0 = full resolution)
+        box: (left, top, right, bottom) in that level's pixels
+
+    Returns:
+        RGBA image of the region
+    """
+    meta = get_pyramid(url)
+    width, height = level_size(meta, level)
+    left, top = max(0, int(box[0])), max(0, int(box[1]))
+    right, bottom = min(width, int(box[2])), min(height, int(box[3]))
+
+    region = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)))
+    for row in range(top // TILE_SIZE, math.ceil(bottom / TILE_SIZE)):
+        for col in range(left // TILE_SIZE, math.ceil(right / TILE_SIZE)):
+            tile = _load_tile(url, level, col, row)
+            region.paste(tile, (col * TILE_SIZE - left, row * TILE_SIZE - top))
+    return region
+
+def render_overview(url: str, max_width: int = BASEMAP_VIEW_WIDTH) -> Tuple[Image.Image, float]:
+    """
+    Render the whole basemap from the most detailed level no wider than max_width
+
+    While the pyramid is still being built in the background, a reduced
+    decode of the whole file is shown instead.
+
+    Returns:
+        (image, scale) where scale converts full-resolution coordinates
+        into overview coordinates
+    """
+    meta = get_pyramid(url, wait=False)
+    if meta is None:
+        return _draft_overview(url, max_width)
+    level = 0
+    while level < meta["levels"] - 1 and level_size(meta, level)[0] > max_width:
+        level += 1
+    width, height = level_size(meta, level)
+    return render_region(url, level, (0, 0, width, height)), width / meta["width"]
+
+def render_overview_with_marker(url: str, x: Optional[float], y: Optional[float], max_width: int = BASEMAP_VIEW_WIDTH, radius: int = 15) -> Tuple[Image.Image, float]:
+    """
+    Overview of a basemap with a red circle at full-resolution (x, y)
+
+    Returns:
+        (image, scale); divide clicked overview coordinates by scale to get
+        full-resolution coordinates
+    """
+    img, scale = render_overview(url, max_width)
+    if x is not None and y is not None:
+        cx, cy = x * scale, y * scale
+        draw = ImageDraw.Draw(img)
+        draw.ellipse((cx - radius, cy - radius, cx + radius, cy + radius), outline="red", width=4)
+    return img, scale
+
+def render_marker_detail(url: str, x: float, y: float, size: int = 512, radius: int = 15) -> Image.Image:
+    """
+    Full-resolution crop centred on a mark, composed from level-0 tiles only
+    """
+    half = size // 2
+    left, top = int(x) - half, int(y) - half
+    img = render_region(url, 0, (left, top, left + size, top + size))
+    cx, cy = x - max(0, left), y - max(0, top)
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((cx - radius, cy - radius, cx + radius, cy + radius), outline="red", width=4)
+    return img
@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
+import api
+import api_async
+import api_metrics
+import defect_snapshot
+import defect_store
+from defect_frame import MemoryBudgetExceeded, check_memory_budget, enrich_defects, memory_mb, vendor_performance
+from mock_backend import MockDataset, start_mock_backend
+
+# 離線效能測試：對模擬後端 (mock_backend) 執行 api.py 與頁面資料處理，記錄各情境耗時
+#
+#   python benchmark.py --defects 100000 --photos 5000 --latency-ms 20 --jitter-ms 10
+#   python benchmark.py --base-url http://localhost:8000 --project-id 1   # 對既有後端（只讀）
+
+BENCHMARK_DIR = os.environ.get('BENCHMARK_DIR', os.path.join('.cache', 'benchmarks'))
+# 缺失清單頁未選任何篩選時的查詢參數（view_defects.get_filters）
+NO_FILTERS = {'status': None, 'defect_category_id': None, 'assigned_vendor_id': None}
+
+class Scenario:
+    """
+    One timed step; setup() runs before every repetition and is not timed
+    """
+
+    def __init__(self, name: str, run: Callable[[], Any], setup: Optional[Callable[[], None]] = None, repeat: Optional[int] = None, writes: bool = False):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.repeat = repeat
+        self.writes = writes
+
+def _time(scenario: Scenario, repeat: int) -> Dict[str, Any]:
+    api_metrics.registry.reset()
+    api.reset_conditional_stats()
+    timings = []
+    result = None
+    for _ in range(scenario.repeat or repeat):
+        if scenario.setup:
+            scenario.setup()
+        start = time.perf_counter()
+        result = scenario.run()
+        timings.append((time.perf_counter() - start) * 1000)
+    requests_made = sum(row['count'] for row in api_metrics.registry.summary())
+    return {
+        'name': scenario.name,
+        'runs': len(timings),
+        'min_ms': round(min(timings), 2),
+        'median_ms': round(statistics.median(timings), 2),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'max_ms': round(max(timings), 2),
+        'requests_per_run': round(requests_made / len(timings), 1),
+        'conditional': api.get_conditional_stats(),
+        'result': _describe(result),
+    }
+
+def _describe(result: Any) -> Any:
+    # 只記錄結果的大小，避免輸出整份資料
+    if hasattr(result, 'memory_usage') and len(getattr(result, 'shape', ())) == 2:
+        return {'rows': int(result.shape[0]), 'columns': int(result.shape[1]), 'memory_mb': memory_mb(result)}
+    if isinstance(result, dict):
+        return {k: (len(v) if isinstance(v, (list, dict)) else v) for k, v in result.items() if not isinstance(v, (str, bytes)) or len(v) < 40}
+    if isinstance(result, list):
+        return {'items': len(result)}
+    return result
+
+def _cold() -> None:
+    # 清除快取與 ETag 驗證資料，量測完整往返
+    api.invalidate_cache()
+    api._validators.clear()
+
+def build_scenarios(project_id: int, user_email: str) -> List[Scenario]:
+    """
+    The benchmarked steps, in the order a user opens the pages
+    """
+    stores: Dict[str, defect_store.DefectStore] = {}
+    frames: Dict[int, Any] = {}  # store.version -> DataFrame
+    raw: Dict[str, Any] = {}
+
+    def new_store() -> None:
+        defect_snapshot.delete_snapshot(project_id)
+        _cold()
+        stores['current'] = defect_store.DefectStore(project_id)
+        # 讓 query_defects（清單頁的本地查詢）使用同一個 store
+        with defect_store._stores_lock:
+            defect_store._stores[project_id] = stores['current']
+
+    def loaded_df():
+        # 用作 setup 時先取出，計時中不含 to_df 的複製
+        store = stores['current']
+        if store.version not in frames:
+            frames.clear()
+            frames[store.version] = store.to_df()
+        return frames[store.version]
+
+    def raw_copy() -> None:
+        # enrich_defects 會就地轉型，每次都從未轉型的副本開始
+        raw['df'] = loaded_df().copy()
+
+    def sample_ids(n: int) -> List[int]:
+        return loaded_df()['defect_id'].head(n).astype(int).tolist()
+
+    def list_page(filters: Optional[Dict[str, Any]] = None, search_text: str = '', skip: int = 0):
+        # 與 view_defects.get_defects_df 相同的查詢路徑
+        return defect_store.query_defects(project_id, {**NO_FILTERS, **(filters or {})}, search_text, skip, api.DEFECTS_PAGE_MAX)[0]
+
+    def last_page_skip() -> int:
+        total = len(stores['current'].records)
+        return max(total - 1, 0) // api.DEFECTS_PAGE_MAX * api.DEFECTS_PAGE_MAX
+
+    scenarios = [
+        # 工程列表頁（view_projects.display_projects_card）：首次開啟與之後每次重新執行
+        Scenario('project_summaries', lambda: api.get_project_summaries(user_email), setup=_cold),
+        Scenario('project_summaries_rerun', lambda: api.get_project_summaries(user_email)),
+        Scenario('defect_stats', lambda: api.get_defect_stats(project_id), setup=_cold),
+        Scenario('defects_first_page', lambda: api.get_defects(project_id, skip=0, limit=100), setup=_cold),
+        Scenario('defects_page_revalidated', lambda: api.get_defects(project_id, skip=0, limit=100)),
+        Scenario('store_sync_cold', lambda: stores['current'].refresh(), setup=new_store, repeat=1),
+        Scenario('store_sync_warm', lambda: stores['current'].refresh()),
+        Scenario('store_to_df', lambda: stores['current'].to_df()),
+        # 缺失清單頁（view_defects.get_defects_df）：伺服器分頁與本地查詢
+        Scenario('list_page_first', lambda: list_page(), setup=_cold),
+        Scenario('list_page_first_rerun', lambda: list_page()),
+        Scenario('list_page_status_filter', lambda: list_page({'status': '改善中'}), setup=_cold),
+        Scenario('list_page_last', lambda: list_page(skip=last_page_skip()), setup=_cold),
+        Scenario('list_page_unset_status', lambda: list_page({'status': defect_store.UNSET_STATUS})),
+        Scenario('list_page_search', lambda: list_page(search_text='漏水')),
+        Scenario('enrich_defects', lambda: enrich_defects(raw['df']), setup=raw_copy),
+        Scenario('vendor_performance', lambda: vendor_performance(enrich_defects(raw['df'])), setup=raw_copy),
+        Scenario('search_index', lambda: stores['current'].search('漏水')),
+        Scenario('defect_detail', lambda: api.get_defect(sample_ids(1)[0], with_marks=True, with_photos=True, with_improvements=True, with_full_related=True), setup=_cold),
+        Scenario('fetch_all_page_data', lambda: api_async.fetch_all(
+            project=api_async.get_project(project_id),
+            vendors=api_async.get_vendors(),
+            categories=api_async.get_defect_categories(),
+            basemaps=api_async.get_basemaps(project_id),
+            stats=api_async.get_defect_stats(project_id),
+        ), setup=_cold),
+        Scenario('bulk_status_update_200', lambda: api.bulk_update_defect_status(sample_ids(200), '改善中'), repeat=1, writes=True),
+        Scenario('store_sync_after_update', lambda: stores['current'].refresh(), repeat=1),
+    ]
+    if defect_snapshot.available():
+        scenarios.insert(6, Scenario('store_snapshot_load', lambda: defect_store.DefectStore(project_id)))
+    return scenarios
+
+def run_benchmark(base_url: str, project_id: int = 1, user_email: str = 'user1@example.com', repeat: int = 5, writes: bool = True) -> Dict[str, Any]:
+    """
+    Run every scenario against base_url
+
+    Args:
+        base_url: Backend to benchmark (mock or real)
+        project_id: Project whose defects are loaded
+        user_email: User for the project list
+        repeat: Repetitions per scenario (some scenarios run once)
+        writes: Also run scenarios that modify data
+
+    Returns:
+        Per-scenario timings and the per-route api_metrics summary
+    """
+    api.BASE_URL = base_url
+    api.close_session()
+    _cold()
+    api_metrics.enable()
+
+    results = []
+    routes: List[Dict[str, Any]] = []
+    for scenario in build_scenarios(project_id, user_email):
+        if scenario.writes and not writes:
+            continue
+        row = _time(scenario, repeat)
+        routes.extend({'scenario': scenario.name, **route} for route in api_metrics.registry.summary())
+        print(f"{row['name']:<28} median {row['median_ms']:>10.1f} ms  min {row['min_ms']:>10.1f} ms  requests/run {row['requests_per_run']}")
+        results.append(row)
+    api_metrics.disable()
+    return {'scenarios': results, 'routes': routes}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark api.py and the page data functions against the mock backend')
+    parser.add_argument('--base-url', help='Benchmark an existing backend instead of starting the mock (read-only)')
+    parser.add_argument('--project-id', type=int, default=1)
+    parser.add_argument('--user-email', default='user1@example.com')
+    parser.add_argument('--defects', type=int, default=100_000)
+    parser.add_argument('--photos', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--base-date', type=date.fromisoformat, help='Day the mock defect dates are generated around, YYYY-MM-DD (default: today)')
+    parser.add_argument('--latency-ms', type=float, default=5)
+    parser.add_argument('--jitter-ms', type=float, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='JSON result file (default: BENCHMARK_DIR/benchmark-<time>.json)')
+    args = parser.parse_args()
+
+    # 快照寫到暫存目錄，不影響正式的 .cache/defects
+    defect_snapshot.DEFECT_SNAPSHOT_DIR = tempfile.mkdtemp(prefix='defect-snapshots-')
+
+    config = {k: v for k, v in vars(args).items() if k != 'output'}
+    config['base_date'] = args.base_date.isoformat() if args.base_date else None
+    server = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        start = time.perf_counter()
+        dataset = MockDataset().seed(defects=args.defects, photos=args.photos, seed=args.seed, base_date=args.base_date)
+        config['seed_seconds'] = round(time.perf_counter() - start, 2)
+        server = start_mock_backend(dataset, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+        base_url = server.base_url
+        print(f"Mock backend on {base_url} with {args.defects} defects (seeded in {config['seed_seconds']}s)")
+
+    try:
+        report = run_benchmark(base_url, args.project_id, args.user_email, args.repeat, writes=server is not None)
+    finally:
+        if server is not None:
+            config['server_requests'] = server.request_count
+            server.shutdown()
+
+    try:
+        memory = check_memory_budget()
+    except MemoryBudgetExceeded as e:
+        memory = {'error': str(e)}
+    print(f"memory budget: {memory}")
+
+    report = {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': config,
+        **report,
+        'memory': memory,
+    }
+    output = args.output or os.path.join(BENCHMARK_DIR, f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {output}")
+    if 'error' in memory:
+        raise SystemExit(memory['error'])
+
+if __name__ == "__main__":
+    main()
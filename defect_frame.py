@@ -0,0 +1,400 @@
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from utils import (
+    get_urgency_class, get_status_class,
+    STATUS_CLASSES, STATUS_CLASS_UNSET,
+    URGENCY_CLASSES, URGENCY_CLASS_UNSET, URGENCY_CLASS_UNKNOWN,
+)
+
+# 缺失 DataFrame 共用的欄位計算（缺失列表、儀表板皆使用）
+
+# 欄位型別：編號用 int32（可能為空的用 Int32）、低基數文字用 category、日期用 datetime64
+DEFECT_DTYPES = {
+    'defect_id': 'int32',
+    'project_id': 'int32',
+    'submitted_id': 'Int32',
+    'defect_category_id': 'Int32',
+    'assigned_vendor_id': 'Int32',
+    'responsible_vendor_id': 'Int32',
+    'previous_defect_id': 'Int32',
+    'confirmer_id': 'Int32',
+    'status': 'category',
+    'category_name': 'category',
+    'assigned_vendor_name': 'category',
+    'responsible_vendor_name': 'category',
+    'urgency_class': 'category',
+    'status_class': 'category',
+    'created_at': 'datetime64[ns]',
+    'updated_at': 'datetime64[ns]',
+    'expected_completion_day': 'datetime64[ns]',
+    'urgency_days': 'float32',
+    'repair_days': 'float32',
+}
+
+# 200k 筆缺失的記憶體預算（MB）：轉型後的 DataFrame，以及從 JSON 紀錄到轉型完成的總峰值
+DEFECT_MEMORY_BUDGET_MB = 64
+DEFECT_TOTAL_PEAK_BUDGET_MB = 224
+
+class MemoryBudgetExceeded(Exception):
+    """The typed defect DataFrame does not fit DEFECT_MEMORY_BUDGET_MB / DEFECT_TOTAL_PEAK_BUDGET_MB"""
+
+def apply_schema(df: pd.DataFrame, dtypes: Dict[str, str] = DEFECT_DTYPES) -> pd.DataFrame:
+    """
+    Convert the columns listed in dtypes, in place
+
+    Missing columns are skipped; int32 columns that contain nulls fall
+    back to the nullable Int32.
+
+    Returns:
+        The same DataFrame
+    """
+    for column, dtype in dtypes.items():
+        if column not in df.columns or df[column].dtype == dtype:
+            continue
+        if dtype.startswith('datetime64'):
+            if not pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = pd.to_datetime(df[column], errors='coerce', format='ISO8601')
+        elif dtype == 'float32' and df[column].dtype.kind == 'f':
+            df[column] = df[column].astype('float32', copy=False)
+        elif dtype in ('int32', 'Int32'):
+            values = pd.to_numeric(df[column], errors='coerce')
+            df[column] = values.astype('int32' if dtype == 'int32' and not values.isna().any() else 'Int32')
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+def memory_footprint(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-column memory usage, largest first
+
+    Returns:
+        DataFrame with column, dtype, bytes and MB (object columns counted deeply)
+    """
+    usage = df.memory_usage(deep=True, index=True)
+    report = pd.DataFrame({
+        'column': usage.index,
+        'dtype': [str(df.index.dtype) if c == 'Index' else str(df[c].dtype) for c in usage.index],
+        'bytes': usage.values,
+    })
+    report['MB'] = (report['bytes'] / 2**20).round(3)
+    return report.sort_values('bytes', ascending=False, ignore_index=True)
+
+def memory_mb(df: pd.DataFrame) -> float:
+    """
+    Total memory usage of a DataFrame in MB
+    """
+    return round(df.memory_usage(deep=True, index=True).sum() / 2**20, 2)
+
+URGENCY_LABELS = [label for _, label in URGENCY_CLASSES] + [URGENCY_CLASS_UNSET, URGENCY_CLASS_UNKNOWN]
+STATUS_LABELS = list(STATUS_CLASSES.values()) + [STATUS_CLASS_UNSET]
+
+def urgency_classes(days: pd.Series) -> pd.Categorical:
+    """
+    Vectorized get_urgency_class
+
+    Args:
+        days: Remaining days until the expected completion date (NaN allowed)
+
+    Returns:
+        Categorical of urgency labels, built from codes without
+        materializing a string per row
+    """
+    values = days.to_numpy(dtype=float, na_value=np.nan)
+    conditions = [values <= limit for limit, _ in URGENCY_CLASSES] + [np.isnan(values)]
+    choices = list(range(len(URGENCY_CLASSES))) + [URGENCY_LABELS.index(URGENCY_CLASS_UNKNOWN)]
+    codes = np.select(conditions, choices, default=URGENCY_LABELS.index(URGENCY_CLASS_UNSET))
+    return pd.Categorical.from_codes(codes.astype('int8'), URGENCY_LABELS)
+
+def status_classes(status: pd.Series) -> pd.Categorical:
+    """
+    Vectorized get_status_class
+
+    Only the distinct statuses are looked up; rows are mapped by their
+    category code.
+    """
+    if not isinstance(status.dtype, pd.CategoricalDtype):
+        status = status.astype('category')
+    unset = STATUS_LABELS.index(STATUS_CLASS_UNSET)
+    # 最後一格對應 code -1（空值）
+    lookup = np.array([STATUS_LABELS.index(STATUS_CLASSES.get(s, STATUS_CLASS_UNSET)) for s in status.cat.categories] + [unset], dtype='int8')
+    return pd.Categorical.from_codes(lookup[status.cat.codes.to_numpy()], STATUS_LABELS)
+
+def enrich_defects(df: pd.DataFrame, clamp_overdue: bool = True, now: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """
+    Add the derived columns every defect page needs
+
+    Adds created_at_dt, created_date, expected_completion_date,
+    urgency_days, urgency_class, status_class and, when updated_at is
+    present, updated_at_dt and repair_days. Source columns are converted
+    to DEFECT_DTYPES once (columns that already have it are skipped) and
+    the derived columns are built directly in their final dtype.
+
+    Args:
+        df: Defects as returned by api.get_defects
+        clamp_overdue: Clamp overdue days to 0 and treat a missing
+            expected date as 999 days (dashboards); otherwise keep the
+            raw day difference (defect list)
+        now: Reference time (default: today)
+
+    Returns:
+        The same DataFrame with the derived columns added
+    """
+    if df.empty:
+        return df
+
+    # 日期只解析一次，其餘欄位已是目標型別時略過
+    apply_schema(df)
+
+    df['created_at_dt'] = df['created_at']
+    df['created_date'] = df['created_at_dt'].dt.normalize()
+    df['expected_completion_date'] = df['expected_completion_day']
+
+    # 計算從今天到預計完成日的剩餘天數
+    current_date = (now if now is not None else pd.Timestamp.now()).normalize()
+    urgency_days = (df['expected_completion_date'] - current_date).dt.days
+    if clamp_overdue:
+        # 將負數變為0，表示已逾期
+        urgency_days = urgency_days.clip(lower=0).fillna(999)
+    df['urgency_days'] = urgency_days.astype('float32')
+    df['urgency_class'] = urgency_classes(urgency_days)
+
+    # 處理狀態
+    df['status_class'] = status_classes(df['status'])
+
+    # 計算修復時間（對於已完成的缺失）
+    if 'updated_at' in df.columns:
+        df['updated_at_dt'] = df['updated_at']
+        df['repair_days'] = (df['updated_at_dt'] - df['created_at_dt']).dt.days.astype('float32')
+
+    return df
+
+VENDOR_PERFORMANCE_COLUMNS = [
+    '廠商', '總缺失數', '已解決數', '解決率', '逾期數', '逾期率',
+    '平均解決天數', '中位解決天數', '按時完成率',
+]
+
+def vendor_performance(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-vendor performance in a single groupby-agg pass
+
+    Args:
+        df: Defects enriched by enrich_defects (clamp_overdue=True)
+
+    Returns:
+        One row per assigned vendor with VENDOR_PERFORMANCE_COLUMNS;
+        rates are percentages, repair days are NaN when nothing is done
+    """
+    if df.empty or 'assigned_vendor_name' not in df.columns:
+        return pd.DataFrame(columns=VENDOR_PERFORMANCE_COLUMNS)
+
+    completed = df['status'] == '已完成'
+    repair_days = df['repair_days'] if 'repair_days' in df.columns else pd.Series(np.nan, index=df.index)
+    work = pd.DataFrame({
+        '廠商': df['assigned_vendor_name'],
+        'completed': completed,
+        'overdue': df['urgency_days'] <= 0,
+        'on_time': completed & (df['urgency_days'] > 0),
+        'repair_days': repair_days.where(completed),
+    })
+
+    perf = work.groupby('廠商', observed=True).agg(
+        總缺失數=('completed', 'size'),
+        已解決數=('completed', 'sum'),
+        逾期數=('overdue', 'sum'),
+        按時完成數=('on_time', 'sum'),
+        平均解決天數=('repair_days', 'mean'),
+        中位解決天數=('repair_days', 'median'),
+    )
+    perf['解決率'] = perf['已解決數'] / perf['總缺失數'] * 100
+    perf['逾期率'] = perf['逾期數'] / perf['總缺失數'] * 100
+    perf['按時完成率'] = (perf['按時完成數'] / perf['已解決數'].where(perf['已解決數'] > 0) * 100).fillna(0)
+
+    return perf.reset_index()[VENDOR_PERFORMANCE_COLUMNS]
+
+def _vendor_performance_loop(df: pd.DataFrame) -> pd.DataFrame:
+    """The previous per-vendor loop, kept for benchmarking"""
+    vendor_stats = []
+    for vendor, group in df.groupby('assigned_vendor_name'):
+        total = len(group)
+        completed_defects = group[group['status'] == '已完成']
+        completed = len(completed_defects)
+        overdue = len(group[group['urgency_days'] == 0])
+        avg_repair = completed_defects['repair_days'].mean() if completed else None
+        on_time_completed = len(completed_defects[completed_defects['urgency_days'] > 0])
+        vendor_stats.append({
+            '廠商': vendor,
+            '總缺失數': total,
+            '已解決數': completed,
+            '解決率': completed / total * 100 if total > 0 else 0,
+            '逾期數': overdue,
+            '逾期率': overdue / total * 100 if total > 0 else 0,
+            '平均解決天數': avg_repair,
+            '按時完成率': on_time_completed / completed * 100 if completed > 0 else 0,
+        })
+    return pd.DataFrame(vendor_stats)
+
+def _enrich_defects_apply(df: pd.DataFrame) -> pd.DataFrame:
+    """The previous row-wise implementation, kept for benchmarking"""
+    df['created_at_dt'] = pd.to_datetime(df['created_at'])
+    df['created_date'] = df['created_at_dt'].dt.date
+    df['expected_completion_date'] = pd.to_datetime(df['expected_completion_day'])
+    current_date = pd.Timestamp.now().normalize()
+    df['urgency_days'] = (df['expected_completion_date'] - current_date).dt.days
+    df['urgency_days'] = df['urgency_days'].apply(lambda x: max(0, x) if pd.notna(x) else 999)
+    df['urgency_class'] = df['urgency_days'].apply(get_urgency_class)
+    df['status_class'] = df['status'].apply(get_status_class)
+    df['updated_at_dt'] = pd.to_datetime(df['updated_at'])
+    df['repair_days'] = (df['updated_at_dt'] - df['created_at_dt']).dt.days
+    return df
+
+def make_sample_defects(n: int, seed: int = 0, vendors: int = 20) -> pd.DataFrame:
+    """
+    Build a synthetic defect DataFrame shaped like api.get_defects output
+    """
+    rng = np.random.default_rng(seed)
+    now = pd.Timestamp.now().normalize()
+    created = now - pd.to_timedelta(rng.integers(0, 730, n), unit='D')
+    expected = created + pd.to_timedelta(rng.integers(1, 60, n), unit='D')
+    updated = created + pd.to_timedelta(rng.integers(0, 90, n), unit='D')
+    expected_str = pd.Series(expected.strftime('%Y-%m-%d'), dtype=object)
+    expected_str[rng.random(n) < 0.1] = None
+    return pd.DataFrame({
+        'defect_id': np.arange(1, n + 1),
+        'defect_description': rng.choice(['牆面出現裂縫', '天花板漏水痕跡明顯', '地板磁磚破損'], n),
+        'category_name': rng.choice([f'分類{i}' for i in range(10)], n),
+        'assigned_vendor_name': rng.choice([f'廠商{i}' for i in range(vendors)], n),
+        'responsible_vendor_name': rng.choice([f'廠商{i}' for i in range(vendors)], n),
+        'status': rng.choice(['已完成', '改善中', '已取消', '等待中', '待確認', None], n),
+        'created_at': created.strftime('%Y-%m-%dT%H:%M:%S'),
+        'updated_at': updated.strftime('%Y-%m-%dT%H:%M:%S'),
+        'expected_completion_day': expected_str,
+    })
+
+def make_sample_records(n: int, seed: int = 0, vendors: int = 20) -> List[Dict[str, Any]]:
+    """
+    Build synthetic defects as decoded api.get_defects JSON
+
+    Same columns and distributions as make_sample_defects, but as a list
+    of dicts whose strings are separate objects per row, like the output
+    of response.json().
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    descriptions = ['牆面出現裂縫', '天花板漏水痕跡明顯', '地板磁磚破損']
+    statuses = ['已完成', '改善中', '已取消', '等待中', '待確認', None]
+    records = []
+    for defect_id in range(1, n + 1):
+        created = today - timedelta(days=rng.randrange(730))
+        updated = created + timedelta(days=rng.randrange(90))
+        expected = created + timedelta(days=rng.randrange(1, 60))
+        records.append({
+            'defect_id': defect_id,
+            'defect_description': f'{rng.choice(descriptions)}（{defect_id}）',
+            'category_name': f'分類{rng.randrange(10)}',
+            'assigned_vendor_name': f'廠商{rng.randrange(vendors)}',
+            'responsible_vendor_name': f'廠商{rng.randrange(vendors)}',
+            'status': rng.choice(statuses),
+            'created_at': f'{created.isoformat()}T00:00:00',
+            'updated_at': f'{updated.isoformat()}T00:00:00',
+            'expected_completion_day': None if rng.random() < 0.1 else expected.isoformat(),
+        })
+    return records
+
+def benchmark_enrichment(n: int = 100_000, repeat: int = 3) -> Dict[str, Any]:
+    """
+    Compare enrich_defects against the previous Series.apply path
+
+    Returns:
+        Best-of-repeat seconds for each path and the speedup
+    """
+    base = make_sample_defects(n)
+    timings = {}
+    for name, func in [('apply', _enrich_defects_apply), ('vectorized', enrich_defects)]:
+        best = None
+        for _ in range(repeat):
+            df = base.copy()
+            start = time.perf_counter()
+            func(df)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+    return {
+        'rows': n,
+        'apply_seconds': round(timings['apply'], 4),
+        'vectorized_seconds': round(timings['vectorized'], 4),
+        'speedup': round(timings['apply'] / timings['vectorized'], 1),
+    }
+
+def benchmark_vendor_performance(vendor_counts=(10, 100, 1000), rows_per_vendor: int = 100) -> pd.DataFrame:
+    """
+    Time vendor_performance against the previous loop as vendors grow
+
+    Rows grow with the vendor count (rows_per_vendor each), so a linear
+    engine keeps a roughly constant time per row.
+
+    Returns:
+        One row per vendor count with seconds and microseconds per row
+    """
+    results = []
+    for vendors in vendor_counts:
+        n = vendors * rows_per_vendor
+        df = enrich_defects(make_sample_defects(n, vendors=vendors))
+        row = {'vendors': vendors, 'rows': n}
+        for name, func in [('loop', _vendor_performance_loop), ('groupby', vendor_performance)]:
+            start = time.perf_counter()
+            func(df)
+            elapsed = time.perf_counter() - start
+            row[f'{name}_seconds'] = round(elapsed, 4)
+            row[f'{name}_us_per_row'] = round(elapsed / n * 1e6, 3)
+        results.append(row)
+    return pd.DataFrame(results)
+
+def check_memory_budget(n: int = 200_000, budget_mb: float = DEFECT_MEMORY_BUDGET_MB, peak_budget_mb: float = DEFECT_TOTAL_PEAK_BUDGET_MB) -> Dict[str, Any]:
+    """
+    Check loading n synthetic defects against the budgets
+
+    tracemalloc runs from before the JSON records are built until
+    enrich_defects has converted them, so peak_mb covers the raw payload,
+    the conversion and the resulting frame together.
+
+    Returns:
+        rows, records_mb, typed_mb, peak_mb and the budgets
+
+    Raises:
+        MemoryBudgetExceeded: typed_mb or peak_mb is over its budget
+    """
+    tracemalloc.start()
+    try:
+        records = make_sample_records(n)
+        records_mb = round(tracemalloc.get_traced_memory()[0] / 2**20, 2)
+        df = enrich_defects(pd.DataFrame(records))
+        del records
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    typed_mb = memory_mb(df)
+    peak_mb = round(peak / 2**20, 2)
+    if typed_mb > budget_mb or peak_mb > peak_budget_mb:
+        raise MemoryBudgetExceeded(
+            f"{n} defects: typed {typed_mb} MB (budget {budget_mb} MB), "
+            f"peak {peak_mb} MB (budget {peak_budget_mb} MB)"
+        )
+    return {
+        'rows': n,
+        'records_mb': records_mb,
+        'typed_mb': typed_mb,
+        'peak_mb': peak_mb,
+        'budget_mb': budget_mb,
+        'peak_budget_mb': peak_budget_mb,
+    }
+
+if __name__ == "__main__":
+    print(benchmark_enrichment())
+    print(benchmark_vendor_performance())
+    print(check_memory_budget())
@@ -0,0 +1,104 @@
+import os
+from typing import Dict, Optional, Tuple
+import pandas as pd
+from defect_frame import apply_schema
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow 為選用套件，未安裝時只保留記憶體中的快照
+    pa = None
+
+# 缺失快照：每個工程一個 Arrow IPC 檔，載入時以 memory map 讀取，不必重新解析 JSON 與日期
+DEFECT_SNAPSHOT_DIR = os.environ.get('DEFECT_SNAPSHOT_DIR', os.path.join('.cache', 'defects'))
+SNAPSHOT_FORMAT_VERSION = "2"  # 欄位型別變更時遞增，舊快照即失效
+
+def typed_defects(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Give api.get_defects rows their column types (defect_frame.DEFECT_DTYPES)
+
+    Date strings become datetime64 (so enrich_defects does not parse them
+    again), IDs int32 and low-cardinality text columns categoricals
+    (stored dictionary-encoded in the snapshot).
+    """
+    return apply_schema(df)
+
+def available() -> bool:
+    """
+    Whether snapshots can be persisted (pyarrow is installed)
+    """
+    return pa is not None
+
+def snapshot_path(project_id: int) -> str:
+    return os.path.join(DEFECT_SNAPSHOT_DIR, f"project_{project_id}.arrow")
+
+def save_snapshot(project_id: int, df: pd.DataFrame, meta: Optional[Dict[str, str]] = None) -> bool:
+    """
+    Write a project's defect table as an uncompressed Arrow IPC file
+
+    The file is written next to its final path and renamed into place,
+    so readers never see a partial snapshot.
+
+    Args:
+        project_id: ID of the project
+        df: Typed defect table (see typed_defects)
+        meta: Extra string metadata kept in the schema, e.g. high_water_mark
+
+    Returns:
+        True when the snapshot was written
+    """
+    if pa is None:
+        return False
+
+    path = snapshot_path(project_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata.update({
+            b"snapshot_format": SNAPSHOT_FORMAT_VERSION.encode(),
+            **{k.encode(): str(v).encode() for k, v in (meta or {}).items()},
+        })
+        table = table.replace_schema_metadata(metadata)
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    except (OSError, pa.ArrowException) as e:
+        print(f"Error saving defect snapshot of project {project_id}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
+
+def load_snapshot(project_id: int) -> Optional[Tuple[pd.DataFrame, Dict[str, str]]]:
+    """
+    Memory-map a project's snapshot
+
+    Returns:
+        (DataFrame, meta) or None when there is no usable snapshot
+    """
+    path = snapshot_path(project_id)
+    if pa is None or not os.path.exists(path):
+        return None
+
+    try:
+        source = pa.memory_map(path, "r")
+        table = pa.ipc.open_file(source).read_all()
+    except (OSError, pa.ArrowException) as e:
+        print(f"Error loading defect snapshot of project {project_id}: {e}")
+        return None
+
+    metadata = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items() if k != b"pandas"}
+    if metadata.pop("snapshot_format", None) != SNAPSHOT_FORMAT_VERSION:
+        return None
+    # 字典編碼的欄位直接還原為 categorical
+    return table.to_pandas(), metadata
+
+def delete_snapshot(project_id: int) -> None:
+    """
+    Remove a project's snapshot file
+    """
+    path = snapshot_path(project_id)
+    if os.path.exists(path):
+        os.remove(path)
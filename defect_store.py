@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+import api
+from defect_snapshot import load_snapshot, save_snapshot, typed_defects
+from search_index import SearchIndex
+from utils import STATUS_CLASSES
+
+# 每次同步向伺服器請求的筆數（GET /defects/ 的 limit 上限為 100）
+SYNC_PAGE_SIZE = api.DEFECTS_PAGE_MAX
+# 同時重新驗證的頁數
+SYNC_WORKERS = int(os.environ.get('DEFECT_SYNC_WORKERS', 8))
+# 本地查詢沿用多久內的同步結果（秒），避免每次重新執行頁面都重新同步
+DEFECT_STORE_MAX_AGE = float(os.environ.get('DEFECT_STORE_MAX_AGE', 30))
+
+FINGERPRINT_COLUMN = '_fingerprint'
+# 沒有狀態（或不是已知狀態）的缺失，伺服器無法篩選，改在本地篩選
+UNSET_STATUS = '未設定'
+
+def fingerprint(record: Dict[str, Any]) -> str:
+    """
+    Stable digest of one api.get_defects record, used to detect changes
+    """
+    data = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+class DefectStore:
+    """
+    Client-side snapshot of one project's defects
+
+    refresh() re-reads the project page by page through
+    api.get_defects_page. Pages are revalidated with ETag; a page that
+    answers 304 is not parsed or compared at all, only the IDs remembered
+    from its last download count towards the current set. Only the ETag
+    and the IDs of each page are kept, not its body. Every row of a page
+    that did change is fingerprinted, so edits that do not bump
+    updated_at (e.g. a renamed vendor joined into the rows) are merged
+    too; only rows whose fingerprint changed touch the cached DataFrame.
+
+    The DataFrame is typed (datetime / categorical columns, see
+    defect_snapshot.typed_defects) and, when pyarrow is installed,
+    persisted as an Arrow snapshot after every change, so a new server
+    process starts from the snapshot and only merges what changed since.
+    A SearchIndex over the same rows is updated alongside the DataFrame.
+    """
+
+    def __init__(self, project_id: int):
+        self.project_id = project_id
+        self.records: Dict[int, str] = {}  # defect_id -> fingerprint
+        self.high_water_mark: Optional[str] = None  # 最新的 updated_at
+        self.version = 0  # 每次資料有變動就加一
+        self.last_refresh: Optional[float] = None  # 上次同步完成的 time.monotonic()
+        self._pages: Dict[int, Tuple[Optional[str], List[int]]] = {}  # skip -> (ETag, 該頁上次下載時的 defect_id)
+        self._df: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+        self.search_index = SearchIndex()
+        self._load_snapshot()
+
+    def _load_snapshot(self) -> None:
+        snapshot = load_snapshot(self.project_id)
+        if snapshot is None:
+            return
+        df, meta = snapshot
+        if df.empty or FINGERPRINT_COLUMN not in df.columns:
+            return
+        df.index = df['defect_id'].values
+        self.records = dict(zip(df['defect_id'].tolist(), df[FINGERPRINT_COLUMN].tolist()))
+        self.high_water_mark = meta.get('high_water_mark') or None
+        self._df = df
+        self.search_index.add_frame(df)
+
+    def _fetch_changes(self) -> Optional[Tuple[List[int], List[Dict[str, Any]]]]:
+        """
+        Returns:
+            (IDs of every defect on the server, rows of the pages that
+            changed since the last sync), or None when a request failed
+        """
+        ids: List[int] = []
+        changed: List[Dict[str, Any]] = []
+        # 每頁只保留 ETag 與 defect_id，不保留回應內容
+        fetch = lambda skip: api.get_defects_page(
+            self.project_id, skip=skip, limit=SYNC_PAGE_SIZE, etag=self._pages.get(skip, (None, []))[0])
+        skip = 0
+        with ThreadPoolExecutor(max_workers=SYNC_WORKERS) as pool:
+            while True:
+                # 一次送出一批頁面，直到某頁不足一整頁為止
+                skips = [skip + i * SYNC_PAGE_SIZE for i in range(SYNC_WORKERS)]
+                for page_skip, result in zip(skips, pool.map(fetch, skips)):
+                    if result is None:
+                        return None
+                    page, etag = result
+                    if page is not None:
+                        self._pages[page_skip] = (etag, [d['defect_id'] for d in page])
+                        changed.extend(page)
+                    page_ids = self._pages[page_skip][1]
+                    ids.extend(page_ids)
+                    if len(page_ids) < SYNC_PAGE_SIZE:
+                        for stale in [k for k in self._pages if k > page_skip]:
+                            del self._pages[stale]
+                        return ids, changed
+                skip = skips[-1] + SYNC_PAGE_SIZE
+
+    def _apply(self, upserts: List[Dict[str, Any]], deleted: List[int], fingerprints: Dict[int, str]) -> None:
+        df = self._df if self._df is not None else pd.DataFrame()
+
+        drop_ids = [d['defect_id'] for d in upserts] + deleted
+        if not df.empty and drop_ids:
+            df = df.drop(index=df.index.intersection(drop_ids))
+
+        if upserts:
+            new_rows = pd.DataFrame(upserts)
+            new_rows[FINGERPRINT_COLUMN] = [fingerprints[d['defect_id']] for d in upserts]
+            new_rows.index = new_rows['defect_id'].values
+            # 合併後重新套用型別（不同類別集合的 categorical 合併會退回 object）
+            df = typed_defects(pd.concat([df, typed_defects(new_rows)]) if not df.empty else typed_defects(new_rows))
+
+        for d in upserts:
+            self.records[d['defect_id']] = fingerprints[d['defect_id']]
+            updated_at = d.get('updated_at')
+            if updated_at and (self.high_water_mark is None or updated_at > self.high_water_mark):
+                self.high_water_mark = updated_at
+        for defect_id in deleted:
+            self.records.pop(defect_id, None)
+
+        # 只重新索引有變動的缺失
+        self.search_index.add_many(upserts)
+        for defect_id in deleted:
+            self.search_index.remove(defect_id)
+
+        self._df = df
+        self.version += 1
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        Pull the latest defects and merge the differences
+
+        Returns:
+            Counts of upserted, deleted and total defects; the cached data
+            is left untouched when the server cannot be read
+        """
+        with self._lock:
+            result = self._fetch_changes()
+            if result is None:
+                return {"upserted": 0, "deleted": 0, "total": len(self.records), "error": 1}
+            ids, changed = result
+
+            # 有變動的頁面逐筆比對指紋：改名的分類 / 廠商不會更新缺失的 updated_at
+            fingerprints = {d['defect_id']: fingerprint(d) for d in changed}
+            upserts = [d for d in changed if self.records.get(d['defect_id']) != fingerprints[d['defect_id']]]
+
+            current = set(ids)
+            deleted = [defect_id for defect_id in self.records if defect_id not in current]
+
+            if upserts or deleted or self._df is None:
+                self._apply(upserts, deleted, fingerprints)
+                save_snapshot(self.project_id, self._df, {"high_water_mark": self.high_water_mark or ""})
+
+            self.last_refresh = time.monotonic()
+            return {"upserted": len(upserts), "deleted": len(deleted), "total": len(self.records)}
+
+    def refresh_if_stale(self, max_age: float = DEFECT_STORE_MAX_AGE) -> Optional[Dict[str, int]]:
+        """
+        Refresh only when the last successful sync is older than max_age seconds
+
+        Returns:
+            The refresh() counts, or None when the last sync was reused
+        """
+        last_refresh = self.last_refresh
+        if last_refresh is not None and time.monotonic() - last_refresh < max_age:
+            return None
+        return self.refresh()
+
+    def mark_stale(self) -> None:
+        """
+        Make the next refresh_if_stale sync again (e.g. after a write)
+        """
+        self.last_refresh = None
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """
+        Defect IDs matching a free-text query, best match first
+        """
+        return [defect_id for defect_id, _ in self.search_index.search(query, limit)]
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        Get a copy of the current snapshot as a DataFrame
+        """
+        with self._lock:
+            if self._df is None:
+                return pd.DataFrame()
+            return self._df.drop(columns=FINGERPRINT_COLUMN, errors='ignore').reset_index(drop=True)
+
+    def query(self, filters: Dict[str, Any], search_text: str = '', skip: int = 0, limit: int = api.DEFECTS_PAGE_MAX) -> Tuple[pd.DataFrame, bool]:
+        """
+        Filter and page the snapshot locally
+
+        Args:
+            filters: Column -> value, None is ignored; status UNSET_STATUS
+                matches defects without a known status
+            search_text: Free-text query; results are ranked by relevance
+            skip: Rows to skip
+            limit: Page size
+
+        Returns:
+            (page, has_next)
+        """
+        df = self.to_df()
+        if df.empty:
+            return pd.DataFrame(), False
+
+        if not search_text:
+            df = _apply_filters(df, filters)
+        else:
+            # 只取排名前 skip + limit + 1 筆（多一筆判斷 has_next）；篩選後不足時擴大再查
+            wanted = skip + limit + 1
+            search_limit = wanted
+            while True:
+                defect_ids = self.search(search_text, search_limit)
+                # 依搜尋排名排列
+                positions = pd.Index(df['defect_id']).get_indexer(defect_ids)
+                ranked = _apply_filters(df.iloc[positions[positions >= 0]], filters)
+                if len(ranked) >= wanted or len(defect_ids) < search_limit:
+                    break
+                search_limit *= 4
+            df = ranked
+
+        has_next = len(df) > skip + limit
+        return df.iloc[skip:skip + limit].reset_index(drop=True), has_next
+
+def _apply_filters(df: pd.DataFrame, filters: Dict[str, Any]) -> pd.DataFrame:
+    for column, value in filters.items():
+        if value is None:
+            continue
+        if column == 'status' and value == UNSET_STATUS:
+            df = df[~df['status'].astype(object).isin(STATUS_CLASSES)]
+        else:
+            df = df[(df[column] == value).fillna(False)]
+    return df
+
+_stores: Dict[int, DefectStore] = {}
+_stores_lock = threading.Lock()
+
+def get_store(project_id: int) -> DefectStore:
+    """
+    Get the shared defect store of a project
+    """
+    with _stores_lock:
+        if project_id not in _stores:
+            _stores[project_id] = DefectStore(project_id)
+        return _stores[project_id]
+
+def load_defects_df(project_id: int) -> pd.DataFrame:
+    """
+    Return the project's defects as a DataFrame, syncing the store only
+    when its last sync is older than DEFECT_STORE_MAX_AGE
+    """
+    store = get_store(project_id)
+    store.refresh_if_stale()
+    return store.to_df()
+
+def mark_stale(project_id: Optional[int] = None) -> None:
+    """
+    Make the next read of a project's store (every store when None) sync again
+
+    Call after writes that change defect rows, including renaming a
+    category or vendor, whose names are joined into the rows.
+    """
+    with _stores_lock:
+        stores = list(_stores.values()) if project_id is None else [_stores[project_id]] if project_id in _stores else []
+    for store in stores:
+        store.mark_stale()
+
+def needs_local_query(filters: Dict[str, Any], search_text: str = '') -> bool:
+    """
+    Whether the query has to run on the local store instead of GET /defects/
+    """
+    return bool(search_text) or filters.get('status') == UNSET_STATUS
+
+def query_defects(project_id: int, filters: Dict[str, Any], search_text: str = '', skip: int = 0, limit: int = api.DEFECTS_PAGE_MAX) -> Tuple[pd.DataFrame, bool]:
+    """
+    One page of the defect list, as the defect list page loads it
+
+    Server-side filters go straight to GET /defects/; searches and the
+    unset status are answered from the local store, which is synced again
+    only when its last sync is older than DEFECT_STORE_MAX_AGE.
+
+    Returns:
+        (page, has_next)
+    """
+    if needs_local_query(filters, search_text):
+        store = get_store(project_id)
+        store.refresh_if_stale()
+        return store.query(filters, search_text, skip, limit)
+
+    defects = api.get_defects(project_id, skip=skip, limit=limit, **filters)
+    # limit 已是上限，不能多取一筆；取滿一頁就視為可能還有下一頁
+    return pd.DataFrame(defects), len(defects) == limit
@@ -1,12 +1,19 @@
+import argparse
+import io
 import requests
 import random
-from datetime import datetime, timedelta
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 import api
 import os
 
 # Base URL for the API
 BASE_URL = os.environ.get('API_BASE_URL', 'http://localhost:8000')
 
+# 大量生成的預設基準日，固定日期才能讓同一個種子產生相同資料
+DEFAULT_BASE_DATE = date(2025, 1, 1)
+
 # 缺失分類列表
 CATEGORIES = [
     "門窗、木作、美容",
@@ -128,6 +135,64 @@ DEFECT_DESCRIPTIONS = [
     "廚房抽油煙機效能不佳"
 ]
 
+# 大量生成時的狀態分布（與正式環境相近：改善中最多、已完成次之）
+DEFECT_STATUSES = ['等待中', '改善中', '待確認', '已完成', '已取消']
+DEFECT_STATUS_WEIGHTS = [0.2, 0.35, 0.1, 0.28, 0.07]
+
+# 缺失位置
+LOCATIONS = [f"{floor}F" for floor in range(1, 13)] + ["B1", "B2", "RF"]
+
+# 改善內容範本
+IMPROVEMENT_CONTENTS = [
+    "已完成修補並重新粉刷",
+    "已更換損壞零件，測試正常",
+    "已重新施作防水層",
+    "已調整安裝位置並固定",
+    "已清除堵塞物並疏通管線",
+    "已更換磁磚並填縫",
+]
+
+def random_expected_date(rng, status, current_date):
+    """
+    依狀態隨機產生預期完成日期
+    
+    Args:
+        rng: random 模組或 random.Random 實例
+        status: 缺失狀態
+        current_date: 基準日期
+        
+    Returns:
+        YYYY-MM-DD 字串，或 None（沒有預期完成日期）
+    """
+    if status == '已完成':
+        # 已完成的缺失：預期完成日期在過去1-30天內，實際已完成
+        days_offset = rng.randint(1, 30)
+        future_date = current_date - timedelta(days=rng.randint(1, days_offset))
+    elif status == '已取消':
+        # 已取消的缺失：預期完成日期可能在過去或未來
+        future_date = current_date + timedelta(days=rng.randint(-15, 15))
+    elif status == '改善中':
+        # 改善中的缺失：預期完成日期在未來1-14天內，約兩成已逾期
+        if rng.random() < 0.2:
+            future_date = current_date - timedelta(days=rng.randint(1, 20))
+        else:
+            future_date = current_date + timedelta(days=rng.randint(1, 14))
+    elif status == '等待中':
+        # 等待中的缺失：預期完成日期在未來7-30天內
+        future_date = current_date + timedelta(days=rng.randint(7, 30))
+    elif status == '待確認':
+        # 待確認的缺失：廠商已回報改善，預期完成日期在最近幾天
+        future_date = current_date + timedelta(days=rng.randint(-7, 3))
+    else:  # '未設定'
+        # 未設定狀態的缺失：可能沒有預期完成日期
+        if rng.random() < 0.3:  # 30%的機率沒有預期完成日期
+            future_date = None
+        else:
+            future_date = current_date + timedelta(days=rng.randint(1, 45))
+    
+    # 只保留日期部分，去掉時間部分
+    return future_date.date().isoformat() if future_date else None
+
 def create_categories(project_id=1):
     """
     創建缺失分類
@@ -232,32 +297,8 @@ def create_defects(project_id=1, count=20):
             status_weights = [0.25, 0.4, 0.1, 0.2, 0.05]  # 權重調整，使改善中的比例較高
             status = random.choices(status_options, weights=status_weights, k=1)[0]
             
-            # 根據狀態設定不同的預期完成日期
-            current_date = datetime.now()
-            
-            if status == '已完成':
-                # 已完成的缺失：預期完成日期在過去1-30天內，實際已完成
-                days_offset = random.randint(1, 30)
-                future_date = current_date - timedelta(days=random.randint(1, days_offset))
-            elif status == '已取消':
-                # 已取消的缺失：預期完成日期可能在過去或未來
-                days_offset = random.randint(-15, 15)
-                future_date = current_date + timedelta(days=days_offset)
-            elif status == '改善中':
-                # 改善中的缺失：預期完成日期在未來1-14天內
-                future_date = current_date + timedelta(days=random.randint(1, 14))
-            elif status == '等待中':
-                # 等待中的缺失：預期完成日期在未來7-30天內
-                future_date = current_date + timedelta(days=random.randint(7, 30))
-            else:  # '未設定'
-                # 未設定狀態的缺失：可能沒有預期完成日期
-                if random.random() < 0.3:  # 30%的機率沒有預期完成日期
-                    future_date = None
-                else:
-                    future_date = current_date + timedelta(days=random.randint(1, 45))
-            
-            # 只保留日期部分，去掉時間部分
-            expected_date = future_date.date().isoformat() if future_date else None
+            # 根據狀態設定不同的預期完成日期（只保留日期部分）
+            expected_date = random_expected_date(random, status, datetime.now())
             
             # 隨機選擇缺失描述
             defect_description = random.choice(DEFECT_DESCRIPTIONS)
@@ -307,6 +348,193 @@ def create_defects(project_id=1, count=20):
     print(f"完成創建 {len(created_defects)} 個缺失")
     return created_defects
 
+def placeholder_photo(width=640, height=480):
+    """
+    產生一張漸層 JPEG，所有假照片共用
+    """
+    from PIL import Image
+    
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=80)
+    return buffer.getvalue()
+
+def generate_defect_specs(count, categories, vendors, basemaps, seed=0, photo_ratio=0.3, max_photos=3, improvement_ratio=0.8, mark_area=(1000, 600), base_date=None):
+    """
+    依固定種子逐筆產生缺失規格（只產生資料，不送出請求）
+    
+    同樣的參數一定產生同樣的內容，與之後寫入時的並行數及執行日期無關。
+    
+    Args:
+        count: 缺失數量
+        categories: 缺失分類列表 (api.get_defect_categories)
+        vendors: 廠商列表 (api.get_vendors)
+        basemaps: 底圖列表 (api.get_basemaps)，每筆缺失在其中一張底圖上標記
+        seed: 隨機種子
+        photo_ratio: 附照片的缺失比例
+        max_photos: 每筆缺失最多的照片數
+        improvement_ratio: 待確認 / 已完成的缺失中，附改善報告的比例
+        mark_area: 標記座標範圍 (寬, 高)
+        base_date: 預期完成日期與改善日期的基準日 (date)，預設為 DEFAULT_BASE_DATE
+        
+    Yields:
+        {"defect": 缺失資料, "mark": 標記資料或 None, "photos": 照片數, "improvement": 改善報告或 None}
+    """
+    rng = random.Random(seed)
+    current_date = datetime.combine(base_date or DEFAULT_BASE_DATE, datetime.min.time())
+    # 各底圖的缺失量不平均，部分樓層特別多
+    basemap_weights = [rng.uniform(0.2, 1.0) for _ in basemaps]
+    
+    for _ in range(count):
+        status = rng.choices(DEFECT_STATUSES, weights=DEFECT_STATUS_WEIGHTS, k=1)[0]
+        vendor = rng.choice(vendors)
+        expected_date = random_expected_date(rng, status, current_date)
+        
+        mark = None
+        if basemaps:
+            basemap = rng.choices(basemaps, weights=basemap_weights, k=1)[0]
+            mark = {
+                "base_map_id": basemap["base_map_id"],
+                "coordinate_x": rng.randint(50, mark_area[0] - 50),
+                "coordinate_y": rng.randint(50, mark_area[1] - 50),
+                "scale": 1.0,
+            }
+        
+        improvement = None
+        if status in ('待確認', '已完成') and rng.random() < improvement_ratio:
+            improvement_date = current_date - timedelta(days=rng.randint(0, 30))
+            improvement = {
+                "content": rng.choice(IMPROVEMENT_CONTENTS),
+                "improvement_date": improvement_date.date().isoformat(),
+            }
+        
+        yield {
+            "defect": {
+                "defect_description": rng.choice(DEFECT_DESCRIPTIONS),
+                "defect_category_id": rng.choice(categories)["defect_category_id"],
+                "assigned_vendor_id": vendor["vendor_id"],
+                "expected_completion_day": expected_date,
+                "previous_defect_id": None,
+                "responsible_vendor_id": vendor["vendor_id"],
+                "location": rng.choice(LOCATIONS),
+                "status": status,
+            },
+            "mark": mark,
+            "photos": rng.randint(1, max_photos) if rng.random() < photo_ratio else 0,
+            "improvement": improvement,
+        }
+
+def write_defect_spec(project_id, user_id, spec, photo_bytes=None):
+    """
+    寫入一筆缺失規格：缺失、標記、照片、改善報告
+    
+    Returns:
+        各項成功建立的數量，缺失建立失敗時回傳 None
+    """
+    try:
+        result = api.create_defect(project_id, user_id, spec["defect"])
+    except Exception as e:
+        print(f"創建缺失時發生錯誤: {str(e)}")
+        return None
+    if 'defect_id' not in result:
+        return None
+    
+    defect_id = result['defect_id']
+    counts = {"defects": 1, "marks": 0, "photos": 0, "improvements": 0}
+    
+    if spec["mark"]:
+        mark_result = api.create_defect_mark({"defect_form_id": defect_id, **spec["mark"]})
+        if 'defect_mark_id' in mark_result:
+            counts["marks"] += 1
+    
+    if photo_bytes:
+        for i in range(spec["photos"]):
+            photo = api.upload_defect_image(defect_id, (f"defect_{defect_id}_{i + 1}.jpg", photo_bytes, "image/jpeg"))
+            if photo:
+                counts["photos"] += 1
+    
+    if spec["improvement"] and result.get('unique_code'):
+        improvement = api.create_improvement_by_unique_code(result['unique_code'], **spec["improvement"])
+        if improvement and 'improvement_id' in improvement:
+            counts["improvements"] += 1
+    
+    return counts
+
+def bulk_create_defects(project_id=1, count=10000, seed=0, workers=16, chunk_size=1000, user_id=1, photo_ratio=0.3, max_photos=3, improvement_ratio=0.8, base_date=None):
+    """
+    大量創建缺失資料（含標記、照片、改善報告）
+    
+    缺失規格依種子依序產生，再分批以執行緒池並行寫入；每批完成後才產生
+    下一批，即使 100 萬筆也只佔用一批的記憶體。後端沒有批次建立的 API，
+    因此每筆仍是個別請求，由 api.py 的共用連線池重用連線。
+    
+    Args:
+        project_id: 專案ID
+        count: 要創建的缺失數量
+        seed: 隨機種子，相同種子產生相同資料
+        workers: 並行寫入的執行緒數
+        chunk_size: 每批的缺失數量
+        user_id: 提交者ID
+        photo_ratio: 附照片的缺失比例
+        max_photos: 每筆缺失最多的照片數
+        improvement_ratio: 待確認 / 已完成的缺失中，附改善報告的比例
+        base_date: 日期的基準日 (date)，預設為 DEFAULT_BASE_DATE
+        
+    Returns:
+        各項建立數量、失敗數與耗時
+    """
+    base_date = base_date or DEFAULT_BASE_DATE
+    print(f"開始為專案 {project_id} 大量創建 {count} 個缺失 (seed={seed}, base_date={base_date}, workers={workers})...")
+    
+    categories = api.get_defect_categories()
+    vendors = api.get_vendors()
+    if not categories or not vendors:
+        print("無法獲取分類或廠商資料，請先創建分類和廠商")
+        return {}
+    basemaps = api.get_basemaps(project_id)
+    if not basemaps:
+        print("沒有底圖，將不建立缺失標記")
+    
+    photo_bytes = placeholder_photo() if photo_ratio > 0 and max_photos > 0 else None
+    specs = generate_defect_specs(count, categories, vendors, basemaps, seed, photo_ratio, max_photos, improvement_ratio, base_date=base_date)
+    
+    summary = {"defects": 0, "marks": 0, "photos": 0, "improvements": 0, "failed": 0}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        done = 0
+        while done < count:
+            chunk = [next(specs) for _ in range(min(chunk_size, count - done))]
+            for counts in pool.map(lambda spec: write_defect_spec(project_id, user_id, spec, photo_bytes), chunk):
+                if counts is None:
+                    summary["failed"] += 1
+                    continue
+                for key, value in counts.items():
+                    summary[key] += value
+            done += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"  {done}/{count} 筆，{done / elapsed:.0f} 筆/秒")
+    
+    summary["seconds"] = round(time.perf_counter() - start, 1)
+    print(f"完成大量創建: {summary}")
+    return summary
+
+def ensure_basemap(project_id=1):
+    """
+    專案沒有底圖時，建立一張附圖片的底圖
+    
+    Returns:
+        底圖列表
+    """
+    basemaps = api.get_basemaps(project_id)
+    if basemaps:
+        return basemaps
+    
+    print("開始創建底圖...")
+    result = api.create_basemap(project_id, "1F 平面圖")
+    if result.get('base_map_id'):
+        api.create_basemap_image(result['base_map_id'], {"file": ("basemap.jpg", placeholder_photo(1000, 600), "image/jpeg")})
+    return api.get_basemaps(project_id)
+
 def generate_all_fake_data(project_id=1, defect_count=20):
     """
     生成所有假資料（分類、廠商、缺失）
@@ -340,7 +568,34 @@ def generate_all_fake_data(project_id=1, defect_count=20):
 
 # 如果直接執行此檔案，則生成所有假資料
 if __name__ == "__main__":
-    project_id = 1  # 預設專案ID
-    defect_count = 30  # 預設缺失數量，增加到50個以便有更多樣化的數據
+    parser = argparse.ArgumentParser(description="生成缺失假資料")
+    parser.add_argument("--project-id", type=int, default=1, help="專案ID")
+    parser.add_argument("--defects", type=int, default=30, help="缺失數量")
+    parser.add_argument("--bulk", action="store_true", help="使用大量生成（含標記、照片、改善報告，並行寫入）")
+    parser.add_argument("--setup", action="store_true", help="先建立分類、廠商與底圖")
+    parser.add_argument("--seed", type=int, default=0, help="隨機種子")
+    parser.add_argument("--base-date", type=date.fromisoformat, default=date.today(), help="日期的基準日 YYYY-MM-DD（預設今天；重現資料時請指定）")
+    parser.add_argument("--workers", type=int, default=16, help="並行寫入的執行緒數")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="每批的缺失數量")
+    parser.add_argument("--photo-ratio", type=float, default=0.3, help="附照片的缺失比例")
+    parser.add_argument("--max-photos", type=int, default=3, help="每筆缺失最多的照片數")
+    parser.add_argument("--improvement-ratio", type=float, default=0.8, help="待確認/已完成缺失附改善報告的比例")
+    parser.add_argument("--base-url", help="後端網址（預設 API_BASE_URL）")
+    args = parser.parse_args()
+    
+    if args.base_url:
+        api.BASE_URL = args.base_url
+    
+    if args.setup:
+        create_categories(args.project_id)
+        create_vendors(args.project_id)
+        ensure_basemap(args.project_id)
     
-    generate_all_fake_data(project_id, defect_count)
\ No newline at end of file
+    if args.bulk:
+        bulk_create_defects(
+            args.project_id, args.defects, seed=args.seed, workers=args.workers, chunk_size=args.chunk_size,
+            photo_ratio=args.photo_ratio, max_photos=args.max_photos, improvement_ratio=args.improvement_ratio,
+            base_date=args.base_date,
+        )
+    else:
+        generate_all_fake_data(args.project_id, args.defects)
@@ -0,0 +1,240 @@
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+from PIL import Image
+import api
+
+# 影像快取：記憶體存放已解碼的影像，磁碟存放原始檔案
+IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'images'))
+IMAGE_CACHE_MAX_MB = int(os.environ.get('IMAGE_CACHE_MAX_MB', 256))
+# 磁碟上限：超過時由最久未使用的檔案開始刪除，直到降到上限的 IMAGE_DISK_PRUNE_RATIO
+IMAGE_DISK_CACHE_MAX_MB = int(os.environ.get('IMAGE_DISK_CACHE_MAX_MB', 2048))
+IMAGE_DISK_PRUNE_RATIO = 0.9
+# 切片金字塔的目錄（basemap_tiles），整個金字塔視為一筆快取
+TILES_DIR = "tiles"
+
+def cache_key(*parts) -> str:
+    """
+    Stable file-name-safe key for a URL (and optional variant parts)
+    """
+    return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+def cache_path(key: str, suffix: str = "") -> str:
+    """
+    Path of a cache file inside IMAGE_CACHE_DIR, sharded by key prefix
+    """
+    return os.path.join(IMAGE_CACHE_DIR, key[:2], key + suffix)
+
+class _DiskBudget:
+    """
+    Byte budget of IMAGE_CACHE_DIR with least-recently-used pruning
+
+    Recency is the file mtime, refreshed by touch() on every cache hit.
+    A tile pyramid directory counts as one entry (its newest file) and is
+    removed as a whole, so no pyramid is left with missing tiles. The
+    total is measured once and then tracked from the writes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _files(root: str) -> List[Tuple[float, int]]:
+        files = []
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                try:
+                    stat = os.stat(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size))
+        return files
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """(mtime, bytes, path) of every cache entry"""
+        entries = []
+        if not os.path.isdir(IMAGE_CACHE_DIR):
+            return entries
+        for name in os.listdir(IMAGE_CACHE_DIR):
+            path = os.path.join(IMAGE_CACHE_DIR, name)
+            if name == TILES_DIR:
+                for pyramid in os.listdir(path):
+                    files = self._files(os.path.join(path, pyramid))
+                    if files:
+                        entries.append((max(m for m, _ in files), sum(b for _, b in files), os.path.join(path, pyramid)))
+            elif os.path.isdir(path):
+                for filename in os.listdir(path):
+                    if filename.endswith(".tmp"):
+                        continue
+                    try:
+                        stat = os.stat(os.path.join(path, filename))
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, os.path.join(path, filename)))
+        return entries
+
+    def added(self, size: int) -> None:
+        with self._lock:
+            if self.current_bytes is None:
+                self.current_bytes = sum(b for _, b, _ in self._entries())
+            else:
+                self.current_bytes += size
+            if self.current_bytes > self.max_bytes:
+                self._prune()
+
+    def _prune(self) -> None:
+        entries = sorted(self._entries())
+        total = sum(b for _, b, _ in entries)
+        target = self.max_bytes * IMAGE_DISK_PRUNE_RATIO
+        for _, size, path in entries:
+            if total <= target:
+                break
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+        self.current_bytes = total
+
+_disk = _DiskBudget(IMAGE_DISK_CACHE_MAX_MB * 1024 * 1024)
+
+def write_atomic(path: str, data: bytes) -> None:
+    """
+    Write bytes so readers never see a partially written file
+
+    The write counts against IMAGE_DISK_CACHE_MAX_MB and may prune the
+    least recently used entries.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    _disk.added(len(data))
+
+def touch(path: str) -> None:
+    """
+    Mark a cache file as recently used
+    """
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+def read_cached(path: str) -> Optional[bytes]:
+    """
+    Bytes of a cache file (marking it as used), or None when it is missing
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    touch(path)
+    return data
+
+class _DecodedImageLRU:
+    """
+    Thread-safe LRU of decoded PIL images bounded by their pixel memory
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._data: "OrderedDict[Tuple[str, str], Image.Image]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(img: Image.Image) -> int:
+        return img.width * img.height * len(img.getbands())
+
+    def get(self, key: Tuple[str, str]) -> Optional[Image.Image]:
+        with self._lock:
+            img = self._data.get(key)
+            if img is not None:
+                self._data.move_to_end(key)
+            return img
+
+    def set(self, key: Tuple[str, str], img: Image.Image) -> None:
+        size = self._size(img)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.current_bytes -= self._size(old)
+            self._data[key] = img
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.current_bytes -= self._size(evicted)
+
+    def invalidate(self, url: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k[0] == url]:
+                self.current_bytes -= self._size(self._data.pop(key))
+
+_decoded = _DecodedImageLRU(IMAGE_CACHE_MAX_MB * 1024 * 1024)
+
+def fetch_image_bytes(url: str) -> bytes:
+    """
+    Get the raw bytes of an image, downloading it only on a disk-cache miss
+
+    Raises:
+        requests.exceptions.RequestException if the download fails
+    """
+    path = cache_path(cache_key(url))
+    data = read_cached(path)
+    if data is not None:
+        return data
+
+    response = api.get_session().get(url, timeout=api.API_TIMEOUT)
+    response.raise_for_status()
+    write_atomic(path, response.content)
+    return response.content
+
+def get_decoded(key: Tuple[str, str], load: Callable[[], Image.Image]) -> Image.Image:
+    """
+    Get a decoded image from the in-memory tier, calling load() on a miss
+
+    key is (url, variant); every variant of a URL is dropped together by
+    invalidate / drop_decoded. The tier is shared and bounded by
+    IMAGE_CACHE_MAX_MB. The returned image is shared between callers:
+    copy() it before drawing.
+    """
+    img = _decoded.get(key)
+    if img is None:
+        img = load()
+        _decoded.set(key, img)
+    return img
+
+def drop_decoded(url: str) -> None:
+    """
+    Drop every decoded variant of a URL from the in-memory tier
+    """
+    _decoded.invalidate(url)
+
+def put_image_bytes(url: str, data: bytes) -> None:
+    """
+    Seed the disk tier with bytes we already have (e.g. right after an upload)
+    """
+    invalidate(url)
+    write_atomic(cache_path(cache_key(url)), data)
+
+def invalidate(url: str) -> None:
+    """
+    Drop an image from both tiers
+    """
+    _decoded.invalidate(url)
+    try:
+        os.remove(cache_path(cache_key(url)))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,175 @@
+import io
+import os
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+from PIL import Image, ImageOps
+
+# 上傳照片前的壓縮設定
+UPLOAD_MAX_EDGE = int(os.environ.get('UPLOAD_MAX_EDGE', 2048))
+UPLOAD_QUALITY = int(os.environ.get('UPLOAD_QUALITY', 82))
+UPLOAD_MIN_QUALITY = 50
+ORIENTATION_TAG = 0x0112  # EXIF Orientation，1 表示不需轉正
+
+# 工程封面圖：比例與輸出寬度（大到小，不放大原圖）
+COVER_RATIO = (3, 2)
+COVER_WIDTHS = (1920, 960, 480)
+
+def _read_bytes(image_file) -> Tuple[str, bytes]:
+    """
+    (filename, bytes) from a Streamlit UploadedFile, a file-like object or
+    a (filename, fileobj/bytes, mimetype) tuple
+    """
+    if isinstance(image_file, tuple):
+        name, content = image_file[0], image_file[1]
+    else:
+        name, content = getattr(image_file, "name", "image.jpg"), image_file
+    if hasattr(content, "getvalue"):
+        return name, content.getvalue()
+    if hasattr(content, "read"):
+        content.seek(0)
+        return name, content.read()
+    return name, bytes(content)
+
+def _to_rgb(img: Image.Image) -> Image.Image:
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+def _encode_jpeg(img: Image.Image, quality: int) -> bytes:
+    buf = io.BytesIO()
+    # 不傳 exif / icc_profile，輸出不含中繼資料
+    img.save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buf.getvalue()
+
+def prepare_upload_image(image_file, max_edge: int = UPLOAD_MAX_EDGE, quality: int = UPLOAD_QUALITY, target_bytes: Optional[int] = None) -> Tuple[Tuple[str, bytes, str], Dict[str, Any]]:
+    """
+    Orient, downscale and re-encode a photo before uploading it
+
+    Applies the EXIF orientation, limits the longest edge to max_edge,
+    re-encodes as JPEG without metadata and, when target_bytes is given,
+    lowers the quality step by step until the output fits. When the photo
+    needed neither rotation nor downscaling and the re-encode is not
+    smaller, the original bytes are uploaded unchanged.
+
+    Args:
+        image_file: UploadedFile, file-like object or (filename, fileobj, mimetype)
+        max_edge: Longest edge in pixels after downscaling
+        quality: JPEG quality to start from
+        target_bytes: Optional output size to aim for
+
+    Returns:
+        ((filename, bytes, mimetype), report) where report holds
+        original_bytes, output_bytes, saved_bytes, saved_percent, width,
+        height, quality and kept_original
+    """
+    name, original = _read_bytes(image_file)
+
+    with Image.open(io.BytesIO(original)) as src:
+        original_mime = Image.MIME.get(src.format, "application/octet-stream")
+        unchanged = max(src.size) <= max_edge and src.getexif().get(ORIENTATION_TAG, 1) == 1
+        src.draft("RGB", (max_edge, max_edge))  # JPEG 直接以較低解析度解碼
+        img = ImageOps.exif_transpose(src)
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        img = _to_rgb(img)
+
+    output = _encode_jpeg(img, quality)
+    while target_bytes and len(output) > target_bytes and quality > UPLOAD_MIN_QUALITY:
+        quality = max(UPLOAD_MIN_QUALITY, quality - 8)
+        output = _encode_jpeg(img, quality)
+
+    # 不需轉正或縮小、重新壓縮也沒有變小時，直接上傳原檔
+    kept_original = unchanged and len(output) >= len(original)
+    if kept_original:
+        filename, output, mimetype = name, original, original_mime
+    else:
+        filename, mimetype = os.path.splitext(name)[0] + ".jpg", "image/jpeg"
+    report = {
+        "filename": filename,
+        "original_bytes": len(original),
+        "output_bytes": len(output),
+        "saved_bytes": len(original) - len(output),
+        "saved_percent": round((1 - len(output) / len(original)) * 100, 1) if original else 0.0,
+        "width": img.width,
+        "height": img.height,
+        "quality": None if kept_original else quality,
+        "kept_original": kept_original,
+    }
+    return (filename, output, mimetype), report
+
+def format_upload_report(report: Dict[str, Any]) -> str:
+    """
+    One-line summary of a prepare_upload_image report
+    """
+    return (f"{report['filename']}: {report['original_bytes'] / 1024 / 1024:.1f}MB → "
+            f"{report['output_bytes'] / 1024 / 1024:.1f}MB (節省 {report['saved_percent']}%)")
+
+def crop_to_ratio(img: Image.Image, ratio_w: int, ratio_h: int) -> Image.Image:
+    """
+    Centre-crop an image to the given aspect ratio without resizing it
+    """
+    target_ratio = ratio_w / ratio_h
+    w, h = img.size
+
+    if w / h > target_ratio:
+        # 原圖較寬，以高度為準裁切寬度
+        crop_w, crop_h = int(h * target_ratio), h
+    else:
+        # 原圖較高或等寬高比，以寬度為準裁切高度
+        crop_w, crop_h = w, int(w / target_ratio)
+
+    left = (w - crop_w) // 2
+    top = (h - crop_h) // 2
+    return img.crop((left, top, left + crop_w, top + crop_h))
+
+def prepare_cover_image(image_file, ratio: Tuple[int, int] = COVER_RATIO, widths: Sequence[int] = COVER_WIDTHS, quality: int = UPLOAD_QUALITY) -> Dict[str, Any]:
+    """
+    Build the responsive sizes of a project cover image
+
+    Large JPEG sources are decoded in draft mode close to the largest
+    requested width, then centre-cropped to ratio. Widths larger than the
+    cropped source are dropped instead of upscaled.
+
+    Args:
+        image_file: UploadedFile, file-like object or (filename, fileobj, mimetype)
+        ratio: (width, height) aspect ratio
+        widths: Output widths
+        quality: JPEG quality
+
+    Returns:
+        Dict with "upload" (filename, bytes, mimetype) of the largest size,
+        "variants" {width: PIL image} and "report" (cpu_seconds,
+        source size/bytes, output bytes per width)
+    """
+    cpu_start = time.process_time()
+    name, original = _read_bytes(image_file)
+    max_width = max(widths)
+
+    with Image.open(io.BytesIO(original)) as src:
+        source_size = src.size
+        src.draft("RGB", (max_width, round(max_width * ratio[1] / ratio[0])))
+        img = ImageOps.exif_transpose(src)
+    img = _to_rgb(crop_to_ratio(img, *ratio))
+
+    variants = {}
+    encoded = {}
+    for width in sorted({min(w, img.width) for w in widths}, reverse=True):
+        height = round(width * ratio[1] / ratio[0])
+        variant = img if width == img.width else img.resize((width, height), Image.LANCZOS)
+        variants[width] = variant
+        encoded[width] = _encode_jpeg(variant, quality)
+
+    largest = max(encoded)
+    filename = os.path.splitext(name)[0] + ".jpg"
+    return {
+        "upload": (filename, encoded[largest], "image/jpeg"),
+        "variants": variants,
+        "report": {
+            "cpu_seconds": round(time.process_time() - cpu_start, 3),
+            "source_size": source_size,
+            "source_bytes": len(original),
+            "output_bytes": {width: len(data) for width, data in encoded.items()},
+        },
+    }
@@ -0,0 +1,743 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from fake_data import CATEGORIES, VENDORS, generate_defect_specs
+
+# 本機模擬後端：依 openapi.json 的路由，以記憶體中的資料集回應 api.py 的請求
+#
+# 用於壓力測試與 benchmark.py，不需啟動真正的後端。
+#   python mock_backend.py --defects 100000 --photos 5000 --latency-ms 20 --jitter-ms 10
+#   API_BASE_URL=http://127.0.0.1:8000 streamlit run streamlit_app.py
+
+MOCK_LATENCY_MS = float(os.environ.get('MOCK_LATENCY_MS', 0))  # 每個請求固定延遲
+MOCK_JITTER_MS = float(os.environ.get('MOCK_JITTER_MS', 0))    # 額外的隨機延遲 (0 ~ jitter)
+
+OPENAPI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'openapi.json')
+# api.py 有使用但 openapi.json 未列出的路由
+EXTRA_ROUTES = [
+    ('GET', '/defects/unique_code/{unique_code}'),
+    ('POST', '/improvements/by-unique-code/{unique_code}'),
+]
+UPLOAD_PREFIX = '/uploads'
+
+# 資源路徑 -> (資料表, 主鍵)
+RESOURCES = {
+    'projects': 'project_id',
+    'users': 'user_id',
+    'permissions': 'permission_id',
+    'base-maps': 'base_map_id',
+    'vendors': 'vendor_id',
+    'defect-categories': 'defect_category_id',
+    'defects': 'defect_id',
+    'defect-marks': 'defect_mark_id',
+    'photos': 'photo_id',
+    'improvements': 'improvement_id',
+    'confirmations': 'confirmation_id',
+}
+
+BASEMAP_SIZE = (2400, 1600)  # 底圖圖片尺寸，缺失標記落在其中
+
+def _now() -> str:
+    return datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+
+def _placeholder_image(width: int, height: int, fmt: str = 'JPEG') -> bytes:
+    """
+    A gradient image for photo and basemap URLs (a 1x1 GIF without Pillow)
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return b'GIF89a\x01\x00\x01\x00\x80\x00\x00\xff\xff\xff\x00\x00\x00!\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+class MockDataset:
+    """
+    In-memory tables keyed by primary key, shaped like the backend responses
+
+    Defect rows carry the joined names (category_name, assigned_vendor_name,
+    ...) the list endpoint returns. Per-project defect lists are cached and
+    rebuilt only after a write, so paging through 100k defects does not
+    rescan the table for every page.
+    """
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[int, Dict[str, Any]]] = {name: {} for name in RESOURCES}
+        self.files: Dict[str, Tuple[bytes, str]] = {}  # 上傳路徑 -> (內容, Content-Type)
+        self._next_ids: Dict[str, int] = {name: 1 for name in RESOURCES}
+        self._project_defects: Dict[int, List[Dict[str, Any]]] = {}
+        self._unique_codes: Dict[str, int] = {}  # unique_code -> defect_id
+        self._lock = threading.RLock()
+
+    # --- 基本操作 ---
+
+    def insert(self, resource: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        key = RESOURCES[resource]
+        with self._lock:
+            row[key] = self._next_ids[resource]
+            self._next_ids[resource] += 1
+            self.tables[resource][row[key]] = row
+            if resource == 'defects':
+                self._project_defects.pop(row.get('project_id'), None)
+        return row
+
+    def get(self, resource: str, item_id: int) -> Optional[Dict[str, Any]]:
+        return self.tables[resource].get(item_id)
+
+    def values(self, resource: str) -> List[Dict[str, Any]]:
+        # 複製一份，其他執行緒新增資料時仍可安全迭代
+        with self._lock:
+            return list(self.tables[resource].values())
+
+    def defect_by_code(self, unique_code: str) -> Optional[Dict[str, Any]]:
+        return self.tables['defects'].get(self._unique_codes.get(unique_code))
+
+    def update(self, resource: str, item_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.tables[resource].get(item_id)
+            if row is None:
+                return None
+            data = {k: v for k, v in data.items() if k != RESOURCES[resource]}
+            row.update(data)
+            if 'updated_at' in row:
+                row['updated_at'] = _now()
+            if resource == 'defects':
+                self._join_defect(row)
+                self._project_defects.pop(row.get('project_id'), None)
+        return row
+
+    def delete(self, resource: str, item_id: int) -> bool:
+        with self._lock:
+            row = self.tables[resource].pop(item_id, None)
+            if row is not None and resource == 'defects':
+                self._project_defects.pop(row.get('project_id'), None)
+                self._unique_codes.pop(row.get('unique_code'), None)
+        return row is not None
+
+    def rows(self, resource: str, filters: Dict[str, str]) -> List[Dict[str, Any]]:
+        """
+        Rows whose fields equal every filter (compared as strings)
+        """
+        with self._lock:
+            if resource == 'defects' and 'project_id' in filters:
+                filters = dict(filters)
+                project_id = int(filters.pop('project_id'))
+                if project_id not in self._project_defects:
+                    self._project_defects[project_id] = [
+                        row for row in self.tables['defects'].values() if row['project_id'] == project_id
+                    ]
+                candidates = self._project_defects[project_id]
+            else:
+                candidates = self.values(resource)
+        if not filters:
+            return candidates
+        return [row for row in candidates if all(str(row.get(k)) == v for k, v in filters.items())]
+
+    def add_file(self, kind: str, item_id: int, content: bytes, content_type: str = 'image/jpeg', name: str = 'image.jpg') -> str:
+        ext = os.path.splitext(name)[1] or '.jpg'
+        path = f"{UPLOAD_PREFIX}/{kind}/{item_id}{ext}"
+        self.files[path] = (content, content_type)
+        return path
+
+    # --- 關聯欄位 ---
+
+    def _join_defect(self, row: Dict[str, Any]) -> None:
+        category = self.tables['defect-categories'].get(row.get('defect_category_id')) or {}
+        assigned = self.tables['vendors'].get(row.get('assigned_vendor_id')) or {}
+        responsible = self.tables['vendors'].get(row.get('responsible_vendor_id')) or {}
+        project = self.tables['projects'].get(row.get('project_id')) or {}
+        submitter = self.tables['users'].get(row.get('submitted_id')) or {}
+        row['category_name'] = category.get('category_name')
+        row['assigned_vendor_name'] = assigned.get('vendor_name')
+        row['responsible_vendor_name'] = responsible.get('vendor_name')
+        row['project_name'] = project.get('project_name')
+        row['submitter_name'] = submitter.get('name')
+
+    def create_defect(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        now = _now()
+        row = {
+            'defect_category_id': None, 'assigned_vendor_id': None, 'responsible_vendor_id': None,
+            'previous_defect_id': None, 'repair_description': None, 'expected_completion_day': None,
+            'confirmer_id': None, 'status': '等待中', 'location': None,
+            'created_at': now, 'updated_at': now,
+            **data,
+        }
+        row.setdefault('unique_code', None)
+        self._join_defect(row)
+        with self._lock:
+            self.insert('defects', row)
+            if not row['unique_code']:
+                row['unique_code'] = f"D{row['defect_id']:08d}"
+            self._unique_codes[row['unique_code']] = row['defect_id']
+        return row
+
+    # --- 種子資料 ---
+
+    def seed(self, projects: int = 1, defects: int = 1000, photos: int = 200, basemaps: int = 3, users: int = 20, seed: int = 0, base_date: Optional[date] = None) -> 'MockDataset':
+        """
+        Fill the tables with fake_data's categories, vendors and defect specs
+
+        Args:
+            projects: Number of projects; defects are spread evenly across them
+            defects: Total number of defects
+            photos: Total number of defect photos (all share one image)
+            basemaps: Basemaps per project
+            users: Number of users, each with a permission on every project
+            seed: Random seed, the same arguments give the same dataset
+            base_date: Day the defect dates are generated around (default:
+                today, so urgency classes look current)
+
+        Returns:
+            self
+        """
+        rng = random.Random(seed)
+        base_date = base_date or date.today()
+        today = datetime.combine(base_date, datetime.min.time())
+        photo_bytes = _placeholder_image(640, 480)
+        basemap_bytes = _placeholder_image(*BASEMAP_SIZE, 'PNG')
+
+        for i in range(users):
+            self.insert('users', {
+                'name': f"使用者{i + 1}", 'email': f"user{i + 1}@example.com", 'company_name': None,
+                'line_id': None, 'avatar_path': None, 'created_at': _now(),
+            })
+
+        for p in range(projects):
+            project = self.insert('projects', {'project_name': f"測試工程{p + 1}", 'image_path': None, 'created_at': _now()})
+            project_id = project['project_id']
+            project['image_path'] = self.add_file('projects', project_id, photo_bytes).lstrip('/')
+            project['unique_code'] = f"P{project_id:06d}"
+
+            for user_id, user in self.tables['users'].items():
+                self.insert('permissions', {
+                    'project_id': project_id, 'user_email': user['email'],
+                    'user_role': 'admin' if user_id == 1 else rng.choice(['member', 'viewer']),
+                    'project_name': project['project_name'], 'user_name': user['name'], 'avatar_path': None,
+                })
+            categories = [
+                self.insert('defect-categories', {'category_name': name, 'project_id': project_id, 'description': f"{name}相關問題"})
+                for name in CATEGORIES
+            ]
+            vendors = [self.insert('vendors', {**vendor, 'project_id': project_id}) for vendor in VENDORS]
+            project_basemaps = []
+            for b in range(basemaps):
+                basemap = self.insert('base-maps', {'project_id': project_id, 'map_name': f"{b + 1}F 平面圖", 'file_path': ''})
+                basemap['file_path'] = self.add_file('base-maps', basemap['base_map_id'], basemap_bytes, 'image/png', 'map.png').lstrip('/')
+                project_basemaps.append(basemap)
+
+            # 狀態、預期完成日期與改善報告的分布與 fake_data 大量生成相同
+            count = defects // projects + (1 if p < defects % projects else 0)
+            specs = generate_defect_specs(count, categories, vendors, project_basemaps, seed=seed + p, photo_ratio=0, mark_area=BASEMAP_SIZE, base_date=base_date)
+            for spec in specs:
+                expected = spec['defect']['expected_completion_day']
+                if expected:
+                    created = datetime.fromisoformat(expected) - timedelta(days=rng.randint(3, 60), seconds=rng.randint(0, 86399))
+                else:
+                    created = today - timedelta(days=rng.randint(0, 365), seconds=rng.randint(0, 86399))
+                created = min(created, today)
+                updated = created + (today - created) * rng.random()
+                defect = self.create_defect({
+                    **spec['defect'],
+                    'project_id': project_id,
+                    'submitted_id': rng.randint(1, max(1, users)),
+                    'created_at': created.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'updated_at': updated.strftime('%Y-%m-%dT%H:%M:%S'),
+                })
+                if spec['mark']:
+                    self.insert('defect-marks', {'defect_form_id': defect['defect_id'], **spec['mark']})
+                if spec['improvement']:
+                    self.insert('improvements', {
+                        **spec['improvement'], 'defect_id': defect['defect_id'],
+                        'submitter_id': defect['assigned_vendor_id'], 'created_at': _now(),
+                    })
+
+        defect_ids = list(self.tables['defects'])
+        for _ in range(photos if defect_ids else 0):
+            photo = self.insert('photos', {
+                'related_type': 'defect', 'related_id': rng.choice(defect_ids), 'description': '',
+                'image_url': '', 'full_url': '', 'created_at': _now(),
+            })
+            photo['image_url'] = self.add_file('photos', photo['photo_id'], photo_bytes)
+            photo['full_url'] = photo['image_url']
+        return self
+
+    # --- 彙總 ---
+
+    def defect_stats(self, project_id: int) -> Dict[str, Any]:
+        rows = self.rows('defects', {'project_id': str(project_id)})
+        today = datetime.now().date().isoformat()
+        status_counts: Dict[str, int] = {}
+        overdue = 0
+        for row in rows:
+            status_counts[row['status']] = status_counts.get(row['status'], 0) + 1
+            expected = row.get('expected_completion_day')
+            if expected and expected < today and row['status'] not in ('已完成', '已取消'):
+                overdue += 1
+        return {
+            'total': len(rows),
+            'completed': status_counts.get('已完成', 0),
+            'in_progress': status_counts.get('改善中', 0),
+            'overdue': overdue,
+            'status_counts': status_counts,
+        }
+
+    def defect_detail(self, defect: Dict[str, Any], query: Dict[str, str]) -> Dict[str, Any]:
+        flag = lambda name: query.get(name, 'false').lower() == 'true'
+        full = flag('with_full_related')
+        detail = dict(defect)
+        if flag('with_marks') or full:
+            detail['defect_marks'] = self.rows('defect-marks', {'defect_form_id': str(defect['defect_id'])})
+        if flag('with_photos') or full:
+            detail['photos'] = self.rows('photos', {'related_type': 'defect', 'related_id': str(defect['defect_id'])})
+        if flag('with_improvements') or full:
+            detail['improvements'] = self.rows('improvements', {'defect_id': str(defect['defect_id'])})
+        return detail
+
+class HttpError(Exception):
+    def __init__(self, status: int, detail: Any = ''):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+def _load_routes(path: str = OPENAPI_PATH) -> List[Tuple[str, re.Pattern, str, Dict[str, Dict[str, Any]]]]:
+    """
+    (method, path regex, template, query parameter schemas) for every
+    operation, fixed paths first
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        paths = json.load(f).get('paths', {})
+    routes = {
+        (method.upper(), template): {
+            param['name']: param.get('schema', {})
+            for param in op.get('parameters', []) if param.get('in') == 'query'
+        }
+        for template, ops in paths.items() for method, op in ops.items()
+    }
+    for route in EXTRA_ROUTES:
+        routes.setdefault(route, {})
+    ordered = sorted(routes, key=lambda route: (route[1].count('{'), -len(route[1])))
+    return [
+        (method, re.compile('^' + re.sub(r'\\\{([^/]+?)\\\}', r'(?P<\1>[^/]+)', re.escape(template)) + '/?$'), template, routes[(method, template)])
+        for method, template in ordered
+    ]
+
+def _query_error(name: str, kind: str, msg: str, value: Any) -> HttpError:
+    # 與 FastAPI 的 422 回應格式相同
+    return HttpError(422, [{'type': kind, 'loc': ['query', name], 'msg': msg, 'input': value}])
+
+def _validate_query(query: Dict[str, str], schemas: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Apply the openapi.json defaults and reject values outside the schema
+
+    Only declared parameters are kept, like the real backend ignores
+    unknown ones. Integer parameters must parse and respect
+    minimum / maximum (e.g. limit <= 100), otherwise 422.
+    """
+    validated = {}
+    for name, schema in schemas.items():
+        value = query.get(name)
+        if value is None:
+            if 'default' in schema and schema['default'] is not None:
+                validated[name] = str(schema['default'])
+            continue
+        types = {option.get('type') for option in schema.get('anyOf', [schema])}
+        if 'integer' in types:
+            try:
+                number = int(value)
+            except ValueError:
+                raise _query_error(name, 'int_parsing', 'Input should be a valid integer', value)
+            if 'minimum' in schema and number < schema['minimum']:
+                raise _query_error(name, 'greater_than_equal', f"Input should be greater than or equal to {schema['minimum']}", value)
+            if 'maximum' in schema and number > schema['maximum']:
+                raise _query_error(name, 'less_than_equal', f"Input should be less than or equal to {schema['maximum']}", value)
+        validated[name] = value
+    return validated
+
+class MockBackend(ThreadingHTTPServer):
+    """
+    HTTP server answering the openapi.json routes from a MockDataset
+
+    Routes with specific behaviour (stats, defect detail, uploads, ...)
+    have a handler in SPECIAL; every other route falls back to generic
+    list / get / create / update / delete on the resource named by its
+    first path segment. GET responses carry an ETag and honour
+    If-None-Match, so api._get_json revalidation is exercised too.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], dataset: MockDataset, latency_ms: float = MOCK_LATENCY_MS, jitter_ms: float = MOCK_JITTER_MS):
+        super().__init__(address, _MockHandler)
+        self.dataset = dataset
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.routes = _load_routes()
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def delay(self) -> None:
+        with self._count_lock:
+            self.request_count += 1
+        seconds = (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def match(self, method: str, path: str) -> Tuple[str, Dict[str, str], Dict[str, Dict[str, Any]]]:
+        allowed = False
+        for route_method, pattern, template, query_schemas in self.routes:
+            m = pattern.match(path)
+            if m:
+                if route_method == method:
+                    return template, m.groupdict(), query_schemas
+                allowed = True
+        raise HttpError(405 if allowed else 404, 'Method Not Allowed' if allowed else 'Not Found')
+
+    def dispatch(self, method: str, path: str, query: Dict[str, str], body: Dict[str, Any], files: Dict[str, Tuple[bytes, str, str]]) -> Tuple[int, Any]:
+        template, params, query_schemas = self.match(method, path)
+        if query_schemas:
+            query = _validate_query(query, query_schemas)
+        handler = SPECIAL.get((method, template))
+        if handler is not None:
+            return handler(self.dataset, params, query, body, files)
+        return _generic(self.dataset, method, template, params, query, body)
+
+def _resource(template: str) -> str:
+    resource = template.strip('/').split('/')[0]
+    if resource not in RESOURCES:
+        raise HttpError(501, f'{template} is not implemented by the mock backend')
+    return resource
+
+def _int(value: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HttpError(422, f'invalid id {value!r}')
+
+# 查詢參數名稱與資料欄位不同的篩選
+FILTER_FIELDS = {
+    ('defect-marks', 'defect_id'): 'defect_form_id',
+}
+
+def _paginate(rows: List[Dict[str, Any]], query: Dict[str, str]) -> List[Dict[str, Any]]:
+    # skip / limit 的預設值與上限已由 _validate_query 依 openapi.json 套用
+    skip = int(query.get('skip', 0))
+    limit = int(query['limit']) if 'limit' in query else len(rows)
+    return rows[skip:skip + limit]
+
+def _generic(data: MockDataset, method: str, template: str, params: Dict[str, str], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Any]:
+    resource = _resource(template)
+    segments = template.strip('/').split('/')
+    if len(segments) == 1:
+        if method == 'GET':
+            filters = {FILTER_FIELDS.get((resource, k), k): v for k, v in query.items() if k not in ('skip', 'limit')}
+            return 200, _paginate(data.rows(resource, filters), query)
+        if method == 'POST':
+            if resource == 'defects':
+                return 201, data.create_defect(body)
+            row = {**body}
+            if resource in ('projects', 'users', 'photos', 'improvements', 'confirmations'):
+                row.setdefault('created_at', _now())
+            return 201, data.insert(resource, row)
+    elif len(segments) == 2 and segments[1].startswith('{'):
+        item_id = _int(next(iter(params.values())))
+        if method == 'GET':
+            row = data.get(resource, item_id)
+        elif method == 'PUT':
+            row = data.update(resource, item_id, body)
+        elif method == 'DELETE':
+            if not data.delete(resource, item_id):
+                raise HttpError(404, f'{resource} {item_id} not found')
+            return 204, None
+        else:
+            row = None
+        if row is None:
+            raise HttpError(404, f'{resource} {item_id} not found')
+        return 200, row
+    raise HttpError(501, f'{method} {template} is not implemented by the mock backend')
+
+# --- 特殊路由 ---
+
+def _defect_stats(data, params, query, body, files):
+    if 'project_id' not in query:
+        raise HttpError(422, 'project_id is required')
+    return 200, data.defect_stats(_int(query['project_id']))
+
+def _defect_detail(data, params, query, body, files):
+    defect = data.get('defects', _int(params['defect_id']))
+    if defect is None:
+        raise HttpError(404, 'defect not found')
+    return 200, data.defect_detail(defect, query)
+
+def _defect_full(data, params, query, body, files):
+    return _defect_detail(data, params, {'with_full_related': 'true'}, body, files)
+
+def _defect_by_code(data, params, query, body, files):
+    defect = data.defect_by_code(params['unique_code'])
+    if defect is None:
+        raise HttpError(404, 'defect not found')
+    return 200, defect
+
+def _improvement_by_code(data, params, query, body, files):
+    status, defect = _defect_by_code(data, params, query, body, files)
+    row = data.insert('improvements', {
+        'defect_id': defect['defect_id'], 'submitter_id': defect.get('assigned_vendor_id'),
+        'content': body.get('content', ''), 'improvement_date': body.get('improvement_date'), 'created_at': _now(),
+    })
+    return 201, row
+
+def _project_with_counts(data, params, query, body, files):
+    project = data.get('projects', _int(params['project_id']))
+    if project is None:
+        raise HttpError(404, 'project not found')
+    filters = {'project_id': str(project['project_id'])}
+    return 200, {
+        **project,
+        'base_map_count': len(data.rows('base-maps', filters)),
+        'defect_count': len(data.rows('defects', filters)),
+        'user_count': len(data.rows('permissions', filters)),
+    }
+
+def _project_with_roles(data, params, query, body, files):
+    project = data.get('projects', _int(params['project_id']))
+    if project is None:
+        raise HttpError(404, 'project not found')
+    permissions = data.rows('permissions', {'project_id': str(project['project_id'])})
+    return 200, {
+        'project_id': project['project_id'], 'project_name': project['project_name'],
+        'user_roles': [{'user_email': p['user_email'], 'user_name': p.get('user_name'), 'user_role': p['user_role']} for p in permissions],
+    }
+
+def _upload(resource: str, field: str, kind: str):
+    def handler(data, params, query, body, files):
+        item_id = _int(next(iter(params.values())))
+        row = data.get(resource, item_id)
+        if row is None:
+            raise HttpError(404, f'{resource} {item_id} not found')
+        if not files:
+            raise HttpError(422, 'file is required')
+        content, content_type, name = next(iter(files.values()))
+        path = data.add_file(kind, item_id, content, content_type, name)
+        return 200, data.update(resource, item_id, {field: path.lstrip('/')})
+    return handler
+
+def _photo_upload(data, params, query, body, files):
+    if not files:
+        # /photos/ 也接受 JSON（只建立紀錄）
+        return _generic(data, 'POST', '/photos/', params, query, body)
+    content, content_type, name = next(iter(files.values()))
+    photo = data.insert('photos', {
+        'related_type': body.get('related_type', 'defect'), 'related_id': _int(body.get('related_id')),
+        'description': body.get('description', ''), 'image_url': '', 'full_url': '', 'created_at': _now(),
+    })
+    photo['image_url'] = photo['full_url'] = data.add_file('photos', photo['photo_id'], content, content_type, name)
+    return 201, photo
+
+def _basemaps_with_counts(data, params, query, body, files):
+    filters = {'project_id': params['project_id']} if 'project_id' in params else {}
+    basemaps = data.rows('base-maps', filters)
+    marks: Dict[int, int] = {}
+    for mark in data.values('defect-marks'):
+        marks[mark['base_map_id']] = marks.get(mark['base_map_id'], 0) + 1
+    return 200, [{**b, 'defect_count': marks.get(b['base_map_id'], 0)} for b in basemaps]
+
+def _defect_counts(resource: str, field: str):
+    def handler(data, params, query, body, files):
+        counts: Dict[int, int] = {}
+        for defect in data.values('defects'):
+            counts[defect.get(field)] = counts.get(defect.get(field), 0) + 1
+        key = RESOURCES[resource]
+        filters = {k: v for k, v in query.items() if k not in ('skip', 'limit')}
+        return 200, [{**row, 'defect_count': counts.get(row[key], 0)} for row in _paginate(data.rows(resource, filters), query)]
+    return handler
+
+def _user_by_line(data, params, query, body, files):
+    users = data.rows('users', {'line_id': params['line_id']})
+    if not users:
+        raise HttpError(404, 'user not found')
+    return 200, users[0]
+
+def _user_projects(data, params, query, body, files):
+    user = data.get('users', _int(params['user_id']))
+    if user is None:
+        raise HttpError(404, 'user not found')
+    permissions = data.rows('permissions', {'user_email': str(user.get('email'))})
+    projects = [
+        {**data.get('projects', p['project_id']), 'user_role': p['user_role']}
+        for p in permissions if data.get('projects', p['project_id'])
+    ]
+    return 200, {**user, 'projects': projects}
+
+SPECIAL: Dict[Tuple[str, str], Callable[..., Tuple[int, Any]]] = {
+    ('GET', '/'): lambda data, params, query, body, files: (200, {'message': 'mock backend'}),
+    ('GET', '/users/line/{line_id}'): _user_by_line,
+    ('GET', '/users/{user_id}/projects'): _user_projects,
+    ('GET', '/vendors/with-counts'): _defect_counts('vendors', 'assigned_vendor_id'),
+    ('GET', '/defect-categories/with-counts'): _defect_counts('defect-categories', 'defect_category_id'),
+    ('GET', '/defects/stats'): _defect_stats,
+    ('GET', '/defects/{defect_id}'): _defect_detail,
+    ('GET', '/defects/{defect_id}/full'): _defect_full,
+    ('GET', '/defects/unique_code/{unique_code}'): _defect_by_code,
+    ('POST', '/improvements/by-unique-code/{unique_code}'): _improvement_by_code,
+    ('GET', '/projects/{project_id}/with-counts'): _project_with_counts,
+    ('GET', '/projects/{project_id}/with-roles'): _project_with_roles,
+    ('POST', '/projects/{project_id}/image'): _upload('projects', 'image_path', 'projects'),
+    ('POST', '/base-maps/{base_map_id}/image'): _upload('base-maps', 'file_path', 'base-maps'),
+    ('POST', '/photos/'): _photo_upload,
+    ('POST', '/photos/upload/'): _photo_upload,
+    ('GET', '/base-maps/project/{project_id}/with-counts'): _basemaps_with_counts,
+}
+
+def _parse_multipart(content_type: str, raw: bytes) -> Tuple[Dict[str, str], Dict[str, Tuple[bytes, str, str]]]:
+    message = BytesParser(policy=policy.HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + raw)
+    fields, files = {}, {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        filename = part.get_filename()
+        if filename is not None:
+            files[name] = (part.get_payload(decode=True) or b'', part.get_content_type(), filename)
+        else:
+            fields[name] = part.get_content()
+    return fields, files
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive，讓 api.py 的連線池可重用連線
+    disable_nagle_algorithm = True  # 標頭與內容分開送出，避免 keep-alive 下每個回應多等 40 ms
+    server: MockBackend
+
+    def _send(self, status: int, body: bytes = b'', content_type: str = 'application/json', headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        if status != 204:
+            self.send_header('Content-Type', content_type)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _handle(self, method: str) -> None:
+        self.server.delay()
+        split = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(split.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+
+        if method == 'GET' and split.path in self.server.dataset.files:
+            content, content_type = self.server.dataset.files[split.path]
+            self._send_cacheable(content, content_type)
+            return
+
+        body: Dict[str, Any] = {}
+        files: Dict[str, Tuple[bytes, str, str]] = {}
+        content_type = self.headers.get('Content-Type', '')
+        try:
+            if content_type.startswith('multipart/form-data'):
+                body, files = _parse_multipart(content_type, raw)
+            elif raw:
+                body = json.loads(raw)
+            status, result = self.server.dispatch(method, split.path, query, body, files)
+        except HttpError as e:
+            self._send(e.status, json.dumps({'detail': e.detail}).encode())
+            return
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(422, json.dumps({'detail': str(e)}).encode())
+            return
+        except Exception as e:
+            self._send(500, json.dumps({'detail': f'{type(e).__name__}: {e}'}).encode())
+            return
+
+        payload = b'' if status == 204 else json.dumps(result, ensure_ascii=False).encode('utf-8')
+        if method == 'GET':
+            self._send_cacheable(payload, 'application/json')
+        else:
+            self._send(status, payload)
+
+    def _send_cacheable(self, body: bytes, content_type: str) -> None:
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self._send(304, b'', content_type, {'ETag': etag})
+        else:
+            self._send(200, body, content_type, {'ETag': etag})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def log_message(self, format, *args):
+        pass
+
+def start_mock_backend(dataset: Optional[MockDataset] = None, port: int = 0, host: str = '127.0.0.1', latency_ms: float = MOCK_LATENCY_MS, jitter_ms: float = MOCK_JITTER_MS) -> MockBackend:
+    """
+    Serve a dataset from a daemon thread
+
+    Args:
+        dataset: Data to serve (default: MockDataset().seed())
+        port: Port to listen on, 0 picks a free one (see server.base_url)
+        latency_ms: Fixed delay added to every request
+        jitter_ms: Random extra delay of 0 to jitter_ms per request
+
+    Returns:
+        The running server; call shutdown() to stop it
+    """
+    server = MockBackend((host, port), dataset or MockDataset().seed(), latency_ms, jitter_ms)
+    threading.Thread(target=server.serve_forever, name='mock-backend', daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the openapi.json routes from an in-memory dataset')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--projects', type=int, default=1)
+    parser.add_argument('--defects', type=int, default=1000)
+    parser.add_argument('--photos', type=int, default=200)
+    parser.add_argument('--basemaps', type=int, default=3)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--base-date', type=date.fromisoformat, help='Day the defect dates are generated around, YYYY-MM-DD (default: today)')
+    parser.add_argument('--latency-ms', type=float, default=MOCK_LATENCY_MS)
+    parser.add_argument('--jitter-ms', type=float, default=MOCK_JITTER_MS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dataset = MockDataset().seed(args.projects, args.defects, args.photos, args.basemaps, args.users, args.seed, args.base_date)
+    print(f"Seeded {args.defects} defects and {args.photos} photos in {time.perf_counter() - start:.1f}s")
+
+    server = MockBackend((args.host, args.port), dataset, args.latency_ms, args.jitter_ms)
+    print(f"Mock backend on {server.base_url} (latency {args.latency_ms} ms + jitter {args.jitter_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
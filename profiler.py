@@ -0,0 +1,194 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+import streamlit as st
+import api
+from api_metrics import route_template
+
+# 頁面效能分析：每次 rerun 產生一棵 span 樹（API 請求自動掛在當下的 span 底下）
+#
+# 預設關閉；設定 PAGE_PROFILER=1 或網址加上 ?profile=1 時啟用。
+# 類別：api（後端請求）、data（DataFrame 處理）、plot（Plotly 圖表）、image（圖片傳送）、code（其他）
+
+PAGE_PROFILER = os.environ.get('PAGE_PROFILER', '') == '1'
+PAGE_PROFILER_LOG = os.environ.get('PAGE_PROFILER_LOG', os.path.join('.cache', 'profiler', 'spans.jsonl'))
+PAGE_PROFILER_HISTORY = 20  # session_state 保留的 rerun 數
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar('profiler_span', default=None)
+_log_lock = threading.Lock()
+
+class Span:
+    """
+    One timed section of a rerun
+    """
+
+    def __init__(self, name: str, category: str = "code", parent: Optional["Span"] = None, start: Optional[float] = None, **attrs):
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.start = time.perf_counter() if start is None else start
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+        self._lock = threading.Lock()
+        if parent is not None:
+            with parent._lock:
+                parent.children.append(self)
+
+    @property
+    def seconds(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def self_seconds(self) -> float:
+        """
+        Time not covered by child spans (0 when children ran concurrently)
+        """
+        return max(0.0, self.seconds - sum(child.seconds for child in self.children))
+
+    def to_dict(self, origin: Optional[float] = None) -> Dict[str, Any]:
+        origin = self.start if origin is None else origin
+        return {
+            "name": self.name,
+            "category": self.category,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.seconds * 1000, 3),
+            **({"attrs": self.attrs} if self.attrs else {}),
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+def enabled() -> bool:
+    """
+    Whether this rerun is profiled
+    """
+    if PAGE_PROFILER:
+        return True
+    try:
+        return st.query_params.get("profile") == "1"
+    except Exception:
+        return False
+
+@contextmanager
+def span(name: str, category: str = "code", **attrs) -> Iterator[Optional[Span]]:
+    """
+    Time a section under the current span; does nothing outside a trace
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    current = Span(name, category, parent, **attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+
+def profiled(name: Optional[str] = None, category: str = "code"):
+    """
+    Decorator form of span(), named after the function by default
+    """
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(label, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _api_hook(event: Dict[str, Any]) -> None:
+    # 只記錄在追蹤中的執行緒（asyncio.to_thread 會帶著 context，一般執行緒池則不會）
+    parent = _current_span.get()
+    if parent is None:
+        return
+    end = time.perf_counter()
+    api_span = Span(
+        f"{event['method']} {route_template(event['path'])}", "api", parent, start=end - event['seconds'],
+        status=event['status'], bytes_in=event['bytes_in'], bytes_out=event['bytes_out'],
+    )
+    api_span.end = end
+
+def category_totals(root: Span) -> Dict[str, float]:
+    """
+    Self time per category in milliseconds
+    """
+    totals: Dict[str, float] = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        totals[node.category] = totals.get(node.category, 0.0) + node.self_seconds() * 1000
+        stack.extend(node.children)
+    return {k: round(v, 1) for k, v in sorted(totals.items(), key=lambda item: -item[1])}
+
+def _write_log(root: Span) -> None:
+    record = {
+        "time": time.time(),
+        "page": root.name,
+        "categories_ms": category_totals(root),
+        "tree": root.to_dict(),
+    }
+    try:
+        os.makedirs(os.path.dirname(PAGE_PROFILER_LOG) or ".", exist_ok=True)
+        with _log_lock:
+            with open(PAGE_PROFILER_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"Error writing profiler log: {e}")
+
+def _tree_rows(node: Span, depth: int = 0) -> List[Dict[str, Any]]:
+    rows = [{
+        "span": "　" * depth + node.name,
+        "類別": node.category,
+        "ms": round(node.seconds * 1000, 1),
+        "自身 ms": round(node.self_seconds() * 1000, 1),
+    }]
+    for child in node.children:
+        rows.extend(_tree_rows(child, depth + 1))
+    return rows
+
+def render_sidebar(root: Span) -> None:
+    """
+    Debug panel with the category breakdown and span tree of a rerun
+    """
+    with st.sidebar.expander(f"🐞 效能分析 {root.seconds * 1000:.0f} ms", expanded=False):
+        st.caption(" / ".join(f"{category} {ms:.0f} ms" for category, ms in category_totals(root).items()))
+        st.dataframe(_tree_rows(root), hide_index=True, use_container_width=True)
+        st.caption(f"記錄檔: {PAGE_PROFILER_LOG}")
+
+@contextmanager
+def page(name: str) -> Iterator[Optional[Span]]:
+    """
+    Trace one rerun of a page when profiling is enabled
+
+    The span tree is kept in st.session_state.profiler_traces, appended
+    to PAGE_PROFILER_LOG and shown in the sidebar, also when the page
+    ends with st.stop() or st.rerun().
+    """
+    if not enabled():
+        yield None
+        return
+
+    api.add_request_hook(_api_hook)
+    root = Span(name, "page")
+    token = _current_span.set(root)
+    try:
+        yield root
+    finally:
+        root.end = time.perf_counter()
+        _current_span.reset(token)
+        traces = st.session_state.setdefault("profiler_traces", [])
+        traces.append(root.to_dict())
+        del traces[:-PAGE_PROFILER_HISTORY]
+        _write_log(root)
+        try:
+            render_sidebar(root)
+        except Exception as e:
+            print(f"Error rendering profiler panel: {e}")
@@ -0,0 +1,271 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import pandas as pd
+
+# 缺失全文檢索：中文以相鄰兩字 (bigram) 為詞、英數以整個單字為詞，建立反向索引
+
+# 欄位 -> 權重，分數為命中欄位權重的總和
+FIELD_WEIGHTS = {
+    'defect_id': 5,
+    'defect_description': 3,
+    'location': 2,
+    'category_name': 1,
+    'assigned_vendor_name': 1,
+    'responsible_vendor_name': 1,
+}
+
+# 英文詞至少要這麼長才以前綴比對，較短的只比對完整的詞
+PREFIX_MIN_LENGTH = 2
+
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'  # 假名、中日韓漢字
+_TOKEN_RE = re.compile(f'[{_CJK}]+|[0-9a-z]+')
+_CJK_RE = re.compile(f'[{_CJK}]')
+
+def _normalize(text: Any) -> str:
+    if text is None or (isinstance(text, float) and text != text):
+        return ""
+    # 全形英數轉半形、大寫轉小寫
+    return unicodedata.normalize('NFKC', str(text)).lower()
+
+def tokenize(text: Any) -> List[str]:
+    """
+    Index tokens of a text
+
+    CJK runs produce overlapping bigrams (a single character stays a
+    unigram), other runs of letters and digits produce one token each.
+    A run of letters or digits directly after CJK text also produces a
+    token joined to the last character ("廠商1" -> 廠商, 商1, 1), so "廠商1"
+    does not match 廠商2 in one field and 分類1 in another.
+    """
+    tokens = []
+    previous = None
+    for match in _TOKEN_RE.finditer(_normalize(text)):
+        run = match.group()
+        if _CJK_RE.match(run):
+            if len(run) > 1:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            else:
+                tokens.append(run)
+        else:
+            if previous is not None and previous.end() == match.start():
+                tokens.append(previous.group()[-1] + run)
+            tokens.append(run)
+        previous = match
+    return tokens
+
+class SearchIndex:
+    """
+    Inverted index over defect records
+
+    Every query term must match (AND). CJK terms match through their
+    bigrams, so "裂縫" finds "牆面出現裂縫"; a single CJK character matches
+    any bigram containing it. Words with letters match as prefixes from
+    PREFIX_MIN_LENGTH characters ("3f" finds "3fl"); numbers only match
+    whole tokens, so "廠商1" does not find 廠商12. A query that is just a
+    number also finds every defect_id containing it ("23" finds defect
+    123), like the previous str.contains scan. Results are ranked by the
+    summed FIELD_WEIGHTS of the matching fields.
+    """
+
+    def __init__(self, fields: Optional[Dict[str, int]] = None):
+        self.fields = fields or FIELD_WEIGHTS
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)  # 詞 -> {defect_id: 權重}
+        self._doc_tokens: Dict[int, Set[str]] = {}
+        self._char_terms: Dict[str, Set[str]] = defaultdict(set)  # 中文字 -> 含此字的詞
+        self._sorted_terms: Optional[List[str]] = None  # 英數詞排序後供前綴查詢
+        self._id_strings: Optional[List[Tuple[str, int]]] = None  # 編號字串供部分比對
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_tokens)
+
+    def _doc_weights(self, record: Dict[str, Any]) -> Dict[str, int]:
+        weights: Dict[str, int] = defaultdict(int)
+        for field, weight in self.fields.items():
+            for token in tokenize(record.get(field)):
+                weights[token] += weight
+        return weights
+
+    def add(self, defect_id: int, record: Dict[str, Any]) -> None:
+        """
+        Index one defect, replacing its previous entry
+        """
+        defect_id = int(defect_id)
+        weights = self._doc_weights(record)
+        with self._lock:
+            if defect_id not in self._doc_tokens:
+                self._id_strings = None
+            self._remove(defect_id)
+            for token, weight in weights.items():
+                if token not in self._postings:
+                    self._sorted_terms = None
+                    if _CJK_RE.match(token):
+                        for char in token:
+                            self._char_terms[char].add(token)
+                self._postings[token][defect_id] = weight
+            self._doc_tokens[defect_id] = set(weights)
+
+    def add_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        """
+        Index several records that each contain defect_id
+        """
+        for record in records:
+            self.add(record['defect_id'], record)
+
+    def add_frame(self, df: pd.DataFrame) -> None:
+        """
+        Index every row of a defect DataFrame
+        """
+        columns = ['defect_id'] + [c for c in self.fields if c in df.columns and c != 'defect_id']
+        self.add_many(df[columns].astype(object).to_dict('records'))
+
+    def _remove(self, defect_id: int) -> None:
+        for token in self._doc_tokens.pop(defect_id, ()):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(defect_id, None)
+            if not posting:
+                del self._postings[token]
+                self._sorted_terms = None
+                for char in token:
+                    self._char_terms.get(char, set()).discard(token)
+
+    def remove(self, defect_id: int) -> None:
+        """
+        Drop one defect from the index
+        """
+        with self._lock:
+            self._remove(int(defect_id))
+            self._id_strings = None
+
+    def _id_matches(self, number: str) -> Dict[int, int]:
+        # defect_id 的部分比對（與舊的 str.contains 相同）
+        if self._id_strings is None:
+            self._id_strings = [(str(defect_id), defect_id) for defect_id in self._doc_tokens]
+        weight = self.fields.get('defect_id', 0)
+        return {defect_id: weight for text, defect_id in self._id_strings if number in text}
+
+    def _term_matches(self, term: str) -> Dict[int, int]:
+        if _CJK_RE.match(term):
+            if len(term) > 1:
+                return dict(self._postings.get(term, {}))
+            tokens = self._char_terms.get(term, set())
+        elif term.isdigit() or len(term) < PREFIX_MIN_LENGTH:
+            return dict(self._postings.get(term, {}))
+        else:
+            if self._sorted_terms is None:
+                self._sorted_terms = sorted(t for t in self._postings if not _CJK_RE.match(t))
+            start = bisect.bisect_left(self._sorted_terms, term)
+            tokens = []
+            for token in self._sorted_terms[start:]:
+                if not token.startswith(term):
+                    break
+                tokens.append(token)
+
+        matches: Dict[int, int] = {}
+        for token in tokens:
+            for defect_id, weight in self._postings[token].items():
+                matches[defect_id] = max(matches.get(defect_id, 0), weight)
+        return matches
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Ranked search
+
+        Args:
+            query: Free text, e.g. "3F 裂縫"
+            limit: Maximum number of results (default: all)
+
+        Returns:
+            [(defect_id, score)] sorted by score, then newest defect first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            # 先查命中數最少的詞，縮小候選集合
+            matches = sorted((self._term_matches(term) for term in terms), key=len)
+            if len(terms) == 1 and terms[0].isdigit():
+                matches = [{**self._id_matches(terms[0]), **matches[0]}]
+        scores = dict(matches[0])
+        for term_matches in matches[1:]:
+            scores = {d: s + term_matches[d] for d, s in scores.items() if d in term_matches}
+            if not scores:
+                return []
+
+        # 只需前 limit 筆時以 heap 取出，不必排序全部命中
+        key = lambda item: (-item[1], -item[0])
+        if limit:
+            return heapq.nsmallest(limit, scores.items(), key=key)
+        return sorted(scores.items(), key=key)
+
+def linear_search(df: pd.DataFrame, query: str) -> pd.DataFrame:
+    """
+    The previous str.contains scan over description and defect_id, kept for benchmarking
+    """
+    query = query.lower()
+    mask = (
+        df['defect_description'].str.lower().str.contains(query, na=False, regex=False) |
+        df['defect_id'].astype(str).str.contains(query, na=False, regex=False)
+    )
+    return df[mask]
+
+def benchmark_search(n: int = 100_000, queries: Tuple[str, ...] = ('裂縫', '漏水', '3f', '廠商1', '123'), repeat: int = 5) -> Dict[str, Any]:
+    """
+    Time index build, queries and incremental updates against the linear scan
+
+    Returns:
+        rows, build_seconds, per-query milliseconds for both paths,
+        update_ms (re-index one defect) and the average speedup
+    """
+    from defect_frame import make_sample_defects
+
+    df = make_sample_defects(n)
+    df['location'] = [f"{i % 12 + 1}F {('東', '西', '南', '北')[i % 4]}側" for i in range(n)]
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.add_frame(df)
+    build_seconds = time.perf_counter() - start
+
+    def best_ms(func) -> float:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return round(best * 1000, 3)
+
+    per_query = []
+    for query in queries:
+        per_query.append({
+            'query': query,
+            'hits': len(index.search(query)),
+            'index_ms': best_ms(lambda: index.search(query)),
+            'scan_ms': best_ms(lambda: linear_search(df, query)),
+        })
+
+    record = df.iloc[0].to_dict()
+    record['defect_description'] = '窗框周圍滲水'
+    update_ms = best_ms(lambda: index.add(record['defect_id'], record))
+
+    speedups = [q['scan_ms'] / q['index_ms'] for q in per_query if q['index_ms']]
+    return {
+        'rows': n,
+        'build_seconds': round(build_seconds, 3),
+        'queries': per_query,
+        'update_ms': update_ms,
+        'speedup': round(sum(speedups) / len(speedups), 1) if speedups else None,
+    }
+
+if __name__ == "__main__":
+    print(benchmark_search())
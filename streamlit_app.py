@@ -1,5 +1,10 @@
 import streamlit as st
 import pandas as pd
+import api_metrics
+import profiler
+
+# 設定 API_METRICS_PORT / API_METRICS_JSONL 時記錄每個 API 請求
+api_metrics.enable_from_env()
 
 if "user_mail" not in st.session_state:
     st.session_state.user_mail = "user@example.com"
@@ -66,7 +71,9 @@ def main():
         }
     )
 
-    pg.run()
+    # 設定 PAGE_PROFILER=1 或網址加上 ?profile=1 時記錄本次 rerun 的耗時
+    with profiler.page(pg.title):
+        pg.run()
 
 ###########################
 
@@ -87,7 +94,8 @@ if st.query_params.get("defect_unique_code"):
             "修繕": [repair_page]
         }
     )
-    pg.run()
+    with profiler.page(pg.title):
+        pg.run()
 
 else:
 
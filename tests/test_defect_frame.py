@@ -0,0 +1,21 @@
+import tracemalloc
+
+import pandas as pd
+
+from defect_frame import DEFECT_MEMORY_BUDGET_MB, DEFECT_TOTAL_PEAK_BUDGET_MB, enrich_defects, make_sample_records, memory_mb
+
+
+def test_memory_budget_200k():
+    # 從建立 JSON 紀錄開始追蹤，峰值包含原始資料、轉型過程與轉型後的 DataFrame
+    tracemalloc.start()
+    try:
+        records = make_sample_records(200_000)
+        df = enrich_defects(pd.DataFrame(records))
+        del records
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(df) == 200_000
+    assert memory_mb(df) <= DEFECT_MEMORY_BUDGET_MB
+    assert peak / 2**20 <= DEFECT_TOTAL_PEAK_BUDGET_MB
@@ -0,0 +1,88 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+import streamlit as st
+from PIL import Image, ImageOps, features
+from image_cache import cache_key, cache_path, fetch_image_bytes, read_cached, write_atomic
+from profiler import profiled
+
+# 縮圖尺寸 (寬, 高)，縮圖保持比例、不超過此範圍
+CARD_SIZE = (600, 400)      # 工程卡片
+GALLERY_SIZE = (480, 480)   # 底圖清單
+PHOTO_SIZE = (320, 320)     # 缺失 / 修繕照片
+
+THUMBNAIL_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+THUMBNAIL_QUALITY = int(os.environ.get('THUMBNAIL_QUALITY', 80))
+THUMBNAIL_MEMORY_ITEMS = int(os.environ.get('THUMBNAIL_MEMORY_ITEMS', 512))
+
+_memory: "OrderedDict[str, bytes]" = OrderedDict()
+_memory_lock = threading.Lock()
+
+def _key(url: str, size: Tuple[int, int]) -> str:
+    return cache_key(url, size[0], size[1], THUMBNAIL_FORMAT)
+
+def _remember(key: str, data: bytes) -> None:
+    with _memory_lock:
+        _memory[key] = data
+        _memory.move_to_end(key)
+        while len(_memory) > THUMBNAIL_MEMORY_ITEMS:
+            _memory.popitem(last=False)
+
+def make_thumbnail(image: Image.Image, size: Tuple[int, int]) -> bytes:
+    """
+    Encode a fixed-size thumbnail of a decoded image
+    """
+    image.draft("RGB", size)  # JPEG 直接以較低解析度解碼
+    thumb = ImageOps.exif_transpose(image)
+    thumb.thumbnail(size, Image.LANCZOS)
+    if thumb.mode not in ("RGB", "RGBA") or (THUMBNAIL_FORMAT == "JPEG" and thumb.mode == "RGBA"):
+        thumb = thumb.convert("RGB")
+    buf = io.BytesIO()
+    thumb.save(buf, format=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+    return buf.getvalue()
+
+def get_thumbnail(url: str, size: Tuple[int, int] = PHOTO_SIZE) -> bytes:
+    """
+    Get a cached thumbnail of an image URL, generating it on first request
+
+    Raises:
+        requests.exceptions.RequestException if the original cannot be fetched
+    """
+    key = _key(url, size)
+    with _memory_lock:
+        data = _memory.get(key)
+    if data is not None:
+        return data
+
+    path = cache_path(key, "." + THUMBNAIL_FORMAT.lower())
+    data = read_cached(path)
+    if data is None:
+        with Image.open(io.BytesIO(fetch_image_bytes(url))) as image:
+            data = make_thumbnail(image, size)
+        write_atomic(path, data)
+
+    _remember(key, data)
+    return data
+
+def put_thumbnail(url: str, size: Tuple[int, int], image: Image.Image) -> None:
+    """
+    Seed the thumbnail cache from an image we already have (e.g. at upload)
+    """
+    key = _key(url, size)
+    data = make_thumbnail(image, size)
+    write_atomic(cache_path(key, "." + THUMBNAIL_FORMAT.lower()), data)
+    _remember(key, data)
+
+@profiled("show_thumbnail", "image")
+def show_thumbnail(url: str, size: Tuple[int, int] = PHOTO_SIZE, caption: Optional[str] = None) -> None:
+    """
+    st.image the thumbnail with a link to the full-size image
+    """
+    try:
+        st.image(get_thumbnail(url, size), caption=caption)
+    except Exception:
+        st.image(url, caption=caption)
+        return
+    st.markdown(f"[🔍 檢視原圖]({url})")
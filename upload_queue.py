@@ -0,0 +1,197 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Set
+import requests
+import urllib3
+import api
+from image_processing import prepare_upload_image
+
+# 照片上傳佇列設定
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', 4))
+UPLOAD_RETRIES = int(os.environ.get('UPLOAD_RETRIES', 3))
+UPLOAD_BACKOFF = float(os.environ.get('UPLOAD_BACKOFF', 0.5))  # 第一次重試前等待秒數，之後加倍
+
+def _not_sent(error: requests.exceptions.RequestException) -> bool:
+    # 連線尚未建立就失敗，伺服器不可能收到請求
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        reason = getattr(error.args[0], "reason", None)
+        return isinstance(reason, (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError))
+    return False
+
+def _status(error: requests.exceptions.RequestException) -> Optional[int]:
+    response = getattr(error, "response", None)
+    return response.status_code if response is not None else None
+
+def is_retryable(error: requests.exceptions.RequestException) -> bool:
+    """
+    Whether a failed upload can be sent again without risking a duplicate
+
+    POST /photos/ is not idempotent, so only failures where the server
+    certainly did not store the photo qualify: the connection could not be
+    opened, or the server answered 429 / 503.
+    """
+    return _not_sent(error) or _status(error) in (429, 503)
+
+def may_have_uploaded(error: requests.exceptions.RequestException) -> bool:
+    """
+    Whether the server may have stored the photo despite the error
+
+    True for read timeouts, connections dropped after the request was
+    sent and other 5xx responses; False for errors that certainly did not
+    store it (see is_retryable) and for other client errors.
+    """
+    if is_retryable(error):
+        return False
+    status = _status(error)
+    return status is None or status >= 500
+
+def _retry_after(error: requests.exceptions.RequestException) -> float:
+    # 429 / 503 的 Retry-After（秒），沒有時為 0
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("Retry-After", 0)) if response is not None else 0.0
+    except ValueError:
+        return 0.0
+
+class _Batch:
+    """
+    Photos already on the server for one upload_photos call
+
+    Holds the IDs present before the batch started and every ID a photo
+    of the batch has been matched to, so an ambiguous failure is only
+    matched to a photo nobody else in the batch accounts for.
+    """
+
+    def __init__(self, related_id: int, related_type: str):
+        self.related_id = related_id
+        self.related_type = related_type
+        self._lock = threading.Lock()
+        try:
+            self.known: Optional[Set[int]] = {p["photo_id"] for p in api.get_photos(related_type, related_id, raise_errors=True)}
+        except requests.exceptions.RequestException:
+            self.known = None  # 無法確認，不得重送
+
+    def claim(self, photo_id: int) -> None:
+        with self._lock:
+            if self.known is not None:
+                self.known.add(photo_id)
+
+    def find_uploaded(self, description: str) -> Optional[Dict[str, Any]]:
+        """
+        The photo a failed attempt stored after all, {} when there is none,
+        or None when the server cannot be checked
+        """
+        if self.known is None:
+            return None
+        try:
+            photos = api.get_photos(self.related_type, self.related_id, raise_errors=True)
+        except requests.exceptions.RequestException:
+            return None
+        with self._lock:
+            for photo in sorted(photos, key=lambda p: p["photo_id"]):
+                if photo["photo_id"] not in self.known and (photo.get("description") or "") == (description or ""):
+                    self.known.add(photo["photo_id"])
+                    return photo
+        return {}
+
+def _upload_one(related_id: int, image_file, description: str, related_type: str, retries: int, backoff: float, batch: _Batch) -> Dict[str, Any]:
+    file_tuple, report = prepare_upload_image(image_file)
+    result = {}
+    error = None
+    attempts = 0
+    for attempt in range(retries + 1):
+        attempts += 1
+        try:
+            result = api.upload_defect_image(related_id, file_tuple, description, related_type, raise_errors=True)
+            batch.claim(result["photo_id"])
+            error = None
+            break
+        except requests.exceptions.RequestException as e:
+            result, error = {}, e
+            if attempt == retries or not (is_retryable(e) or may_have_uploaded(e)):
+                break
+            if may_have_uploaded(e):
+                # 伺服器可能已存下照片：先查詢，確定沒有才重送
+                found = batch.find_uploaded(description)
+                if found is None:
+                    break
+                if found:
+                    result, error = found, None
+                    break
+            time.sleep(max(_retry_after(e), backoff * (2 ** attempt) * random.uniform(0.8, 1.2)))
+    item = {
+        "filename": report["filename"],
+        "ok": 'photo_id' in result,
+        "result": result,
+        "attempts": attempts,
+        "report": report,
+    }
+    if error is not None:
+        item["error"] = str(error)
+    return item
+
+def upload_photos(related_id: int, image_files: List[Any], description: str = "", related_type: str = "defect",
+                  max_workers: int = UPLOAD_WORKERS, retries: int = UPLOAD_RETRIES, backoff: float = UPLOAD_BACKOFF,
+                  on_progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Compress and upload several photos in parallel
+
+    Each photo goes through prepare_upload_image and api.upload_defect_image
+    on a bounded thread pool. Uploads the server certainly did not store
+    (connection not opened, 429, 503) are retried with exponential backoff
+    and jitter, honouring Retry-After. After a read timeout, a dropped
+    connection or another 5xx the photo may already exist, so the related
+    record's photos are checked (GET /photos/, matched by description
+    against the photos present before the batch) and the upload is only
+    sent again when none turned up. Other errors fail at once.
+
+    Args:
+        related_id: ID of the defect / improvement
+        image_files: UploadedFile objects or (filename, fileobj, mimetype) tuples
+        description: Description for every photo
+        related_type: "defect" or "improvement"
+        max_workers: Maximum concurrent uploads
+        retries: Retries per photo after the first attempt
+        backoff: Seconds before the first retry (doubled each time)
+        on_progress: Called as on_progress(done, total, item) in the calling
+            thread each time a photo finishes, so it may update Streamlit UI
+
+    Returns:
+        Dict with succeeded / failed item lists, total, bytes_uploaded,
+        bytes_saved and seconds
+    """
+    start = time.perf_counter()
+    items = []
+    total = len(image_files)
+
+    if total:
+        batch = _Batch(related_id, related_type)
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total))) as pool:
+            futures = [
+                pool.submit(_upload_one, related_id, image_file, description, related_type, retries, backoff, batch)
+                for image_file in image_files
+            ]
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    item = future.result()
+                except Exception as e:
+                    # 例如圖片無法解碼
+                    item = {"filename": None, "ok": False, "result": {}, "attempts": 0, "report": None, "error": str(e)}
+                items.append(item)
+                if on_progress:
+                    on_progress(done, total, item)
+
+    succeeded = [item for item in items if item["ok"]]
+    return {
+        "succeeded": succeeded,
+        "failed": [item for item in items if not item["ok"]],
+        "total": total,
+        "bytes_uploaded": sum(item["report"]["output_bytes"] for item in succeeded),
+        "bytes_saved": sum(item["report"]["saved_bytes"] for item in succeeded),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
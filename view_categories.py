@@ -1,5 +1,6 @@
 import streamlit as st
 import api
+from defect_store import mark_stale
 import pandas as pd
 
 # ============ 新增分類 ============
@@ -38,6 +39,8 @@ def edit_category_ui(category):
                 # 這裡假設有 api.update_defect_category，若沒有可以補上
                 result = api.update_defect_category(category['defect_category_id'], category_name, description)
                 if result:
+                    # 缺失資料含分類名稱
+                    mark_stale()
                     st.success(f"分類 '{category_name}' 已更新")
                     st.rerun()
                 else:
@@ -86,6 +89,7 @@ if not df.empty:
         with col2:
             if st.button("🗑️ 刪除", key=f"delete_{selected_category['defect_category_id']}", use_container_width=True):
                 api.delete_defect_category(selected_category['defect_category_id'])
+                mark_stale()
                 st.rerun()
 else:
     st.info("目前尚無分類資料，請新增分類。")
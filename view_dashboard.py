@@ -5,7 +5,9 @@ import api
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from utils import get_urgency_class, get_status_class
+from defect_store import load_defects_df
+from defect_frame import enrich_defects, memory_mb, vendor_performance
+from profiler import profiled
 
 # @st.cache_data
 def show_project():
@@ -18,47 +20,51 @@ def show_project():
         st.stop()
 
 # @st.cache_data
+@profiled("載入缺失", "data")
 def get_defects_df():
-    defects = api.get_defects(st.session_state.active_project_id)
-    # if not defects:
-    #     return pd.DataFrame()
-
-    df_defects = pd.DataFrame(defects)
+    # 只合併有變動的缺失，不必每次重建
+    df_defects = load_defects_df(st.session_state.active_project_id)
 
     if df_defects.empty:
         st.info("目前沒有缺失，請新增缺失。")
         st.stop()
 
-    # 轉換日期格式
-    df_defects['created_at_dt'] = pd.to_datetime(df_defects['created_at'])
-    df_defects['created_date'] = df_defects['created_at_dt'].dt.date
-    
-    # 轉換 expected_completion_day 為日期格式
-    df_defects['expected_completion_date'] = pd.to_datetime(df_defects['expected_completion_day'])
-    
-    # 計算從今天到預計完成日的剩餘天數
-    current_date = pd.Timestamp.now().normalize()
-    df_defects['urgency_days'] = (df_defects['expected_completion_date'] - current_date).dt.days
-    
-    # 將負數變為0，表示已逾期
-    df_defects['urgency_days'] = df_defects['urgency_days'].apply(lambda x: max(0, x) if pd.notna(x) else 999)
-    df_defects['urgency_class'] = df_defects['urgency_days'].apply(get_urgency_class)
-    
-    # 處理狀態
-    df_defects['status_class'] = df_defects['status'].apply(get_status_class)
-    
-    return df_defects
+    return enrich_defects(df_defects)
 
-def display_metrics(df):
-    if df.empty:
+# 總覽明細表只傳送這些欄位到瀏覽器
+OVERVIEW_COLUMNS = [
+    'defect_id', 'location', 'defect_description', 'category_name', 'assigned_vendor_name',
+    'status', 'urgency_class', 'expected_completion_date', 'created_date',
+]
+
+# 緊急程度標籤 -> 圖表文字
+URGENCY_TEXT = {'🟥 ': '🟥 0日內', '🟨 ': '🟨 7日內', '🟩 ': '🟩 14日內', '⬜️ ': '⬜️ 14日以上', '❔ ': '❔ 未知'}
+
+@profiled("計算統計", "data")
+def compute_stats(df):
+    """在本地計算與 api.get_defect_stats 相同格式的統計（載入明細或月份篩選時使用）"""
+    status_counts = df['status'].value_counts().loc[lambda c: c > 0].to_dict()
+    urgency = df['urgency_class'].astype(object)
+    urgency_counts = urgency.map(URGENCY_TEXT).fillna(urgency).value_counts().to_dict()
+    return {
+        "total": len(df),
+        "completed": status_counts.get('已完成', 0),
+        "in_progress": status_counts.get('改善中', 0),
+        "overdue": int((df['urgency_days'] == 0).sum()),
+        "status_counts": status_counts,
+        "urgency_counts": urgency_counts,
+    }
+
+def display_metrics(stats):
+    if not stats.get('total'):
         st.info("目前沒有缺失資料")
         return
         
-    # 計算各種指標
-    total_defects = len(df)
-    completed_defects = len(df[df['status'] == '已完成'])
-    in_progress_defects = len(df[df['status'] == '改善中'])
-    overdue_defects = len(df[df['urgency_days'] == 0])
+    # 取得各種指標（伺服器未提供逾期數時顯示 —）
+    total_defects = stats['total']
+    completed_defects = stats['completed'] or 0
+    in_progress_defects = stats['in_progress'] or 0
+    overdue_defects = stats['overdue']
     
     # 計算完成率
     completion_rate = completed_defects / total_defects * 100 if total_defects > 0 else 0
@@ -77,16 +83,18 @@ def display_metrics(df):
         st.metric("改善中缺失", in_progress_defects)
         
     with col4:
-        st.metric("已逾期缺失", overdue_defects, 
-                 overdue_defects, delta_color="inverse")
+        if overdue_defects is None:
+            st.metric("已逾期缺失", "—", help="伺服器統計未提供，請載入缺失明細")
+        else:
+            st.metric("已逾期缺失", overdue_defects, 
+                     overdue_defects, delta_color="inverse")
 
-def display_status_chart(df):
-    if df.empty:
+def display_status_chart(status_counts):
+    if not status_counts:
         return
         
-    # 計算各狀態的缺失數量
-    status_counts = df['status'].value_counts().reset_index()
-    status_counts.columns = ['狀態', '數量']
+    # 各狀態的缺失數量 {狀態: 數量}
+    status_counts = pd.DataFrame(list(status_counts.items()), columns=['狀態', '數量'])
     
     # 創建圓餅圖
     fig = px.pie(
@@ -102,16 +110,12 @@ def display_status_chart(df):
     
     return fig
 
-def display_urgency_chart(df, style='default'):
-    if df.empty:
+def display_urgency_chart(urgency_counts, style='default'):
+    if not urgency_counts:
         return
         
-    # 提取緊急程度的emoji和文字
-    df['urgency_text'] = df['urgency_class'].str.split(' ').str[1]
-    
-    # 計算各緊急程度的缺失數量
-    urgency_counts = df['urgency_text'].value_counts().reset_index()
-    urgency_counts.columns = ['緊急程度', '數量']
+    # 各緊急程度的缺失數量 {緊急程度: 數量}
+    urgency_counts = pd.DataFrame(list(urgency_counts.items()), columns=['緊急程度', '數量'])
     
     # 計算百分比 (僅用於內部計算，不添加到DataFrame)
     percent_values = urgency_counts['數量'] / urgency_counts['數量'].sum() * 100
@@ -211,7 +215,7 @@ def display_category_chart(df, style='default'):
         return
         
     # 計算各分類的缺失數量
-    category_counts = df['category_name'].value_counts().reset_index()
+    category_counts = df['category_name'].value_counts().loc[lambda c: c > 0].reset_index()
     category_counts.columns = ['分類', '數量']
     
     # 只取前10個分類
@@ -302,12 +306,13 @@ def display_category_chart(df, style='default'):
     
     return fig
 
+@profiled("廠商圖表", "plot")
 def display_vendor_chart(df, style='default'):
     if df.empty:
         return
         
     # 計算各廠商的缺失數量
-    vendor_counts = df['assigned_vendor_name'].value_counts().reset_index()
+    vendor_counts = df['assigned_vendor_name'].value_counts().loc[lambda c: c > 0].reset_index()
     vendor_counts.columns = ['廠商', '數量']
     
     # 只取前10個廠商
@@ -434,7 +439,7 @@ def display_time_trend(df):
         
     # 確保有創建日期
     if 'created_date' not in df.columns:
-        df['created_date'] = pd.to_datetime(df['created_at']).dt.date
+        df['created_date'] = pd.to_datetime(df['created_at']).dt.normalize()
     
     # 計算每天的缺失數量
     daily_counts = df.groupby('created_date').size().reset_index()
@@ -455,25 +460,47 @@ def display_time_trend(df):
     
     return fig
 
-def display_completion_trend(df):
+def get_completion_trend(df, freq='auto'):
+    """
+    以單次 groupby + cumsum 計算累計缺失總數、已完成、未完成
+
+    freq: 'D'(日)、'W'(週)、'M'(月)，'auto' 依專案期間長度自動選擇
+    """
+    created = df['created_at_dt']
+
+    if freq == 'auto':
+        span_days = (created.max() - created.min()).days
+        if span_days > 730:
+            freq = 'M'
+        elif span_days > 180:
+            freq = 'W'
+        else:
+            freq = 'D'
+
+    periods = created.dt.to_period(freq).dt.start_time
+    is_completed = (df['status'] == '已完成').astype(int)
+
+    trend = (
+        is_completed.groupby(periods)
+        .agg(['size', 'sum'])
+        .sort_index()
+        .cumsum()
+    )
+    trend.columns = ['total', 'completed']
+    trend['incomplete'] = trend['total'] - trend['completed']
+
+    return trend
+
+def display_completion_trend(df, freq='auto'):
     if df.empty or len(df) < 2:
         return
     
     # 計算累計缺失數和已完成缺失數
-    df_sorted = df.sort_values('created_at_dt')
-    dates = sorted(df_sorted['created_date'].unique())
-    
-    cumulative_total = []
-    cumulative_completed = []
-    
-    for date in dates:
-        # 截至該日期的所有缺失
-        df_until_date = df_sorted[df_sorted['created_date'] <= date]
-        total = len(df_until_date)
-        completed = len(df_until_date[df_until_date['status'] == '已完成'])
-        
-        cumulative_total.append(total)
-        cumulative_completed.append(completed)
+    trend = get_completion_trend(df, freq)
+    dates = trend.index
+    cumulative_total = trend['total']
+    cumulative_completed = trend['completed']
+    cumulative_incomplete = trend['incomplete']
     
     # 創建趨勢圖
     fig = go.Figure()
@@ -497,7 +524,6 @@ def display_completion_trend(df):
     ))
     
     # 添加未完成缺失數曲線
-    cumulative_incomplete = [t - c for t, c in zip(cumulative_total, cumulative_completed)]
     fig.add_trace(go.Scatter(
         x=dates, 
         y=cumulative_incomplete,
@@ -520,26 +546,7 @@ def display_vendor_performance(df):
         st.info("無廠商資料")
         return
 
-    # 只針對有廠商名稱的缺失
-    vendor_group = df.groupby('assigned_vendor_name')
-    vendor_stats = []
-    for vendor, group in vendor_group:
-        total = len(group)
-        completed = group[group['status'] == '已完成']
-        overdue = group[group['urgency_class'].str.contains('逾期')]
-        avg_repair = None
-        if not completed.empty and 'created_at_dt' in completed.columns and 'updated_at' in completed.columns:
-            completed['updated_at_dt'] = pd.to_datetime(completed['updated_at'])
-            completed['repair_days'] = (completed['updated_at_dt'] - completed['created_at_dt']).dt.days
-            avg_repair = completed['repair_days'].mean()
-        vendor_stats.append({
-            '廠商': vendor,
-            '總缺失': total,
-            '完成率': len(completed) / total * 100 if total else 0,
-            '逾期數': len(overdue),
-            '平均修復天數': avg_repair if avg_repair is not None else '-'
-        })
-    perf_df = pd.DataFrame(vendor_stats).sort_values('完成率', ascending=False).head(10)
+    perf_df = vendor_performance(df).sort_values('解決率', ascending=False).head(10)
     st.markdown("#### 🏆 廠商績效指標 (前10名)")
     # 使用自定義格式化函數來處理可能是字符串的值
     def format_value(val):
@@ -554,7 +561,7 @@ def display_vendor_performance(df):
     fig = go.Figure()
     fig.add_trace(go.Bar(
         y=perf_df['廠商'],
-        x=perf_df['完成率'],
+        x=perf_df['解決率'],
         name='完成率(%)',
         orientation='h',
         marker_color='#2ecc71'
@@ -587,6 +594,7 @@ def filter_df(df):
     
     return df
 
+@profiled("分類圖表", "plot")
 def display_defect_types(df):
     # st.markdown("## 缺失類型分布儀表板")
     
@@ -599,7 +607,7 @@ def display_defect_types(df):
     
     if 'category_name' in df.columns:
         # 計算各分類的缺失數量
-        category_counts = df['category_name'].value_counts().reset_index()
+        category_counts = df['category_name'].value_counts().loc[lambda c: c > 0].reset_index()
         category_counts.columns = ['分類', '數量']
         
         # 計算百分比
@@ -632,25 +640,52 @@ def display_defect_types(df):
         st.plotly_chart(fig, use_container_width=True)
         
 
+@profiled("總覽圖表", "plot")
+def display_overview_charts(stats):
+    col1, col2 = st.columns(2)
+    with col1:
+        fig = display_status_chart(stats['status_counts'])
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+    with col2:
+        fig = display_urgency_chart(stats['urgency_counts'], style='gradient')
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.caption("伺服器統計未提供緊急程度分布，請載入缺失明細")
+
 # ====== MAIN PAGE =======
 
 show_project()
 
-# 獲取缺失數據
-df = get_defects_df()
+# 總覽優先使用伺服器統計，載入時間與缺失數量無關
+stats = api.get_defect_stats(st.session_state.active_project_id)
 
-# ===== 月份篩選 =====
-df = filter_df(df)
+# 月份篩選、廠商與分類分析需要全部缺失明細；伺服器統計無法取得時一律載入
+show_details = st.sidebar.toggle("載入缺失明細", value=not stats, disabled=not stats,
+                                 help="月份篩選、廠商與分類分析需下載全部缺失")
 
-# 顯示主要指標
-# display_metrics(df)
+if show_details:
+    # 獲取缺失數據
+    df = get_defects_df()
+
+    # ===== 月份篩選 =====
+    df = filter_df(df)
+    stats = compute_stats(df)
+else:
+    df = None
+    if not stats.get('total'):
+        st.info("目前沒有缺失，請新增缺失。")
+        st.stop()
 
 tab1, tab2, tab3 = st.tabs(["📊 總覽", "🏆 廠商分析", "📚 缺失分類"])
 with tab1:
-    display_metrics(df)
-    st.divider()
-    st.caption("* 以下為所有缺失的詳細資料")
-    st.dataframe(df)
+    display_metrics(stats)
+    display_overview_charts(stats)
+    if df is not None:
+        st.divider()
+        st.caption(f"* 以下為所有缺失的詳細資料（{len(df)} 筆，記憶體 {memory_mb(df)} MB）")
+        st.dataframe(df[[c for c in OVERVIEW_COLUMNS if c in df.columns]], hide_index=True)
     # 分類圖表風格選擇
     # category_styles = ['default', 'gradient', 'modern', 'sorted']
     # category_style = st.selectbox('選擇分類圖表風格', category_styles, key='category_style')
@@ -659,12 +694,18 @@ with tab2:
     # 廠商圖表風格選擇
     # vendor_styles = ['default', 'gradient', 'interactive', 'comparison']
     # vendor_style = st.selectbox('選擇廠商圖表風格', vendor_styles, key='vendor_style',index=1)
-    st.plotly_chart(display_vendor_chart(df, style='gradient'), use_container_width=True)
+    if df is not None:
+        st.plotly_chart(display_vendor_chart(df, style='gradient'), use_container_width=True)
+    else:
+        st.info("請在側邊欄開啟「載入缺失明細」以查看廠商分析")
     
 with tab3:
-    display_defect_types(df)
+    if df is not None:
+        display_defect_types(df)
+    else:
+        st.info("請在側邊欄開啟「載入缺失明細」以查看缺失分類")
     # st.divider()
     # st.plotly_chart(display_category_chart(df, style='sorted'), use_container_width=True)
 
 # with tab3:
-#     pass
\ No newline at end of file
+#     pass
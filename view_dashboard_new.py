@@ -5,7 +5,8 @@ import api
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from utils import get_urgency_class, get_status_class
+from defect_store import load_defects_df
+from defect_frame import enrich_defects, vendor_performance
 
 # 顯示項目標題
 def show_project():
@@ -19,35 +20,12 @@ def show_project():
 
 # 獲取缺失數據
 def get_defects_df():
-    defects = api.get_defects(st.session_state.active_project_id)
-    if not defects:
+    # 只合併有變動的缺失，不必每次重建
+    df_defects = load_defects_df(st.session_state.active_project_id)
+    if df_defects.empty:
         return pd.DataFrame()
-        
-    df_defects = pd.DataFrame(defects)
-    
-    # 轉換日期格式
-    df_defects['created_at_dt'] = pd.to_datetime(df_defects['created_at'])
-    df_defects['created_date'] = df_defects['created_at_dt'].dt.date
-    
-    # 轉換 expected_completion_day 為日期格式
-    df_defects['expected_completion_date'] = pd.to_datetime(df_defects['expected_completion_day'])
-    
-    # 計算從今天到預計完成日的剩餘天數
-    current_date = pd.Timestamp.now().normalize()
-    df_defects['urgency_days'] = (df_defects['expected_completion_date'] - current_date).dt.days
-    
-    # 將負數變為0，表示已逾期
-    df_defects['urgency_days'] = df_defects['urgency_days'].apply(lambda x: max(0, x) if pd.notna(x) else 999)
-    df_defects['urgency_class'] = df_defects['urgency_days'].apply(get_urgency_class)
-    
-    # 處理狀態
-    df_defects['status_class'] = df_defects['status'].apply(get_status_class)
     
-    # 計算修復時間（對於已完成的缺失）
-    df_defects['updated_at_dt'] = pd.to_datetime(df_defects['updated_at'])
-    df_defects['repair_days'] = (df_defects['updated_at_dt'] - df_defects['created_at_dt']).dt.days
-    
-    return df_defects
+    return enrich_defects(df_defects)
 
 # 獲取過去30天的數據
 def get_last_30_days_data(df, days=30):
@@ -69,7 +47,7 @@ def get_daily_defect_counts(df):
     
     # 確保日期列存在
     if 'created_date' not in df.columns:
-        df['created_date'] = df['created_at_dt'].dt.date
+        df['created_date'] = df['created_at_dt'].dt.normalize()
     
     # 計算每日新增缺失數量
     daily_new = df.groupby('created_date').size().reset_index(name='新增數量')
@@ -77,7 +55,7 @@ def get_daily_defect_counts(df):
     # 計算每日解決缺失數量（僅考慮已完成的缺失）
     df_completed = df[df['status'] == '已完成'].copy()
     if not df_completed.empty and 'updated_at_dt' in df_completed.columns:
-        df_completed['completed_date'] = df_completed['updated_at_dt'].dt.date
+        df_completed['completed_date'] = df_completed['updated_at_dt'].dt.normalize()
         daily_completed = df_completed.groupby('completed_date').size().reset_index(name='解決數量')
     else:
         daily_completed = pd.DataFrame(columns=['completed_date', '解決數量'])
@@ -275,42 +253,8 @@ def display_vendor_performance(df):
         st.info("無廠商資料")
         return
     
-    # 計算各廠商的缺失數量
-    vendor_counts = df_vendor['assigned_vendor_name'].value_counts().reset_index()
-    vendor_counts.columns = ['廠商', '缺失數量']
-    
-    # 計算各廠商的解決率
-    vendor_group = df_vendor.groupby('assigned_vendor_name')
-    vendor_stats = []
-    
-    for vendor, group in vendor_group:
-        total = len(group)
-        completed = len(group[group['status'] == '已完成'])
-        overdue = len(group[group['urgency_days'] == 0])
-        
-        # 計算平均解決時間
-        avg_repair = None
-        completed_defects = group[group['status'] == '已完成']
-        if not completed_defects.empty and 'repair_days' in completed_defects.columns:
-            avg_repair = completed_defects['repair_days'].mean()
-        
-        # 計算按時完成率
-        on_time_completed = len(completed_defects[completed_defects['urgency_days'] > 0])
-        on_time_rate = on_time_completed / completed if completed > 0 else 0
-        
-        vendor_stats.append({
-            '廠商': vendor,
-            '總缺失數': total,
-            '已解決數': completed,
-            '解決率': completed / total * 100 if total > 0 else 0,
-            '逾期數': overdue,
-            '逾期率': overdue / total * 100 if total > 0 else 0,
-            '平均解決天數': avg_repair if avg_repair is not None else None,
-            '按時完成率': on_time_rate * 100
-        })
-    
-    # 轉換為DataFrame並排序
-    vendor_df = pd.DataFrame(vendor_stats)
+    # 單次 groupby 計算所有廠商的績效
+    vendor_df = vendor_performance(df_vendor)
     
     # 顯示廠商績效表格
     st.markdown("### 廠商績效指標")
@@ -320,6 +264,7 @@ def display_vendor_performance(df):
     formatted_df['解決率'] = formatted_df['解決率'].apply(lambda x: f"{x:.1f}%" if pd.notna(x) else "-")
     formatted_df['逾期率'] = formatted_df['逾期率'].apply(lambda x: f"{x:.1f}%" if pd.notna(x) else "-")
     formatted_df['平均解決天數'] = formatted_df['平均解決天數'].apply(lambda x: f"{x:.1f}" if pd.notna(x) else "-")
+    formatted_df['中位解決天數'] = formatted_df['中位解決天數'].apply(lambda x: f"{x:.1f}" if pd.notna(x) else "-")
     formatted_df['按時完成率'] = formatted_df['按時完成率'].apply(lambda x: f"{x:.1f}%" if pd.notna(x) else "-")
     
     # 顯示表格
@@ -433,7 +378,7 @@ def display_defect_types(df):
     
     if 'category_name' in df.columns:
         # 計算各分類的缺失數量
-        category_counts = df['category_name'].value_counts().reset_index()
+        category_counts = df['category_name'].value_counts().loc[lambda c: c > 0].reset_index()
         category_counts.columns = ['分類', '數量']
         
         # 計算百分比
@@ -537,7 +482,7 @@ def display_defect_types(df):
         urgency_counts['百分比'] = urgency_counts['數量'] / total * 100
         
         # 創建堆疊柱狀圖，按緊急程度和解決狀態分析
-        urgency_status = df.groupby(['urgency_text', 'status']).size().reset_index(name='數量')
+        urgency_status = df.groupby(['urgency_text', 'status'], observed=True).size().reset_index(name='數量')
         
         fig = px.bar(
             urgency_status,
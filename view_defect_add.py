@@ -1,8 +1,6 @@
 import streamlit as st
 import api
-from PIL import Image, ImageDraw
-import io
-import requests
+import api_async
 from streamlit_antd_components import steps
 from datetime import datetime
 from streamlit_image_coordinates import streamlit_image_coordinates
@@ -11,6 +9,11 @@ from streamlit_extras.add_vertical_space import add_vertical_space
 import streamlit_antd_components as sac
 import time
 from api import BASE_URL
+from image_processing import format_upload_report
+from upload_queue import upload_photos
+from defect_store import mark_stale
+from basemap_tiles import render_overview_with_marker
+from profiler import profiled
 default_session_state = {
     "basemap_id": None,
     "basemap_mark_X": None,
@@ -94,17 +97,7 @@ def get_selectbox_index(session_value, options_list, options_dict):
             return options_list.index(current_name)
     return 0
 
-def draw_basemap_with_marker(image_url, x, y, radius=15):
-    """
-    下載底圖並在 (x, y) 畫紅圈，回傳 PIL Image
-    """
-    resp = requests.get(image_url)
-    img = Image.open(io.BytesIO(resp.content)).convert("RGBA")
-    if x is not None and y is not None:
-        draw = ImageDraw.Draw(img)
-        draw.ellipse((x - radius, y - radius, x + radius, y + radius), outline="red", width=4)
-    return img
-
+@profiled("底圖標記", "image")
 def display_basemap_add(basemaps):
     # 建立名稱對 id 的 dict
     basemap_name_to_id = {b['map_name']: b['base_map_id'] for b in basemaps}
@@ -118,15 +111,17 @@ def display_basemap_add(basemaps):
         if selected_map_data:
             image_url = BASE_URL+"/"+selected_map_data['file_path']
 
-            # 使用共用函式取得已標記圖片
+            # 由切片組出縮圖並畫上標記，座標一律存原始解析度
             x = st.session_state.basemap_mark_X
             y = st.session_state.basemap_mark_Y
-            img = draw_basemap_with_marker(image_url, x, y, radius=15)
+            img, scale = render_overview_with_marker(image_url, x, y, radius=15)
             value = streamlit_image_coordinates(img)
             if value:
-                st.toast(f"標示位置: X={value['x']}, Y={value['y']}", icon="📍")
-                st.session_state.basemap_mark_X = value['x']
-                st.session_state.basemap_mark_Y = value['y']
+                mark_x = round(value['x'] / scale)
+                mark_y = round(value['y'] / scale)
+                st.toast(f"標示位置: X={mark_x}, Y={mark_y}", icon="📍")
+                st.session_state.basemap_mark_X = mark_x
+                st.session_state.basemap_mark_Y = mark_y
                 st.session_state.basemap_id = selected_base_map_id
                 st.rerun()
 
@@ -219,10 +214,10 @@ def display_defect_result():
         # show image with red circle
         image_url = BASE_URL+"/"+basemap['file_path']
 
-        # 使用共用函式取得已標記圖片
+        # 由切片組出縮圖並畫上標記
         x = st.session_state.basemap_mark_X
         y = st.session_state.basemap_mark_Y
-        img = draw_basemap_with_marker(image_url, x, y, radius=15)
+        img, _ = render_overview_with_marker(image_url, x, y, radius=15)
         st.image(img, caption=f"**座標：** X = `{st.session_state.basemap_mark_X}`, Y = `{st.session_state.basemap_mark_Y}`")
 
     with col1:
@@ -335,6 +330,7 @@ def main(basemaps):
 
                     if 'defect_id' in res:
                         st.toast("缺失描述新增成功!",icon= "✅")
+                        mark_stale(st.session_state.active_project_id)
 
                         defect_mark_data={
                             # "defect_mark_id": res['defect_id'],
@@ -352,13 +348,18 @@ def main(basemaps):
                         if 'defect_mark_id' in res2:
                             st.toast("缺失標記新增成功!",icon= "✅")
 
-                        for image_file in st.session_state.defect_images:
-                            # 這裡 image_file 應該是 UploadedFile 物件
-                            file_tuple = (image_file.name, image_file, image_file.type)
-                            res3 = api.upload_defect_image(res['defect_id'], file_tuple)
-                            
-                            if 'photo_id' in res3:
-                                st.toast("缺失照片新增成功!",icon= "✅")
+                        if st.session_state.defect_images:
+                            # 並行壓縮、上傳照片，失敗自動重試
+                            progress = st.progress(0.0, text="正在上傳缺失照片...")
+                            upload_result = upload_photos(
+                                res['defect_id'],
+                                st.session_state.defect_images,
+                                on_progress=lambda done, total, item: progress.progress(done / total, text=f"已上傳 {done}/{total} 張照片"),
+                            )
+                            for item in upload_result['succeeded']:
+                                st.toast("缺失照片新增成功! " + format_upload_report(item['report']),icon= "✅")
+                            for item in upload_result['failed']:
+                                st.toast(f"缺失照片上傳失敗: {item['filename'] or '無法讀取的檔案'}",icon= "⚠️")
 
                         #清空session
                         st.session_state.defect_images=[]
@@ -386,20 +387,26 @@ def main(basemaps):
 
 #========MAIN UI========
 
-project = api.get_project(st.session_state.active_project_id)
+# --- 並行取得工程、缺失分類、廠商與底圖 ---
+page_data = api_async.fetch_all(
+    project=api_async.get_project(st.session_state.active_project_id),
+    categories=api_async.get_defect_categories(),
+    vendors=api_async.get_vendors(),
+    basemaps=api_async.get_basemaps(st.session_state.active_project_id),
+)
+project = page_data['project']
 
 if project:
 
     st.caption("工程 / "+project['project_name']+" / 缺失表單")
 
-    # --- Fetch defect categories and vendors ---
-    categories = api.get_defect_categories()
-    vendors = api.get_vendors()
+    categories = page_data['categories']
+    vendors = page_data['vendors']
 
     category_options = {str(c.get('name', c.get('category_name', '無分類'))): c['defect_category_id'] for c in categories} if categories else {}
     vendor_options = {str(v.get('vendor_name', '無廠商')): v['vendor_id'] for v in vendors} if vendors else {}
 
-    basemaps=api.get_basemaps(st.session_state.active_project_id)
+    basemaps=page_data['basemaps']
 
     main(basemaps)
 else:
@@ -1,9 +1,13 @@
 import streamlit as st
 import api
-from utils import draw_basemap_with_marker
+from basemap_tiles import render_overview_with_marker, render_marker_detail
 import datetime
 import time
 from api import BASE_URL
+from image_processing import format_upload_report
+from upload_queue import upload_photos
+from defect_store import mark_stale
+from thumbnails import show_thumbnail
 defect_data=api.get_defect_by_unique_code(st.session_state.defect_unique_code)
 # st.write(st.session_state.defect_unique_code)
 # st.write(defect_data)
@@ -43,7 +47,7 @@ with st.expander("📷缺失照片"):
     if defect_detail['photos']: 
         for i, file in enumerate(defect_detail['photos']):
             with img_cols[i % 3]:
-                st.image(BASE_URL+file['image_url'])
+                show_thumbnail(BASE_URL+file['image_url'])
     else:
         st.info("無缺失照片")
 
@@ -54,8 +58,10 @@ with st.expander("📍缺失標記"):
 
         x = defect_detail['defect_marks'][0]['coordinate_x']
         y = defect_detail['defect_marks'][0]['coordinate_y']
-        img = draw_basemap_with_marker(base_map_image, x, y, radius=15)
+        img, _ = render_overview_with_marker(base_map_image, x, y, radius=15)
         st.image(img, caption=f"**座標：** X = `{x}`, Y = `{y}`")
+        # 標記附近的原始解析度局部放大
+        st.image(render_marker_detail(base_map_image, x, y), caption="局部放大")
     except:
         st.error("無法顯示缺失標記")        
 
@@ -81,16 +87,23 @@ with st.container(border=True):
                 )
                 
                 if result:
+                    # 缺失狀態隨改善報告變動
+                    mark_stale()
                     # 上傳修繕照片
                     if repair_images:
-                        with st.spinner("正在上傳修繕照片..."):
-                            for img in repair_images:
-                                api.upload_defect_image(
-                                    defect_id=result['improvement_id'],
-                                    image_file=img,
-                                    description="修繕照片",
-                                    related_type="improvement"
-                                )
+                        # 並行壓縮、上傳照片，失敗自動重試
+                        progress = st.progress(0.0, text="正在上傳修繕照片...")
+                        upload_result = upload_photos(
+                            result['improvement_id'],
+                            repair_images,
+                            description="修繕照片",
+                            related_type="improvement",
+                            on_progress=lambda done, total, item: progress.progress(done / total, text=f"已上傳 {done}/{total} 張照片"),
+                        )
+                        for item in upload_result['succeeded']:
+                            st.caption(format_upload_report(item['report']))
+                        if upload_result['failed']:
+                            st.warning(f"{len(upload_result['failed'])} 張修繕照片上傳失敗")
                     
                     st.success("修繕資訊已成功提交！")
                     time.sleep(3)
@@ -3,7 +3,10 @@ import streamlit as st
 import api
 import pandas as pd
 # st.subheader("缺失列表")
-from utils import get_urgency_class,get_status_class
+from defect_frame import enrich_defects
+from defect_store import mark_stale, query_defects
+from profiler import profiled
+from thumbnails import show_thumbnail
 
 # @st.cache_data
 def show_project():
@@ -16,28 +19,77 @@ def show_project():
         st.warning("請先至工程列表選擇當前工程!")
         st.stop()
 
-# @st.cache_data
-def get_defects_df():
-    defects=api.get_defects(st.session_state.active_project_id)
+STATUS_OPTIONS = ["全部", "🟡 改善中", "🟢 已完成", "🔴 已取消", "⚪ 等待中","🟣 待確認","🟤 未設定"]
+# GET /defects/ 每頁最多 100 筆
+PAGE_SIZE_OPTIONS = [25, 50, api.DEFECTS_PAGE_MAX]
 
-    df_defects=pd.DataFrame(defects)
+def reset_page():
+    st.session_state.defect_page = 1
 
-    if df_defects.empty:
-        st.info("目前沒有缺失，請新增缺失。")
-        st.stop()
+def get_filters():
+    """顯示篩選條件，回傳交給伺服器的查詢參數與搜尋字串"""
+
+    categories = api.get_defect_categories()
+    vendors = api.get_vendors()
+    category_options = {c['category_name']: c['defect_category_id'] for c in categories} if categories else {}
+    vendor_options = {v['vendor_name']: v['vendor_id'] for v in vendors} if vendors else {}
+
+    with st.container(border=True):
+        col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+        with col1:
+            search_text = st.text_input("🔍 搜尋", key="lookfor", placeholder="輸入關鍵字...", on_change=reset_page)
+        with col2:
+            status_filter = st.selectbox("📊 狀態", 
+                                    options=STATUS_OPTIONS,
+                                    key="status_filter", on_change=reset_page)
+        with col3:
+            category_filter = st.selectbox("🏷️ 分類", 
+                                        ["全部"] + sorted(category_options.keys()),
+                                        key="category_filter", on_change=reset_page)
+        with col4:
+            vendor_filter = st.selectbox("🏢 廠商", 
+                                    ["全部"] + sorted(vendor_options.keys()),
+                                    key="vendor_filter", on_change=reset_page)
+
+    filters = {
+        # "🟡 改善中" -> "改善中"
+        "status": status_filter.split(" ", 1)[1] if status_filter != "全部" else None,
+        "defect_category_id": category_options.get(category_filter),
+        "assigned_vendor_id": vendor_options.get(vendor_filter),
+    }
+
+    return filters, search_text
 
-    # 轉換日期格式以計算差異
-    df_defects['created_at_dt'] = pd.to_datetime(df_defects['created_at'])
+def get_pagination():
+    """顯示分頁控制，回傳 (skip, limit)"""
 
-    # 轉換 expected_completion_day 為日期格式
-    df_defects['expected_completion_date'] = pd.to_datetime(df_defects['expected_completion_day'])
+    if "defect_page" not in st.session_state:
+        st.session_state.defect_page = 1
 
-    # 計算從今天到預計完成日的剩餘天數
-    current_date = pd.Timestamp.now().normalize()
-    df_defects['urgency_days'] = (df_defects['expected_completion_date'] - current_date).dt.days
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page_size = st.selectbox("每頁筆數", PAGE_SIZE_OPTIONS, index=len(PAGE_SIZE_OPTIONS) - 1, key="defect_page_size", on_change=reset_page)
+    with col2:
+        st.number_input("頁數", min_value=1, step=1, key="defect_page")
+
+    skip = (st.session_state.defect_page - 1) * page_size
+    return skip, page_size
+
+# @st.cache_data
+@profiled("載入缺失", "data")
+def get_defects_df(filters, skip, limit, search_text=""):
+    # 有關鍵字或需本地篩選時由快照查詢（依相關度排序），否則由後端分頁
+    df_defects, has_next = query_defects(st.session_state.active_project_id, filters, search_text, skip, limit)
+
+    if df_defects.empty:
+        if skip == 0 and not search_text and not any(filters.values()):
+            st.info("目前沒有缺失，請新增缺失。")
+        else:
+            st.info("沒有符合條件的缺失。")
+        st.stop()
 
-    # 將負數變為0，表示已逾期
-    df_defects['urgency_class'] = df_defects['urgency_days'].apply(get_urgency_class)
+    # 計算剩餘天數、緊急程度與狀態標籤（保留負數天數以便排序）
+    df_defects = enrich_defects(df_defects, clamp_overdue=False)
 
     # 只取需要顯示的欄位
     show_columns = [
@@ -57,80 +109,86 @@ def get_defects_df():
     ]
     # 處理 created_at 只顯示年月日
     if 'created_at' in df_defects.columns:
-        df_defects['created_at'] = pd.to_datetime(df_defects['created_at']).dt.date.astype(str)
+        df_defects['created_at'] = df_defects['created_date'].dt.strftime('%Y-%m-%d')
 
     df_show = df_defects[show_columns].copy()
-    df_show['status'] = df_show['status'].apply(get_status_class)
+    df_show['status'] = df_defects['status_class']
 
-    return df_show
+    return df_show, has_next
 
-def get_filter_df(df):
+def get_filter_df(df, search_text):
     
-    #filter
+    # 搜尋結果已依相關度排序，其餘按緊急程度排序
+    if not search_text:
+        df = df.sort_values(by=['urgency_days'])
 
-    with st.container(border=True):
-        col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
-        with col1:
-            search_text = st.text_input("🔍 搜尋", key="lookfor", placeholder="輸入關鍵字...")
-        with col2:
-            status_filter = st.selectbox("📊 狀態", 
-                                    options=["全部", "🟡 改善中", "🟢 已完成", "🔴 已取消", "⚪ 等待中","🟣 待確認","🟤 未設定"],
-                                    key="status_filter")
-        with col3:
-            category_filter = st.selectbox("🏷️ 分類", 
-                                        ["全部"] + sorted(list(set(df['category_name'].dropna().tolist()))),
-                                        key="category_filter")
-        with col4:
-            vendor_filter = st.selectbox("🏢 廠商", 
-                                    ["全部"] + sorted(list(set(df['assigned_vendor_name'].dropna().tolist()))),
-                                    key="vendor_filter")
-
-    # 搜尋過濾
-    if search_text:
-        search_lower = search_text.lower()
-        mask = (
-            df['defect_description'].str.lower().str.contains(search_lower, na=False) |
-            df['defect_id'].astype(str).str.contains(search_lower, na=False)
-        )
-        df = df[mask]
-
-    # 狀態過濾
-    if status_filter != "全部":
-        df = df[df['status'] == status_filter]
-
-    # 分類過濾
-    if category_filter != "全部":
-        df = df[df['category_name'] == category_filter]
-
-    # 廠商過濾
-    if vendor_filter != "全部":
-        df = df[df['assigned_vendor_name'] == vendor_filter]
+    return df
 
-    # 按緊急程度排序
-    df = df.sort_values(by=['urgency_days'])
+def show_bulk_result(result, action):
+    """顯示批次操作結果"""
+    if result["succeeded"]:
+        st.toast(f"已{action} {len(result['succeeded'])} 筆缺失")
+    if result["failed"]:
+        st.error(f"{action}失敗的缺失編號: " + ", ".join(map(str, result["failed"])))
 
-    return df
+def show_selected_ids(defect_ids):
+    if len(defect_ids) == 1:
+        st.write(f"缺失編號 {defect_ids[0]}")
+    else:
+        st.write(f"共 {len(defect_ids)} 個缺失")
+        st.caption(", ".join(map(str, defect_ids)))
 
 @st.dialog("刪除缺失")
 def delete_defects(df_selected):
     # Get defect IDs as a list
     defect_ids = df_selected['defect_id'].tolist()
     
-    # Format the message based on number of selected items
-    if len(defect_ids) == 1:
-        st.write(f"確定要刪除缺失編號 {defect_ids[0]} 嗎？")
-    else:
-        st.write(f"確定要刪除以下 {len(defect_ids)} 個缺失嗎？")
-        st.write(", ".join(map(str, defect_ids)))
+    st.write("確定要刪除以下缺失嗎？")
+    show_selected_ids(defect_ids)
     
     if st.button("刪除"):
-        for defect_id in defect_ids:
-            success = api.delete_defect(defect_id)
-            if success:
-                st.toast(f"已刪除缺失編號 {defect_id}")
-            else:
-                st.error(f"刪除缺失編號 {defect_id} 時發生錯誤")
-        st.rerun()  # Refresh the page to update the list
+        with st.spinner("刪除中..."):
+            result = api.bulk_delete_defects(defect_ids)
+        show_bulk_result(result, "刪除")
+        mark_stale(st.session_state.active_project_id)
+        if not result["failed"]:
+            st.rerun()  # Refresh the page to update the list
+
+@st.dialog("變更狀態")
+def update_defects_status(df_selected):
+    defect_ids = df_selected['defect_id'].tolist()
+    show_selected_ids(defect_ids)
+
+    # 不含 "全部" 與 "未設定"
+    status_label = st.selectbox("新狀態", STATUS_OPTIONS[1:-1])
+
+    if st.button("更新"):
+        with st.spinner("更新中..."):
+            result = api.bulk_update_defect_status(defect_ids, status_label.split(" ", 1)[1])
+        show_bulk_result(result, "更新")
+        mark_stale(st.session_state.active_project_id)
+        if not result["failed"]:
+            st.rerun()
+
+@st.dialog("重新指派廠商")
+def assign_defects_vendor(df_selected):
+    defect_ids = df_selected['defect_id'].tolist()
+    show_selected_ids(defect_ids)
+
+    vendors = api.get_vendors()
+    if not vendors:
+        st.warning("目前沒有廠商資料")
+        return
+    vendor_options = {v['vendor_name']: v['vendor_id'] for v in vendors}
+    vendor_name = st.selectbox("指派廠商", sorted(vendor_options.keys()))
+
+    if st.button("指派"):
+        with st.spinner("指派中..."):
+            result = api.bulk_assign_vendor(defect_ids, vendor_options[vendor_name])
+        show_bulk_result(result, "指派")
+        mark_stale(st.session_state.active_project_id)
+        if not result["failed"]:
+            st.rerun()
 
 @st.dialog("缺失歷史記錄",width="large")
 def show_defect_history(defect_id):
@@ -175,7 +233,7 @@ def show_defect_history(defect_id):
                 # img_cols = st.columns(3)
                 for i, photo in enumerate(defect_photos):
                     # with img_cols[i % 3]:
-                    st.image(f"{api.BASE_URL}{photo['image_url']}")
+                    show_thumbnail(f"{api.BASE_URL}{photo['image_url']}")
             else:
                 st.info("無缺失照片")
             
@@ -187,7 +245,7 @@ def show_defect_history(defect_id):
                 # img_cols = st.columns(3)
                 for i, photo in enumerate(improvement_photos):
                     # with img_cols[i % 3]:
-                        st.image(f"{api.BASE_URL}{photo['image_url']}")
+                        show_thumbnail(f"{api.BASE_URL}{photo['image_url']}")
             else:
                 st.info("無修繕照片")
 
@@ -198,12 +256,14 @@ def show_defect_history(defect_id):
     with col_left:
         if st.button("✅ 確認結果",use_container_width=True):
             api.update_defect(defect_id, {"status": "已完成"})
+            mark_stale(st.session_state.active_project_id)
             st.toast("修繕已完成")
             st.rerun()
 
     with col_right:
         if st.button("🔄 退回重辦",use_container_width=True):
             api.update_defect(defect_id, {"status": "改善中"})
+            mark_stale(st.session_state.active_project_id)
             st.toast("退回重辦")
             st.rerun()
 
@@ -211,8 +271,11 @@ def show_defect_history(defect_id):
 
 show_project()
 
-df=get_defects_df()
-df_filter=get_filter_df(df.copy())
+filters, search_text = get_filters()
+skip, limit = get_pagination()
+
+df, has_next = get_defects_df(filters, skip, limit, search_text)
+df_filter=get_filter_df(df.copy(), search_text)
 
 # 顯示過濾後的數據
 event = st.dataframe(
@@ -234,14 +297,15 @@ event = st.dataframe(
         'unique_code': None
     },
     on_select="rerun",
-    selection_mode="single-row"
+    selection_mode="multi-row"
 )
 
 st.caption("圖例說明: 🟥0日內,🟨7日內,🟩14日內,⬜️14日以上")
+st.caption(f"第 {st.session_state.defect_page} 頁，本頁 {len(df)} 筆" + ("，還有下一頁" if has_next else "，已是最後一頁"))
 
 # 顯示選中的行
 selected_rows = event.selection.rows
-if selected_rows:
+if len(selected_rows) == 1:
     col1,col2,col3=st.columns([1,1,1])
 
     # 編輯、刪除
@@ -264,5 +328,21 @@ if selected_rows:
         if st.button("🗑️ 刪除",key="delete",use_container_width=True):
             df_selected = df_filter.iloc[selected_rows]
             delete_defects(df_selected)
-    
 
+elif selected_rows:
+    # 多筆選取：批次操作
+    df_selected = df_filter.iloc[selected_rows]
+    st.write(f"已選取 {len(selected_rows)} 筆缺失")
+    col1,col2,col3=st.columns([1,1,1])
+
+    with col1:
+        if st.button("📊 變更狀態",key="bulk_status",use_container_width=True):
+            update_defects_status(df_selected)
+
+    with col2:
+        if st.button("🏢 重新指派廠商",key="bulk_vendor",use_container_width=True):
+            assign_defects_vendor(df_selected)
+
+    with col3:
+        if st.button("🗑️ 批次刪除",key="bulk_delete",use_container_width=True):
+            delete_defects(df_selected)
@@ -4,35 +4,12 @@ from streamlit_extras.floating_button import floating_button
 from streamlit_avatar import avatar
 from PIL import Image
 from api import BASE_URL
+from image_cache import put_image_bytes
+from basemap_tiles import schedule_pyramid
+from thumbnails import show_thumbnail, GALLERY_SIZE
+from defect_store import mark_stale
 import pandas as pd
 
-def crop_and_resize_image(img, target_w=5760, target_h=3840):
-    """
-    將圖片裁切為特定比例，並 resize 成指定大小
-    """
-    target_ratio = target_w / target_h
-    w, h = img.size
-    img_ratio = w / h
-
-    if img_ratio > target_ratio:
-        # 原圖較寬，以高度為準裁切寬度
-        crop_h = h
-        crop_w = int(h * target_ratio)
-    else:
-        # 原圖較高或等寬高比，以寬度為準裁切高度
-        crop_w = w
-        crop_h = int(w / target_ratio)
-
-    left = (w - crop_w) // 2
-    top = (h - crop_h) // 2
-    right = left + crop_w
-    bottom = top + crop_h
-
-    cropped_img = img.crop((left, top, right, bottom))
-    resized_img = cropped_img.resize((target_w, target_h), Image.LANCZOS)
-    return resized_img
-
-
 def resize_image_keep_ratio(img, max_width=1000):
     w, h = img.size
     if w > max_width:
@@ -48,14 +25,13 @@ def create_basemap():
     map_name=st.text_input("底圖名稱")
     map_file=st.file_uploader("上傳底圖", type=["png", "jpg", "jpeg"])
     if map_file:
-        import io
+        # 上傳原圖，縮圖只用於預覽；標記時由切片金字塔取得原圖細節
+        bytes_file = map_file.getvalue()
         img = Image.open(map_file)
+        img.draft("RGB", (1200, 1200))
         preview_img = resize_image_keep_ratio(img, 1200)
         st.image(preview_img)
         # map_file_new = crop_and_resize_image(img, 1000, 562)
-        buf = io.BytesIO()
-        preview_img.save(buf, format="JPEG")
-        bytes_file = buf.getvalue()
 
         submit_button=st.button("新增",use_container_width=True)
 
@@ -71,6 +47,11 @@ def create_basemap():
                         result2 = api.create_basemap_image(result['base_map_id'], files)
                         if result2:
                             st.success("底圖圖片新增成功")
+                            if result2.get('file_path'):
+                                # 在背景預先建立切片，標記缺失時不必解碼整張圖
+                                image_url = BASE_URL+"/"+result2['file_path']
+                                put_image_bytes(image_url, bytes_file)
+                                schedule_pyramid(image_url, bytes_file)
                         else:
                             st.error("底圖圖片新增失敗")
                     except Exception as e:
@@ -189,7 +170,7 @@ def display_project_basemaps():
         for i, basemap in enumerate(basemaps):
             with cols[i % 3]:
                 with st.container(border=True):
-                    st.image(BASE_URL+"/"+basemap['file_path'])
+                    show_thumbnail(BASE_URL+"/"+basemap['file_path'], GALLERY_SIZE)
                     st.markdown("#### " + basemap['map_name'])
                     col3,col4=st.columns([1,1])
                     with col3:
@@ -235,6 +216,8 @@ def edit_category_ui(category_id,category_name):
     if submit_button:
         result = api.update_defect_category(category_id, category_name,description)
         if result:
+            # 缺失資料含分類名稱
+            mark_stale()
             st.success("分類已更新")
             st.rerun()
         else:
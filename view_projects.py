@@ -3,8 +3,10 @@ import pandas as pd
 import api
 from datetime import datetime
 from streamlit_extras.floating_button import floating_button
-from PIL import Image
 from api import BASE_URL
+from thumbnails import show_thumbnail, put_thumbnail, CARD_SIZE
+from image_processing import prepare_cover_image
+from profiler import profiled
 
 # ============= 工具函數 =============
 
@@ -18,33 +20,6 @@ def format_date(date_str):
     except ValueError:
         return date_str
 
-def crop_and_resize_image(img, target_w=5760, target_h=3840):
-    """
-    將圖片裁切為特定比例，並 resize 成指定大小
-    """
-    target_ratio = target_w / target_h
-    w, h = img.size
-    img_ratio = w / h
-
-    if img_ratio > target_ratio:
-        # 原圖較寬，以高度為準裁切寬度
-        crop_h = h
-        crop_w = int(h * target_ratio)
-    else:
-        # 原圖較高或等寬高比，以寬度為準裁切高度
-        crop_w = w
-        crop_h = int(w / target_ratio)
-
-    left = (w - crop_w) // 2
-    top = (h - crop_h) // 2
-    right = left + crop_w
-    bottom = top + crop_h
-
-    cropped_img = img.crop((left, top, right, bottom))
-    resized_img = cropped_img.resize((target_w, target_h), Image.LANCZOS)
-    return resized_img
-
-
 def generate_project_images(projects):
     """為每個工程生成唯一的隨機圖片"""
     return [f"https://picsum.photos/seed/{i*20}/600/400" for i in range(len(projects))]
@@ -92,11 +67,12 @@ def display_projects_list():
             st.toast(f"已將工程 {selected_project['project_name']} 設為當前工程")
             st.rerun()
 
+@profiled("工程卡片")
 def display_projects_card():
     """以卡片形式顯示工程列表"""
-    # 從 API 獲取工程
+    # 從 API 獲取工程（含角色與圖片，一次取得）
     # projects = api.get_projects()
-    projects=api.get_project_by_email(st.session_state.user_mail)
+    projects=api.get_project_summaries(st.session_state.user_mail)
 
     # st.write(projects)
     
@@ -114,11 +90,7 @@ def display_projects_card():
         role=project['user_role']
 
         with cols[i % 3]:
-            project_origin=api.get_project(project['project_id'])
-            # st.write(project_origin)
-            # image_url="http://localhost:8000/"+project_origin['image_path']
-            # st.write(image_url)
-            render_project_card(project_origin,role)
+            render_project_card(project,role)
 
 def render_project_card(project,role):
     """渲染單個工程卡片"""
@@ -129,8 +101,8 @@ def render_project_card(project,role):
 
     # 創建卡片容器
     with st.container(border=True):
-        # 工程圖標
-        st.image(image_url)
+        # 工程圖標（縮圖，可點開原圖）
+        show_thumbnail(image_url, CARD_SIZE)
 
         # 工程標題
         if is_active:
@@ -185,48 +157,19 @@ def render_action_buttons(project, is_active,role):
 @st.dialog("新增工程")
 def create_new_project():
     """新增工程對話框"""
-    from PIL import Image
-    import io
 
     project_name = st.text_input("工程名稱")
     upload_image = st.file_uploader("上傳圖片", type=["png", "jpg", "jpeg"])
 
     # 預覽裁切後的圖片
-    cropped_img_bytes = None
+    cover = None
     if upload_image:
         try:
-            img = crop_and_resize_image(Image.open(upload_image))
-            st.image(img)
-            img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format=img.format or "JPEG")
-            cropped_img_bytes = img_byte_arr.getvalue()
-            # img = Image.open(upload_image)
-            # # 目標比例
-            # target_w, target_h = 5760, 3840
-            # target_ratio = target_w / target_h
-            # w, h = img.size
-            # img_ratio = w / h
-            # if img_ratio > target_ratio:
-            #     # 原圖較寬，以高度為準裁切寬度
-            #     crop_h = h
-            #     crop_w = int(h * target_ratio)
-            # else:
-            #     # 原圖較高或等寬高比，以寬度為準裁切高度
-            #     crop_w = w
-            #     crop_h = int(w / target_ratio)
-            # left = (w - crop_w) // 2
-            # top = (h - crop_h) // 2
-            # right = left + crop_w
-            # bottom = top + crop_h
-            # cropped_img = img.crop((left, top, right, bottom))
-            # # 裁切後resize成 5760x3840
-            # cropped_img = cropped_img.resize((target_w, target_h), Image.LANCZOS)
-            # st.markdown("#### 預覽（將上傳的圖片會被裁切成）：")
-            # st.image(cropped_img)
-            # # 轉成 bytes 以便上傳
-            # img_byte_arr = io.BytesIO()
-            # cropped_img.save(img_byte_arr, format=img.format or "JPEG")
-            # cropped_img_bytes = img_byte_arr.getvalue()
+            cover = prepare_cover_image(upload_image)
+            st.image(cover['variants'][min(cover['variants'])])
+            report = cover['report']
+            sizes = ", ".join(f"{w}px {b / 1024:.0f}KB" for w, b in report['output_bytes'].items())
+            st.caption(f"原圖 {report['source_size'][0]}x{report['source_size'][1]} ({report['source_bytes'] / 1024:.0f}KB) → {sizes}，CPU {report['cpu_seconds']} 秒")
         except Exception as e:
             st.warning(f"圖片預覽失敗：{e}")
 
@@ -246,12 +189,16 @@ def create_new_project():
                 else:
                     st.error("權限建立失敗")
 
-                if upload_image and cropped_img_bytes:
-                    files = {"file": (upload_image.name, cropped_img_bytes, upload_image.type)}
+                if upload_image and cover:
+                    files = {"file": cover['upload']}
                     try:
                         result3 = api.create_project_image(result['project_id'], files)
                         if result3:
                             st.success(f"工程 '{project_name}' 的圖片已建立")
+                            if result3.get('image_path'):
+                                # 以最接近卡片尺寸的版本預先建立縮圖
+                                card_variant = min(cover['variants'], key=lambda w: abs(w - CARD_SIZE[0]))
+                                put_thumbnail(BASE_URL+"/"+result3['image_path'], CARD_SIZE, cover['variants'][card_variant])
                         else:
                             st.error("圖片建立失敗")
                     except Exception as e:
@@ -1,5 +1,6 @@
 import streamlit as st
 import api
+from defect_store import mark_stale
 import pandas as pd
 import time
 
@@ -48,6 +49,8 @@ def edit_vendor_ui(vendor):
             try:
                 result = api.update_vendor(vendor['vendor_id'], vendor_name, contact_person, phone,email,line_id, responsibilities)
                 if result:
+                    # 缺失資料含廠商名稱
+                    mark_stale()
                     st.success(f"廠商 '{vendor_name}' 已更新")
                     st.rerun()
                 else:
@@ -106,6 +109,7 @@ if event.selection.rows:
     with col2:
         if st.button("🗑️ 刪除",key=f"delete_{selected_vendor['vendor_id']}",use_container_width=True):
             api.delete_vendor(selected_vendor['vendor_id'])
+            mark_stale()
     
             st.rerun()
 